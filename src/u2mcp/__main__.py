@@ -4,18 +4,18 @@ import logging
 import re
 import secrets
 import sys
-from typing import Annotated, Literal
+from typing import TYPE_CHECKING, Annotated, Literal
 
-import anyio
 import typer
-from rich.console import Console
 
-from .health import check_adb
-from .helpers import print_tags as print_tags_from_mcp
-from .helpers import print_tool_help
-from .mcp import make_mcp
 from .version import __version__
 
+if TYPE_CHECKING:
+    from rich.console import Console
+
+# Commands import the server, rich and anyio when they run, so that `--help`, `version` and
+# the commands that do not need the server start quickly
+
 cli = typer.Typer(
     name=__package__,
     help="uiautomator2-mcp-server - MCP server for Android device automation",
@@ -38,6 +38,8 @@ def _setup_logging(log_level: Literal["debug", "info", "warning", "error", "crit
 
 def _check_adb(console: Console, skip_check: bool) -> None:
     """Check ADB availability if not skipped."""
+    from .health import check_adb
+
     if not skip_check and not check_adb(console):
         console.print("[yellow]Proceeding anyway. Use --skip-adb-check to bypass this check.[/yellow]")
 
@@ -66,11 +68,134 @@ def stdio_cmd(
     print_tags: Annotated[
         bool, typer.Option("--print-tags/--no-print-tags", help="Show enabled tags and tools at startup")
     ] = True,
+    metadata_cache_ttl: Annotated[
+        float,
+        typer.Option(
+            "--metadata-cache-ttl",
+            min=0,
+            help="Seconds to cache device info and window size (0 disables the cache)",
+        ),
+    ] = 30.0,
+    hierarchy_cache_ttl: Annotated[
+        float,
+        typer.Option(
+            "--hierarchy-cache-ttl",
+            min=0,
+            help="Seconds a hierarchy snapshot is shared by read-only element queries, until the screen is touched (0 disables it)",
+        ),
+    ] = 1.0,
+    encode_workers: Annotated[
+        int | None,
+        typer.Option(
+            "--encode-workers",
+            min=1,
+            show_default="min(4, CPU count)",
+            help="Maximum number of screenshots encoded at the same time",
+        ),
+    ] = None,
+    workers: Annotated[
+        int | None,
+        typer.Option(
+            "--workers",
+            min=1,
+            show_default="32",
+            help="Maximum number of quick blocking device calls (queries, taps, key presses ...) running at the same time",
+        ),
+    ] = None,
+    wait_workers: Annotated[
+        int | None,
+        typer.Option(
+            "--wait-workers",
+            min=1,
+            show_default="64",
+            help="Maximum number of long blocking device calls (element and app waits, installs, shell commands ...) running at the same time",
+        ),
+    ] = None,
+    device_workers: Annotated[
+        int | None,
+        typer.Option(
+            "--device-workers",
+            min=1,
+            show_default="4",
+            help="Maximum number of blocking calls running at the same time on each device",
+        ),
+    ] = None,
+    scrcpy_max_processes: Annotated[
+        int | None,
+        typer.Option(
+            "--scrcpy-max-processes",
+            min=1,
+            show_default="4",
+            help="Maximum number of background scrcpy processes (mirrors and recordings) running at the same time",
+        ),
+    ] = None,
+    scrcpy_memory_limit: Annotated[
+        int | None,
+        typer.Option(
+            "--scrcpy-memory-limit",
+            min=0,
+            metavar="MB",
+            show_default="0",
+            help="Address space limit of each scrcpy process in MB, 0 for no limit (Linux only)",
+        ),
+    ] = None,
+    scrcpy_cpu_limit: Annotated[
+        int | None,
+        typer.Option(
+            "--scrcpy-cpu-limit",
+            min=0,
+            metavar="SECONDS",
+            show_default="0",
+            help="CPU time limit of each scrcpy process in seconds, 0 for no limit (Linux only)",
+        ),
+    ] = None,
+    watch_devices: Annotated[
+        bool,
+        typer.Option(
+            "--watch-devices/--no-watch-devices",
+            help="Track the devices of the adb server in background: drop detached devices at once, and serve `device_list` from memory",
+        ),
+    ] = False,
+    prewarm_devices: Annotated[
+        bool,
+        typer.Option(
+            "--prewarm-devices/--no-prewarm-devices",
+            help="With --watch-devices, connect to attached devices ahead of their first tool call",
+        ),
+    ] = False,
+    trace: Annotated[
+        str | None,
+        typer.Option(
+            "--trace",
+            metavar="PATH",
+            help="Append OpenTelemetry (OTLP/JSON) spans of each tool call to this file, '-' for stderr. See `trace-report`",
+        ),
+    ] = None,
 ):
     """Run the MCP server with stdio transport."""
+    from rich.console import Console
+
+    from .mcp import make_mcp
+
     _setup_logging(log_level)
     _check_adb(Console(stderr=True), skip_adb_check)
-    mcp = make_mcp(show_tags=print_tags, include_tags=include_tags, exclude_tags=exclude_tags)
+    mcp = make_mcp(
+        show_tags=print_tags,
+        include_tags=include_tags,
+        exclude_tags=exclude_tags,
+        metadata_cache_ttl=metadata_cache_ttl,
+        hierarchy_cache_ttl=hierarchy_cache_ttl,
+        encode_workers=encode_workers,
+        workers=workers,
+        wait_workers=wait_workers,
+        device_workers=device_workers,
+        scrcpy_max_processes=scrcpy_max_processes,
+        scrcpy_memory_limit=scrcpy_memory_limit,
+        scrcpy_cpu_limit=scrcpy_cpu_limit,
+        trace=trace,
+        watch_devices=watch_devices,
+        prewarm_devices=prewarm_devices,
+    )
     mcp.run(transport="stdio", log_level=log_level)
 
 
@@ -109,8 +234,122 @@ def http_cmd(
     print_tags: Annotated[
         bool, typer.Option("--print-tags/--no-print-tags", help="Show enabled tags and tools at startup")
     ] = True,
+    metadata_cache_ttl: Annotated[
+        float,
+        typer.Option(
+            "--metadata-cache-ttl",
+            min=0,
+            help="Seconds to cache device info and window size (0 disables the cache)",
+        ),
+    ] = 30.0,
+    hierarchy_cache_ttl: Annotated[
+        float,
+        typer.Option(
+            "--hierarchy-cache-ttl",
+            min=0,
+            help="Seconds a hierarchy snapshot is shared by read-only element queries, until the screen is touched (0 disables it)",
+        ),
+    ] = 1.0,
+    encode_workers: Annotated[
+        int | None,
+        typer.Option(
+            "--encode-workers",
+            min=1,
+            show_default="min(4, CPU count)",
+            help="Maximum number of screenshots encoded at the same time",
+        ),
+    ] = None,
+    workers: Annotated[
+        int | None,
+        typer.Option(
+            "--workers",
+            min=1,
+            show_default="32",
+            help="Maximum number of quick blocking device calls (queries, taps, key presses ...) running at the same time",
+        ),
+    ] = None,
+    wait_workers: Annotated[
+        int | None,
+        typer.Option(
+            "--wait-workers",
+            min=1,
+            show_default="64",
+            help="Maximum number of long blocking device calls (element and app waits, installs, shell commands ...) running at the same time",
+        ),
+    ] = None,
+    device_workers: Annotated[
+        int | None,
+        typer.Option(
+            "--device-workers",
+            min=1,
+            show_default="4",
+            help="Maximum number of blocking calls running at the same time on each device",
+        ),
+    ] = None,
+    scrcpy_max_processes: Annotated[
+        int | None,
+        typer.Option(
+            "--scrcpy-max-processes",
+            min=1,
+            show_default="4",
+            help="Maximum number of background scrcpy processes (mirrors and recordings) running at the same time",
+        ),
+    ] = None,
+    scrcpy_memory_limit: Annotated[
+        int | None,
+        typer.Option(
+            "--scrcpy-memory-limit",
+            min=0,
+            metavar="MB",
+            show_default="0",
+            help="Address space limit of each scrcpy process in MB, 0 for no limit (Linux only)",
+        ),
+    ] = None,
+    scrcpy_cpu_limit: Annotated[
+        int | None,
+        typer.Option(
+            "--scrcpy-cpu-limit",
+            min=0,
+            metavar="SECONDS",
+            show_default="0",
+            help="CPU time limit of each scrcpy process in seconds, 0 for no limit (Linux only)",
+        ),
+    ] = None,
+    metrics: Annotated[
+        bool,
+        typer.Option(
+            "--metrics/--no-metrics",
+            help="Serve Prometheus metrics (tool calls, latencies, lock waits, worker pools, devices) at /metrics, without token",
+        ),
+    ] = False,
+    watch_devices: Annotated[
+        bool,
+        typer.Option(
+            "--watch-devices/--no-watch-devices",
+            help="Track the devices of the adb server in background: drop detached devices at once, and serve `device_list` from memory",
+        ),
+    ] = False,
+    prewarm_devices: Annotated[
+        bool,
+        typer.Option(
+            "--prewarm-devices/--no-prewarm-devices",
+            help="With --watch-devices, connect to attached devices ahead of their first tool call",
+        ),
+    ] = False,
+    trace: Annotated[
+        str | None,
+        typer.Option(
+            "--trace",
+            metavar="PATH",
+            help="Append OpenTelemetry (OTLP/JSON) spans of each tool call to this file, '-' for stderr. See `trace-report`",
+        ),
+    ] = None,
 ):
     """Run the MCP server with HTTP (streamable-http) transport."""
+    from rich.console import Console
+
+    from .mcp import make_mcp
+
     _setup_logging(log_level)
     _check_adb(Console(stderr=True), skip_adb_check)
 
@@ -121,7 +360,25 @@ def http_cmd(
     elif not no_token:
         token = secrets.token_urlsafe()
 
-    mcp = make_mcp(token, show_tags=print_tags, include_tags=include_tags, exclude_tags=exclude_tags)
+    mcp = make_mcp(
+        token,
+        show_tags=print_tags,
+        include_tags=include_tags,
+        exclude_tags=exclude_tags,
+        metadata_cache_ttl=metadata_cache_ttl,
+        hierarchy_cache_ttl=hierarchy_cache_ttl,
+        encode_workers=encode_workers,
+        workers=workers,
+        wait_workers=wait_workers,
+        device_workers=device_workers,
+        scrcpy_max_processes=scrcpy_max_processes,
+        scrcpy_memory_limit=scrcpy_memory_limit,
+        scrcpy_cpu_limit=scrcpy_cpu_limit,
+        metrics=metrics,
+        trace=trace,
+        watch_devices=watch_devices,
+        prewarm_devices=prewarm_devices,
+    )
     mcp.run(
         transport="streamable-http",
         host=host,
@@ -131,19 +388,31 @@ def http_cmd(
     )
 
 
+def _complete_tool_pattern(incomplete: str) -> list[str]:
+    """Shell completion of tool names and tags, from the tool catalog."""
+    from .catalog import catalog_tags, load_catalog
+
+    catalog = load_catalog()
+    candidates = sorted(catalog["tools"]) + sorted(catalog_tags(catalog))
+    return [candidate for candidate in candidates if candidate.startswith(incomplete)]
+
+
 @cli.command("tools")
 def tools_cmd():
     """List all available MCP tools."""
-    console = Console()
-    mcp = make_mcp()
-    anyio.run(lambda: print_tool_help(mcp, console, None))
+    from rich.console import Console
+
+    from .catalog import load_catalog
+    from .helpers import print_tool_help
+
+    print_tool_help(load_catalog(), Console(), None)
 
 
 @cli.command("info")
 def info_cmd(
     tool_name: Annotated[
         str,
-        typer.Argument(help="Tool name or pattern (supports * and ? wildcards)"),
+        typer.Argument(help="Tool name or pattern (supports * and ? wildcards)", autocompletion=_complete_tool_pattern),
     ],
 ):
     """Show detailed information about a specific tool.
@@ -153,17 +422,131 @@ def info_cmd(
         u2mcp info device:*          # Show all device tools
         u2mcp info "*screenshot*"    # Show tools with 'screenshot' in name
     """
-    console = Console()
-    mcp = make_mcp()
-    anyio.run(lambda: print_tool_help(mcp, console, tool_name))
+    from rich.console import Console
+
+    from .catalog import load_catalog
+    from .helpers import print_tool_help
+
+    print_tool_help(load_catalog(), Console(), tool_name)
 
 
 @cli.command("tags")
 def tags_cmd():
     """List all available tool tags."""
-    console = Console()
-    mcp = make_mcp()
-    anyio.run(lambda: print_tags_from_mcp(mcp, console, filtered=False))
+    from rich.console import Console
+
+    from .catalog import load_catalog
+    from .helpers import print_tags
+
+    print_tags(load_catalog(), Console())
+
+
+@cli.command("trace-report")
+def trace_report_cmd(
+    path: Annotated[
+        str,
+        typer.Argument(help="Trace file written by the --trace option of stdio or http"),
+    ],
+):
+    """Summarize a trace file: latency of each tool, split by phase.
+
+    Phases are connecting to the device, waiting for the device lock, queuing for a worker thread,
+    running in the worker thread (uiautomator2 calls, hierarchy parsing), encoding images,
+    and the rest of the call on the server.
+    """
+    from rich.console import Console
+
+    from .helpers import print_trace_report
+    from .tracing import read_trace, summarize_trace
+
+    print_trace_report(summarize_trace(read_trace(path)), Console())
+
+
+@cli.command("bench")
+def bench_cmd(
+    transport: Annotated[
+        str, typer.Option("--transport", help="Transports to benchmark, comma-separated: stdio, http")
+    ] = "stdio,http",
+    families: Annotated[
+        str | None,
+        typer.Option(
+            "--families",
+            show_default="all",
+            help="Tool families to benchmark, comma-separated: action, input, device, element, app, batch",
+        ),
+    ] = None,
+    calls: Annotated[int, typer.Option("--calls", "-n", min=1, help="Timed calls per tool family")] = 200,
+    concurrency: Annotated[int, typer.Option("--concurrency", "-c", min=1, help="Calls in flight at the same time")] = 4,
+    devices: Annotated[int, typer.Option("--devices", min=1, help="Number of fake devices the calls go to in turn")] = 1,
+    latency: Annotated[float, typer.Option("--latency", min=0, help="Seconds each fake device call takes")] = 0.005,
+    jitter: Annotated[float, typer.Option("--jitter", min=0, help="Seconds of uniform jitter around the latency")] = 0.002,
+    screen: Annotated[str, typer.Option("--screen", help="Size of synthetic screenshots, WIDTHxHEIGHT")] = "1080x2400",
+    hierarchy_nodes: Annotated[
+        int, typer.Option("--hierarchy-nodes", min=4, help="Number of nodes of the synthetic hierarchy")
+    ] = 300,
+    screenshot: Annotated[
+        str | None,
+        typer.Option("--screenshot", metavar="PATH", help="Recorded screenshot to replay instead of a synthetic one"),
+    ] = None,
+    hierarchy: Annotated[
+        str | None,
+        typer.Option("--hierarchy", metavar="PATH", help="Recorded hierarchy XML to replay instead of a synthetic one"),
+    ] = None,
+    json_path: Annotated[
+        str | None, typer.Option("--json", metavar="PATH", help="Also write the results to this JSON file, to compare runs")
+    ] = None,
+):
+    """Benchmark the server against fake devices: throughput, latency percentiles and memory of each tool family.
+
+    The server runs in a child process with fake devices that answer after --latency seconds,
+    and is driven through a real MCP client, so the results measure the server's own overhead
+    (dispatch, locking, worker threads, hierarchy parsing, image encoding and the transport).
+    """
+    import json
+    from dataclasses import asdict
+
+    import anyio
+    from rich.console import Console
+
+    from .bench import FAMILIES, FakeDeviceOptions, run_bench
+    from .helpers import print_bench_report
+
+    if not re.fullmatch(r"\d+x\d+", screen.lower()):
+        raise typer.BadParameter("Screen size must be WIDTHxHEIGHT, e.g. 1080x2400", param_hint="--screen")
+    transports = [t.strip() for t in transport.split(",") if t.strip()]
+    if unknown := [t for t in transports if t not in ("stdio", "http")]:
+        raise typer.BadParameter(f"Unknown transports: {', '.join(unknown)}", param_hint="--transport")
+    family_list = [f.strip() for f in families.split(",") if f.strip()] if families else list(FAMILIES)
+    if unknown := [f for f in family_list if f not in FAMILIES]:
+        raise typer.BadParameter(f"Unknown tool families: {', '.join(unknown)}", param_hint="--families")
+
+    width, height = (int(v) for v in screen.lower().split("x"))
+    options = FakeDeviceOptions(
+        latency=latency,
+        jitter=jitter,
+        screen=(width, height),
+        hierarchy_nodes=hierarchy_nodes,
+        screenshot=screenshot,
+        hierarchy=hierarchy,
+    )
+    results = anyio.run(
+        lambda: run_bench(
+            transports,  # type: ignore[arg-type]
+            family_list,
+            calls=calls,
+            concurrency=concurrency,
+            devices=devices,
+            options=options,
+        )
+    )
+
+    rows = [result.to_dict() for result in results]
+    print_bench_report(rows, Console())
+    if json_path:
+        report = {"version": __version__, "calls": calls, "concurrency": concurrency, "devices": devices}
+        report |= {"options": asdict(options), "results": rows}
+        with open(json_path, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=2)
 
 
 @cli.command("version")
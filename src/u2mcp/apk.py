@@ -0,0 +1,333 @@
+"""Download cache and manifest reading of APK files.
+
+APKs downloaded from a URL are stored under their content hash, so installing the same build to many devices,
+or again later, downloads it once.
+A cached URL is reused as is for a short while, then revalidated with a conditional request
+(``If-None-Match``/``If-Modified-Since``), so a URL like ``.../latest.apk`` gets its new builds.
+The least recently used files are removed when the cache grows too big or too old.
+The package name and version code are read from the binary ``AndroidManifest.xml`` of the APK,
+to tell whether a device already has that build installed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import struct
+import tempfile
+import time
+import zipfile
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import anyio
+import httpx
+
+from .workers import run_sync
+
+__all__ = [
+    "ApkManifest",
+    "fetch_apk",
+    "get_apk_cache_dir",
+    "is_url",
+    "parse_binary_manifest",
+    "read_apk_manifest",
+    "set_apk_cache_dir",
+    "set_apk_cache_limits",
+]
+
+ProgressCallback = Callable[[int, int | None], Awaitable[None]]
+
+_cache_dir = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "u2mcp" / "apk"
+
+# Seconds a cached URL is reused without asking the server whether it changed
+_fresh_seconds = 60.0
+# Total size of the cached APKs, and age since their last use, beyond which the least recently used are removed
+_max_cache_bytes = 2 << 30
+_max_cache_age = 30 * 24 * 3600.0
+
+
+class _Download:
+    """The lock of a URL, held while it is fetched, and the number of fetches using it."""
+
+    def __init__(self) -> None:
+        self.lock = anyio.Lock()
+        self.users = 0
+
+
+# URLs being fetched, so that concurrent installs of the same URL share one download
+_downloads: dict[str, _Download] = {}
+
+_CHUNK_SIZE = 1 << 16
+
+
+def get_apk_cache_dir() -> Path:
+    """Get the directory where downloaded APKs are cached."""
+    return _cache_dir
+
+
+def set_apk_cache_dir(path: str | os.PathLike[str]) -> None:
+    """Set the directory where downloaded APKs are cached."""
+    global _cache_dir
+    _cache_dir = Path(path)
+
+
+def set_apk_cache_limits(
+    max_bytes: int | None = None, max_age: float | None = None, fresh_seconds: float | None = None
+) -> None:
+    """Set the limits of the APK cache. None keeps a limit unchanged.
+
+    Args:
+        max_bytes: Total size of the cached APKs, the least recently used are removed beyond it
+        max_age: Seconds since its last use after which a cached APK is removed
+        fresh_seconds: Seconds a cached URL is reused before it is revalidated with the server
+    """
+    global _max_cache_bytes, _max_cache_age, _fresh_seconds
+    if max_bytes is not None:
+        _max_cache_bytes = max_bytes
+    if max_age is not None:
+        _max_cache_age = max_age
+    if fresh_seconds is not None:
+        _fresh_seconds = fresh_seconds
+
+
+def is_url(data: str) -> bool:
+    """Whether an APK source is an http(s) URL rather than a local path."""
+    return re.match(r"^https?://", data) is not None
+
+
+def _read_index(index_path: Path) -> dict[str, dict[str, Any]]:
+    try:
+        index = json.loads(index_path.read_text("utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+    # Entries of older versions are the bare content hash
+    return {url: {"sha256": entry} if isinstance(entry, str) else entry for url, entry in index.items()}
+
+
+def _write_index(index_path: Path, index: dict[str, dict[str, Any]]) -> None:
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=index_path.parent, delete=False) as fp:
+        json.dump(index, fp)
+    os.replace(fp.name, index_path)
+
+
+def _update_index(index_path: Path, url: str, entry: dict[str, Any]) -> None:
+    index = _read_index(index_path)
+    index[url] = entry
+    _write_index(index_path, index)
+
+
+def _cached_file(cache_dir: Path, url: str) -> tuple[dict[str, Any], Path | None]:
+    """The index entry of a URL, and its cached file if that is still there."""
+    entry = _read_index(cache_dir / "index.json").get(url, {})
+    if entry and (path := cache_dir / f"{entry['sha256']}.apk").is_file():
+        return entry, path
+    return entry, None
+
+
+def _temp_file(cache_dir: Path) -> str:
+    fd, name = tempfile.mkstemp(suffix=".part", dir=cache_dir)
+    os.close(fd)
+    return name
+
+
+def _touch(path: Path) -> None:
+    # The modification time of a cached file is its last use, for the pruning
+    os.utime(path)
+
+
+def _prune(cache_dir: Path, keep: Path) -> None:
+    """Remove the cached APKs unused for too long, then the least recently used beyond the size limit."""
+    now = time.time()
+    files = sorted(((p.stat().st_mtime, p.stat().st_size, p) for p in cache_dir.glob("*.apk")), reverse=True)
+    total = 0
+    removed: set[str] = set()
+    for used, size, path in files:
+        total += size
+        if path != keep and (now - used > _max_cache_age or total > _max_cache_bytes):
+            path.unlink(missing_ok=True)
+            removed.add(path.stem)
+            total -= size
+    if removed:
+        index_path = cache_dir / "index.json"
+        index = _read_index(index_path)
+        _write_index(index_path, {url: entry for url, entry in index.items() if entry.get("sha256") not in removed})
+
+
+async def fetch_apk(url: str, progress: ProgressCallback | None = None, *, refresh: bool = False) -> Path:
+    """Download an APK into the cache, or reuse the cached download of the URL while it is current.
+
+    The file is named after the SHA-256 of its content, and an index maps each URL to its content hash
+    and to the ``ETag`` and ``Last-Modified`` of the response.
+    A cached URL is reused without a request for a short while after it was checked,
+    then revalidated with a conditional request, and downloaded again if it changed.
+
+    Args:
+        url: http(s) URL of the APK
+        progress: Called with the bytes downloaded so far and the total size (None if unknown) as the download goes
+        refresh: Download again even if the cached download is current
+
+    Returns:
+        Path of the cached APK file
+    """
+    download = _downloads.setdefault(url, _Download())
+    download.users += 1
+    try:
+        async with download.lock:
+            return await _fetch(url, progress, refresh)
+    finally:
+        download.users -= 1
+        if not download.users:
+            del _downloads[url]
+
+
+async def _fetch(url: str, progress: ProgressCallback | None, refresh: bool) -> Path:
+    cache_dir = _cache_dir
+    index_path = cache_dir / "index.json"
+    headers: dict[str, str] = {}
+    # The index and the cache directory are only touched from worker threads, to keep the event loop free
+    entry, cached = ({}, None) if refresh else await run_sync(_cached_file, cache_dir, url)
+    if cached is not None:
+        if time.time() - entry.get("checked", 0) < _fresh_seconds:
+            await run_sync(_touch, cached)
+            return cached
+        if etag := entry.get("etag"):
+            headers["If-None-Match"] = etag
+        if last_modified := entry.get("last_modified"):
+            headers["If-Modified-Since"] = last_modified
+
+    await anyio.Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    async with (
+        httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client,
+        client.stream("GET", url, headers=headers) as response,
+    ):
+        if cached is not None and response.status_code == 304:
+            await run_sync(_update_index, index_path, url, {**entry, "checked": time.time()})
+            await run_sync(_touch, cached)
+            return cached
+        response.raise_for_status()
+        total = int(response.headers["content-length"]) if "content-length" in response.headers else None
+        sha256 = hashlib.sha256()
+        temp_name = await run_sync(_temp_file, cache_dir)
+        try:
+            received = 0
+            async with await anyio.open_file(temp_name, "wb") as fp:
+                async for chunk in response.aiter_bytes(_CHUNK_SIZE):
+                    await fp.write(chunk)
+                    sha256.update(chunk)
+                    received += len(chunk)
+                    if progress is not None:
+                        await progress(received, total)
+            digest = sha256.hexdigest()
+            path = cache_dir / f"{digest}.apk"
+            await run_sync(os.replace, temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+    entry = {"sha256": digest, "checked": time.time()}
+    if etag := response.headers.get("etag"):
+        entry["etag"] = etag
+    if last_modified := response.headers.get("last-modified"):
+        entry["last_modified"] = last_modified
+    await run_sync(_update_index, index_path, url, entry)
+    await run_sync(_prune, cache_dir, path)
+    return path
+
+
+@dataclass(frozen=True, slots=True)
+class ApkManifest:
+    """Identity of an APK, as declared in its manifest."""
+
+    package_name: str
+    version_code: int | None
+
+
+# Chunk types of the binary XML format
+_RES_STRING_POOL_TYPE = 0x0001
+_RES_XML_RESOURCE_MAP_TYPE = 0x0180
+_RES_XML_START_ELEMENT_TYPE = 0x0102
+_UTF8_FLAG = 1 << 8
+# Value types of attributes
+_TYPE_STRING = 0x03
+_TYPE_INT_DEC = 0x10
+_TYPE_INT_HEX = 0x11
+# Resource ids of manifest attributes, for APKs with obfuscated attribute names
+_ATTR_VERSION_CODE = 0x0101021B
+
+
+def _read_string_pool(data: bytes, offset: int) -> list[str]:
+    header_size, _ = struct.unpack_from("<HI", data, offset + 2)
+    count, _, flags, strings_start = struct.unpack_from("<IIII", data, offset + 8)
+    utf8 = bool(flags & _UTF8_FLAG)
+    strings: list[str] = []
+    for i in range(count):
+        (string_offset,) = struct.unpack_from("<I", data, offset + header_size + i * 4)
+        pos = offset + strings_start + string_offset
+        if utf8:
+            # UTF-16 length, then UTF-8 length, each one or two bytes
+            pos += 2 if data[pos] & 0x80 else 1
+            length = data[pos]
+            if length & 0x80:
+                length = ((length & 0x7F) << 8) | data[pos + 1]
+                pos += 1
+            pos += 1
+            strings.append(data[pos : pos + length].decode("utf-8", "replace"))
+        else:
+            (length,) = struct.unpack_from("<H", data, pos)
+            pos += 2
+            if length & 0x8000:
+                (low,) = struct.unpack_from("<H", data, pos)
+                length = ((length & 0x7FFF) << 16) | low
+                pos += 2
+            strings.append(data[pos : pos + length * 2].decode("utf-16-le", "replace"))
+    return strings
+
+
+def parse_binary_manifest(data: bytes) -> ApkManifest:
+    """Read the package name and version code from a binary ``AndroidManifest.xml``."""
+    if len(data) < 8 or struct.unpack_from("<H", data)[0] != 0x0003:
+        raise ValueError("Not a binary XML document")
+    strings: list[str] = []
+    resource_ids: tuple[int, ...] = ()
+    offset = struct.unpack_from("<H", data, 2)[0]
+    while offset + 8 <= len(data):
+        chunk_type, header_size, chunk_size = struct.unpack_from("<HHI", data, offset)
+        if chunk_size < 8:
+            break
+        if chunk_type == _RES_STRING_POOL_TYPE:
+            strings = _read_string_pool(data, offset)
+        elif chunk_type == _RES_XML_RESOURCE_MAP_TYPE:
+            count = (chunk_size - header_size) // 4
+            resource_ids = struct.unpack_from(f"<{count}I", data, offset + header_size)
+        elif chunk_type == _RES_XML_START_ELEMENT_TYPE:
+            ext = offset + header_size
+            _, name, attribute_start, attribute_size, attribute_count = struct.unpack_from("<IIHHH", data, ext)
+            if strings[name] != "manifest":
+                raise ValueError("The root element is not <manifest>")
+            package_name, version_code = "", None
+            for i in range(attribute_count):
+                attr = ext + attribute_start + i * attribute_size
+                _, attr_name, _, _, _, value_type, value = struct.unpack_from("<IIIHBBI", data, attr)
+                resource_id = resource_ids[attr_name] if attr_name < len(resource_ids) else None
+                if strings[attr_name] == "package" and value_type == _TYPE_STRING:
+                    package_name = strings[value]
+                elif strings[attr_name] == "versionCode" or resource_id == _ATTR_VERSION_CODE:
+                    if value_type in (_TYPE_INT_DEC, _TYPE_INT_HEX):
+                        version_code = value
+                    elif value_type == _TYPE_STRING and strings[value].isdigit():
+                        version_code = int(strings[value])
+            return ApkManifest(package_name, version_code)
+        offset += chunk_size
+    raise ValueError("No <manifest> element found")
+
+
+def read_apk_manifest(path: str | os.PathLike[str]) -> ApkManifest:
+    """Read the package name and version code of an APK file."""
+    with zipfile.ZipFile(path) as zf:
+        data = zf.read("AndroidManifest.xml")
+    return parse_binary_manifest(data)
@@ -0,0 +1,10 @@
+"""Benchmarks of the server's own overhead, against fake devices with a configurable latency.
+
+The server runs in a child process, as it would in production, and is driven through a real MCP client
+over stdio or HTTP. See ``u2mcp bench``.
+"""
+
+from .fake import FakeBackend, FakeDevice, FakeDeviceOptions, install_fake_backend
+from .runner import FAMILIES, FamilyResult, run_bench
+
+__all__ = ["FAMILIES", "FakeBackend", "FakeDevice", "FakeDeviceOptions", "FamilyResult", "install_fake_backend", "run_bench"]
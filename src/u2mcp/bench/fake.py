@@ -0,0 +1,227 @@
+"""A simulated uiautomator2 backend: devices that answer after a configurable latency, with recorded or synthetic payloads.
+
+Only the device calls the tools make are simulated. Element lookups go through the real xpath engine of uiautomator2,
+over the hierarchy of the fake device, so their parsing cost is measured too.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import uiautomator2 as u2
+from PIL import Image as PILImage
+from PIL import ImageDraw
+from PIL.Image import Image
+from uiautomator2.xpath import XPathEntry
+
+__all__ = [
+    "FakeBackend",
+    "FakeDevice",
+    "FakeDeviceOptions",
+    "install_fake_backend",
+    "synthetic_hierarchy",
+    "synthetic_screenshot",
+]
+
+PACKAGE = "com.example.bench"
+ACTIVITY = ".MainActivity"
+
+
+@dataclass(frozen=True, slots=True)
+class FakeDeviceOptions:
+    """How fake devices behave.
+
+    Attributes:
+        latency: Seconds each device call takes
+        jitter: Each call takes up to this many seconds more or less than ``latency``
+        screen: Width and height of synthetic screenshots
+        hierarchy_nodes: Number of nodes of the synthetic hierarchy
+        screenshot: A recorded screenshot image file, replayed instead of the synthetic one
+        hierarchy: A recorded hierarchy XML file, replayed instead of the synthetic one
+    """
+
+    latency: float = 0.005
+    jitter: float = 0.002
+    screen: tuple[int, int] = (1080, 2400)
+    hierarchy_nodes: int = 300
+    screenshot: str | None = None
+    hierarchy: str | None = None
+
+
+def synthetic_screenshot(width: int, height: int, seed: int = 0) -> Image:
+    """An app-like screenshot: a status bar, and rows of colored cards with some noise so that it does not compress to nothing."""
+    rng = random.Random(seed)
+    im = PILImage.new("RGB", (width, height), (250, 250, 250))
+    draw = ImageDraw.Draw(im)
+    draw.rectangle((0, 0, width, height // 30), fill=(33, 33, 33))
+    row = height // 12
+    for top in range(height // 30, height, row):
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        draw.rounded_rectangle((width // 30, top + 8, width - width // 30, top + row - 8), radius=16, fill=color)
+        for _ in range(40):
+            x, y = rng.randrange(width), rng.randrange(top, min(top + row, height))
+            draw.line((x, y, x + rng.randrange(80), y), fill=(rng.randrange(256),) * 3, width=3)
+    return im
+
+
+def synthetic_hierarchy(nodes: int, width: int = 1080, height: int = 2400) -> str:
+    """A hierarchy of a scrolling list: layout containers, each holding a clickable item with a text and an icon.
+
+    Items are ``com.example.bench:id/item_<n>`` with text ``Item <n>``, counting from 0.
+    """
+    items = max(1, (nodes - 3) // 3)
+    row = max(1, height // max(items, 1))
+    lines = [
+        "<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>",
+        '<hierarchy rotation="0">',
+        (
+            f'<node index="0" text="" resource-id="" class="android.widget.FrameLayout" package="{PACKAGE}" '
+            f'content-desc="" clickable="false" enabled="true" bounds="[0,0][{width},{height}]">'
+        ),
+        (
+            f'<node index="0" text="" resource-id="{PACKAGE}:id/list" class="androidx.recyclerview.widget.RecyclerView" '
+            f'package="{PACKAGE}" content-desc="" scrollable="true" enabled="true" bounds="[0,0][{width},{height}]">'
+        ),
+    ]
+    for i in range(items):
+        top, bottom = i * row, (i + 1) * row
+        lines.append(
+            f'<node index="{i}" text="" resource-id="" class="android.widget.LinearLayout" package="{PACKAGE}" '
+            f'content-desc="" clickable="false" enabled="true" bounds="[0,{top}][{width},{bottom}]">'
+        )
+        lines.append(
+            f'<node index="0" text="Item {i}" resource-id="{PACKAGE}:id/item_{i}" class="android.widget.TextView" '
+            f'package="{PACKAGE}" content-desc="" clickable="true" enabled="true" bounds="[40,{top}][{width - 200},{bottom}]" />'
+        )
+        lines.append(
+            f'<node index="1" text="" resource-id="{PACKAGE}:id/icon_{i}" class="android.widget.ImageView" '
+            f'package="{PACKAGE}" content-desc="Icon {i}" clickable="false" enabled="true" '
+            f'bounds="[{width - 160},{top}][{width - 40},{bottom}]" />'
+        )
+        lines.append("</node>")
+    lines.extend(["</node>", "</node>", "</hierarchy>"])
+    return "\n".join(lines)
+
+
+class FakeDevice:
+    """A uiautomator2 device whose every call sleeps for the configured latency."""
+
+    wait_timeout = 20.0
+
+    def __init__(self, serial: str, options: FakeDeviceOptions, screenshot: Image, hierarchy: str):
+        self.serial = serial
+        self._options = options
+        self._screenshot = screenshot
+        self._hierarchy = hierarchy
+        self._rng = random.Random(serial)
+        self.clipboard = ""
+        self.xpath = XPathEntry(self)  # type: ignore[arg-type]
+        self.adb_device = SimpleNamespace(shell2=self._shell2)
+
+    def _delay(self) -> None:
+        latency = self._options.latency + self._rng.uniform(-self._options.jitter, self._options.jitter)
+        if latency > 0:
+            time.sleep(latency)
+
+    @property
+    def info(self) -> dict[str, Any]:
+        self._delay()
+        width, height = self._screenshot.size
+        return {
+            "currentPackageName": PACKAGE,
+            "displayWidth": width,
+            "displayHeight": height,
+            "displayRotation": 0,
+            "productName": "bench",
+            "screenOn": True,
+            "sdkInt": 34,
+        }
+
+    @property
+    def device_info(self) -> dict[str, Any]:
+        self._delay()
+        return {"serial": self.serial, "model": "bench", "sdk": 34, "version": "14"}
+
+    def window_size(self) -> tuple[int, int]:
+        self._delay()
+        return self._screenshot.size
+
+    def screenshot(self, display_id: int | None = None, **kwargs: Any) -> Image:
+        self._delay()
+        return self._screenshot.copy()
+
+    def dump_hierarchy(self, compressed: bool = False, pretty: bool = False, max_depth: int | None = None) -> str:
+        self._delay()
+        return self._hierarchy
+
+    def _shell2(self, command: str, timeout: float | None = None) -> SimpleNamespace:
+        self._delay()
+        return SimpleNamespace(returncode=0, output=f"{command}\n")
+
+    def _action(self, *args: Any, **kwargs: Any) -> None:
+        self._delay()
+
+    click = long_click = double_click = swipe = swipe_points = drag = press = _action
+    send_keys = clear_text = screen_on = screen_off = hide_keyboard = set_clipboard = _action
+    app_start = app_stop = app_clear = app_install = app_auto_grant_permissions = _action
+
+    def app_current(self) -> dict[str, Any]:
+        self._delay()
+        return {"package": PACKAGE, "activity": ACTIVITY, "pid": 4242}
+
+    def app_list_running(self) -> list[str]:
+        self._delay()
+        return [PACKAGE, "com.android.systemui"]
+
+    def app_list(self, filter: str | None = None) -> list[str]:
+        self._delay()
+        return [PACKAGE, "com.android.settings", "com.android.chrome"]
+
+    def app_info(self, package_name: str) -> dict[str, Any]:
+        self._delay()
+        if package_name != PACKAGE:
+            raise u2.exceptions.AppNotFoundError(package_name)
+        return {"packageName": PACKAGE, "versionName": "1.0", "versionCode": 1}
+
+    def app_stop_all(self, excludes: list[str] | None = None) -> list[str]:
+        self._delay()
+        return []
+
+
+class FakeBackend:
+    """Stands in for the ``uiautomator2`` and ``adbutils.adb`` modules, handing out a fake device per serial."""
+
+    ConnectError = u2.ConnectError
+
+    def __init__(self, options: FakeDeviceOptions, serials: list[str] | None = None):
+        self.options = options
+        self.serials = serials or ["bench-0"]
+        if options.screenshot:
+            with PILImage.open(options.screenshot) as im:
+                self._screenshot = im.convert("RGB")
+        else:
+            self._screenshot = synthetic_screenshot(*options.screen)
+        if options.hierarchy:
+            self._hierarchy = Path(options.hierarchy).read_text("utf-8")
+        else:
+            self._hierarchy = synthetic_hierarchy(options.hierarchy_nodes, *self._screenshot.size)
+
+    def connect(self, serial: str | None = None) -> FakeDevice:
+        return FakeDevice(serial or self.serials[0], self.options, self._screenshot, self._hierarchy)
+
+    def device_list(self) -> list[SimpleNamespace]:
+        return [SimpleNamespace(serial=serial, info={"serial": serial, "state": "device"}) for serial in self.serials]
+
+
+def install_fake_backend(backend: FakeBackend) -> None:
+    """Make the tools connect to fake devices instead of real ones. Tools must be registered by ``make_mcp`` first."""
+    from ..tools import device, fanout
+
+    device.u2 = backend  # type: ignore[assignment]
+    device.adb = backend  # type: ignore[assignment]
+    fanout.adb = backend  # type: ignore[assignment]
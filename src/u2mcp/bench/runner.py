@@ -0,0 +1,238 @@
+"""Drive the benchmark server through a real MCP client, one tool family at a time, and time each call."""
+
+from __future__ import annotations
+
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Literal
+
+import anyio
+import httpx
+from fastmcp import Client
+from fastmcp.client.transports import StdioTransport
+
+from .fake import PACKAGE, FakeDeviceOptions
+
+__all__ = ["FAMILIES", "FamilyResult", "run_bench"]
+
+Transport = Literal["stdio", "http"]
+
+_CLICKABLE = "//*[@clickable='true']"
+
+# Tool family -> the calls made in turn, with their arguments but the serial
+FAMILIES: dict[str, list[tuple[str, dict[str, Any]]]] = {
+    "action": [
+        ("click", {"x": 540, "y": 1200}),
+        ("swipe", {"fx": 540, "fy": 1800, "tx": 540, "ty": 600}),
+        ("press_key", {"key": "back"}),
+    ],
+    "input": [
+        ("send_text", {"text": "benchmark"}),
+        ("clear_text", {}),
+    ],
+    "device": [
+        ("info", {}),
+        ("window_size", {}),
+        ("screenshot", {"max_width": 540}),
+        ("dump_hierarchy", {"format": "text"}),
+    ],
+    "element": [
+        ("element_get_text", {"xpath": _CLICKABLE}),
+        ("element_query_many", {"xpaths": [_CLICKABLE, "//android.widget.ImageView"]}),
+        ("element_click", {"xpath": _CLICKABLE, "timeout": 0}),
+    ],
+    "app": [
+        ("app_current", {}),
+        ("app_list_running", {}),
+        ("app_info", {"package_name": PACKAGE}),
+    ],
+    "batch": [
+        (
+            "run_actions",
+            {
+                "actions": [
+                    {"action": "element_click", "xpath": _CLICKABLE, "timeout": 0},
+                    {"action": "send_text", "text": "benchmark", "clear": True},
+                    {"action": "press_key", "key": "enter"},
+                    {"action": "swipe", "fx": 540, "fy": 1800, "tx": 540, "ty": 600},
+                ]
+            },
+        ),
+    ],
+}
+
+
+@dataclass(frozen=True, slots=True)
+class FamilyResult:
+    """Timings of the calls of one tool family over one transport. Latencies are in seconds."""
+
+    transport: str
+    family: str
+    calls: int
+    errors: int
+    seconds: float
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    peak_rss: int | None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def _server_args(options: FakeDeviceOptions, devices: int) -> list[str]:
+    args = [
+        "-m",
+        "u2mcp.bench.server",
+        "--devices",
+        str(devices),
+        "--latency",
+        str(options.latency),
+        "--jitter",
+        str(options.jitter),
+        "--screen",
+        "x".join(map(str, options.screen)),
+        "--hierarchy-nodes",
+        str(options.hierarchy_nodes),
+    ]
+    if options.screenshot:
+        args += ["--screenshot", options.screenshot]
+    if options.hierarchy:
+        args += ["--hierarchy", options.hierarchy]
+    return args
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def _connect(transport: Transport, server_args: list[str], startup_timeout: float = 30.0) -> AsyncIterator[Client]:
+    """Start the benchmark server in a child process, and connect a client to it."""
+    if transport == "stdio":
+        stdio = StdioTransport(sys.executable, server_args, env=dict(os.environ), keep_alive=False, log_file=Path(os.devnull))
+        async with Client(stdio) as client:
+            yield client
+        return
+
+    port = _free_port()
+    process = await anyio.open_process(
+        [sys.executable, *server_args, "--transport", "http", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/mcp"
+    try:
+        with anyio.fail_after(startup_timeout):
+            async with httpx.AsyncClient() as http:
+                while True:
+                    if process.returncode is not None:
+                        raise RuntimeError(f"Benchmark server exited with code {process.returncode}")
+                    try:
+                        await http.get(url)
+                        break
+                    except httpx.TransportError:
+                        await anyio.sleep(0.1)
+        async with Client(url) as client:
+            yield client
+    finally:
+        process.terminate()
+        with anyio.move_on_after(5, shield=True):
+            await process.wait()
+        if process.returncode is None:
+            process.kill()
+
+
+async def _run_family(
+    client: Client, transport: str, family: str, calls: int, concurrency: int, serials: list[str]
+) -> FamilyResult:
+    steps = FAMILIES[family]
+    # Warm up: connect to every device and fill the caches a long-running server would have
+    for serial in serials:
+        for name, arguments in steps:
+            await client.call_tool(name, {"serial": serial, **arguments}, raise_on_error=False)
+
+    latencies: list[float] = []
+    errors = 0
+    indexes = iter(range(calls))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in indexes:
+            name, arguments = steps[i % len(steps)]
+            started = time.perf_counter()
+            result = await client.call_tool(name, {"serial": serials[i % len(serials)], **arguments}, raise_on_error=False)
+            latencies.append(time.perf_counter() - started)
+            errors += result.is_error
+
+    started = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for _ in range(concurrency):
+            tg.start_soon(worker)
+    seconds = time.perf_counter() - started
+
+    stats = await client.call_tool("bench_stats", {})
+    latencies.sort()
+    return FamilyResult(
+        transport=transport,
+        family=family,
+        calls=len(latencies),
+        errors=errors,
+        seconds=seconds,
+        throughput=len(latencies) / seconds if seconds else 0.0,
+        p50=_percentile(latencies, 0.5),
+        p95=_percentile(latencies, 0.95),
+        p99=_percentile(latencies, 0.99),
+        peak_rss=stats.data["peak_rss"] if stats.data else None,
+    )
+
+
+async def run_bench(
+    transports: list[Transport],
+    families: list[str] | None = None,
+    *,
+    calls: int = 200,
+    concurrency: int = 4,
+    devices: int = 1,
+    options: FakeDeviceOptions | None = None,
+) -> list[FamilyResult]:
+    """Benchmark tool families against fake devices, over each transport.
+
+    Each transport gets a fresh server process, whose families are then run one after the other.
+
+    Args:
+        transports: "stdio" and/or "http"
+        families: Names of :data:`FAMILIES` to run, all of them if None
+        calls: Number of timed calls per family, after one warm-up call of each tool on each device
+        concurrency: Number of calls in flight at the same time
+        devices: Number of fake devices, which the calls go to in turn
+        options: Latency and payloads of the fake devices
+
+    Returns:
+        One result per transport and family. ``peak_rss`` is the peak memory of the server process so far.
+    """
+    families = list(FAMILIES) if families is None else families
+    if unknown := [family for family in families if family not in FAMILIES]:
+        raise ValueError(f"Unknown tool families: {', '.join(unknown)}. Choose from: {', '.join(FAMILIES)}")
+    server_args = _server_args(options or FakeDeviceOptions(), devices)
+    serials = [f"bench-{i}" for i in range(devices)]
+    results: list[FamilyResult] = []
+    for transport in transports:
+        async with _connect(transport, server_args) as client:
+            for family in families:
+                results.append(await _run_family(client, transport, family, calls, concurrency, serials))
+    return results
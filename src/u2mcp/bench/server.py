@@ -0,0 +1,74 @@
+"""The MCP server under benchmark, with fake devices: ``python -m u2mcp.bench.server --transport stdio|http``.
+
+It is the same server as ``u2mcp stdio`` or ``u2mcp http``, with its tools connecting to fake devices,
+and one more tool, ``bench_stats``, reporting the memory of the server process.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from typing import Any
+
+from .fake import FakeBackend, FakeDeviceOptions, install_fake_backend
+
+__all__ = ["main", "peak_rss"]
+
+
+def peak_rss() -> int | None:
+    """Peak resident set size of this process in bytes, or None where it cannot be measured."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m u2mcp.bench.server", description=__doc__)
+    parser.add_argument("--transport", choices=("stdio", "http"), default="stdio")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--devices", type=int, default=1, help="number of fake devices, serials bench-0, bench-1 ...")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds each device call takes")
+    parser.add_argument("--jitter", type=float, default=0.002, help="seconds of uniform jitter around the latency")
+    parser.add_argument("--screen", default="1080x2400", help="size of synthetic screenshots, WIDTHxHEIGHT")
+    parser.add_argument("--hierarchy-nodes", type=int, default=300, help="number of nodes of the synthetic hierarchy")
+    parser.add_argument("--screenshot", help="recorded screenshot to replay instead of a synthetic one")
+    parser.add_argument("--hierarchy", help="recorded hierarchy XML to replay instead of a synthetic one")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _parse_args(argv)
+    width, height = (int(v) for v in args.screen.lower().split("x"))
+    options = FakeDeviceOptions(
+        latency=args.latency,
+        jitter=args.jitter,
+        screen=(width, height),
+        hierarchy_nodes=args.hierarchy_nodes,
+        screenshot=args.screenshot,
+        hierarchy=args.hierarchy,
+    )
+    logging.basicConfig(level=logging.WARNING, handlers=[logging.StreamHandler()], force=True)
+
+    from ..mcp import make_mcp
+
+    mcp = make_mcp()
+    install_fake_backend(FakeBackend(options, [f"bench-{i}" for i in range(args.devices)]))
+
+    @mcp.tool("bench_stats")
+    async def bench_stats() -> dict[str, Any]:
+        """Memory of the benchmarked server process"""
+        return {"peak_rss": peak_rss()}
+
+    if args.transport == "stdio":
+        mcp.run(transport="stdio", show_banner=False, log_level="warning")
+    else:
+        mcp.run(transport="streamable-http", host="127.0.0.1", port=args.port, show_banner=False, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
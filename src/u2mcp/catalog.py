@@ -0,0 +1,190 @@
+"""A catalog of the tools: names, tags, parsed docstrings and parameter schemas, cached on disk.
+
+``u2mcp tools``, ``u2mcp info``, ``u2mcp tags``, shell completion and the wildcard expansion of tag filters
+read the catalog instead of registering every tool and parsing every docstring again.
+The cache is written the first time the server or one of those commands runs,
+and is keyed by the package version and the tool modules, so upgrading or editing a tool rebuilds it.
+
+This module does not import fastmcp, so reading a fresh catalog is fast.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from .version import __version__
+
+if TYPE_CHECKING:
+    from fastmcp import FastMCP
+
+__all__ = [
+    "build_catalog",
+    "catalog_tags",
+    "get_catalog_path",
+    "load_catalog",
+    "read_catalog",
+    "save_catalog",
+    "set_catalog_path",
+]
+
+# Bumped when the layout of the catalog changes
+CATALOG_FORMAT = 1
+
+_catalog_path = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "u2mcp" / "tool-catalog.json"
+
+
+def get_catalog_path() -> Path:
+    """Get the file where the tool catalog is cached."""
+    return _catalog_path
+
+
+def set_catalog_path(path: str | os.PathLike[str]) -> None:
+    """Set the file where the tool catalog is cached."""
+    global _catalog_path
+    _catalog_path = Path(path)
+
+
+def _fingerprint() -> str:
+    """Key of the catalog: the package version, and the size and modification time of the modules defining tools.
+
+    Development installs keep their version while tools are edited, hence the modules.
+    """
+    digest = hashlib.sha256(f"{CATALOG_FORMAT}:{__version__}".encode())
+    package = Path(__file__).parent
+    for path in sorted([package / "mcp.py", *(package / "tools").glob("*.py")]):
+        stat = path.stat()
+        digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def _tool_markdown(tags: list[str], parsed: Any) -> str:
+    """Help of a tool in markdown: tags, description, and Google-style Args/Returns."""
+    md_lines = []
+
+    # Short description
+    if parsed.short_description:
+        md_lines.append(parsed.short_description)
+
+    # Long description
+    if parsed.long_description:
+        md_lines.append(parsed.long_description)
+
+    # Args section
+    if parsed.params:
+        md_lines.append("\n**Args:**")
+        for p in parsed.params:
+            type_suffix = f" ({p.type_name})" if p.type_name else ""
+            default_suffix = f"(default: `{p.default}`)" if p.default else ""
+            md_lines.append(f"- **{p.arg_name}**{type_suffix}: {p.description}{default_suffix}")
+
+    # Returns section
+    if parsed.returns:
+        md_lines.append("\n**Returns:**")
+        r = parsed.returns
+        if r.type_name:
+            md_lines.append(f"**{r.type_name}**")
+        if r.description:
+            md_lines.append(r.description)
+
+    # Tags as plain text above the description
+    tags_str = f"**Tags:** {', '.join(tags)}" if tags else ""
+    return tags_str + "\n\n" + "\n".join(md_lines) if tags_str else "\n".join(md_lines)
+
+
+def build_catalog(instance: FastMCP) -> dict[str, Any]:
+    """Build the catalog of the tools registered on a server.
+
+    Returns:
+        dict[str,Any]: The catalog, with the following keys:
+            - fingerprint (str): Key of the cache, see :func:`read_catalog`
+            - version (str): Package version
+            - tools (dict[str,dict]): Tools by name, each with:
+              tags (list[str]), summary (str), description (str), params (list of dicts with
+              name, type, description, default), returns (dict with type and description, or None),
+              parameters (the JSON schema of the arguments) and markdown (the help shown by ``u2mcp info``)
+    """
+    from docstring_parser import parse
+
+    tools: dict[str, Any] = {}
+    for tool in sorted(instance._tool_manager._tools.values(), key=lambda t: t.name):
+        description = tool.description or ""
+        parsed = parse(description)
+        tags = sorted(tool.tags or ())
+        returns = parsed.returns
+        tools[tool.name] = {
+            "tags": tags,
+            "summary": parsed.short_description or description,
+            "description": description,
+            "params": [
+                {"name": p.arg_name, "type": p.type_name, "description": p.description, "default": p.default}
+                for p in parsed.params
+            ],
+            "returns": {"type": returns.type_name, "description": returns.description} if returns else None,
+            "parameters": tool.parameters,
+            "markdown": _tool_markdown(tags, parsed),
+        }
+    return {"fingerprint": _fingerprint(), "version": __version__, "tools": tools}
+
+
+def read_catalog() -> dict[str, Any] | None:
+    """Read the cached catalog, or None if there is none or it was built for another version or other tool modules."""
+    try:
+        with open(_catalog_path, encoding="utf-8") as fp:
+            catalog = json.load(fp)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(catalog, dict) or catalog.get("fingerprint") != _fingerprint():
+        return None
+    return catalog
+
+
+def save_catalog(catalog: dict[str, Any]) -> bool:
+    """Write the catalog to the cache, atomically. A read-only cache directory is not an error.
+
+    Returns:
+        bool: Whether it was written
+    """
+    try:
+        _catalog_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(suffix=".part", dir=_catalog_path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump(catalog, fp, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_name, _catalog_path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+    except OSError:
+        return False
+    return True
+
+
+def load_catalog(instance: FastMCP | None = None) -> dict[str, Any]:
+    """Get the catalog from the cache, building and caching it if it is missing or stale.
+
+    Args:
+        instance: The server whose tools to build the catalog from.
+            If None, and the cache is stale, the server is made with :func:`u2mcp.mcp.make_mcp`.
+    """
+    if (catalog := read_catalog()) is not None:
+        return catalog
+    if instance is None:
+        from .mcp import make_mcp
+
+        # make_mcp loads the catalog itself, so it is usually cached now
+        instance = make_mcp()
+        if (catalog := read_catalog()) is not None:
+            return catalog
+    catalog = build_catalog(instance)
+    save_catalog(catalog)
+    return catalog
+
+
+def catalog_tags(catalog: dict[str, Any]) -> set[str]:
+    """All the tags of the tools of a catalog."""
+    return {tag for tool in catalog["tools"].values() for tag in tool["tags"]}
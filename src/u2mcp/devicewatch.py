@@ -0,0 +1,281 @@
+"""The devices known to the adb server, kept current by a background task instead of asked for on every call.
+
+The device watcher holds a ``host:track-devices-l`` connection to the adb server open, the one adbutils'
+``track_devices`` uses: the server sends the full list of devices at once, then again each time a device is
+attached, detached or changes state. The watcher keeps that list in memory, and tells the device registry
+when a device becomes ready or goes away, so connections are opened before they are needed
+and dropped as soon as their device is gone.
+
+Each list is a 4 hex digit length followed by one line per device: the serial, the state, then ``key:value``
+properties such as ``usb:1-1`` or ``model:Pixel_7``.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Callable, Coroutine
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from anyio import (
+    TASK_STATUS_IGNORED,
+    BrokenResourceError,
+    CancelScope,
+    EndOfStream,
+    IncompleteRead,
+    create_task_group,
+    sleep,
+)
+from anyio.abc import ByteReceiveStream, SocketStream, TaskGroup, TaskStatus
+from anyio.streams.buffered import BufferedByteReceiveStream
+from fastmcp.utilities.logging import get_logger
+
+from .lazy import lazy_import
+from .workers import run_sync
+
+if TYPE_CHECKING:
+    import adbutils
+else:
+    adbutils = lazy_import("adbutils")
+
+__all__ = [
+    "DeviceSource",
+    "DeviceWatcher",
+    "TrackedDevice",
+    "adb_track_devices",
+    "get_device_source",
+    "get_device_watcher",
+    "parse_devices",
+    "read_device_lists",
+    "set_device_source",
+    "watch_devices",
+]
+
+DeviceSource = Callable[[], AbstractAsyncContextManager[ByteReceiveStream]]
+"""Opens the device tracking stream of the adb server."""
+
+_MAX_RECONNECT_DELAY = 30.0
+
+# Detached devices remembered, so a call for one fails at once instead of trying to connect
+_MAX_ABSENT = 64
+
+_logger = get_logger(__name__)
+
+
+@dataclass(slots=True)
+class TrackedDevice:
+    """A device known to the adb server."""
+
+    serial: str
+    state: str
+    """``device`` when ready, else ``offline``, ``unauthorized``, ``recovery``, ... or ``absent`` once detached"""
+    properties: dict[str, str] = field(default_factory=dict)
+    since: float = field(default_factory=time.time)
+    """Time it entered its state"""
+
+    @property
+    def devpath(self) -> str:
+        return f"usb:{self.properties['usb']}" if "usb" in self.properties else "unknown"
+
+    def info(self) -> dict[str, Any]:
+        """The same information as ``adbutils.AdbDevice.info``."""
+        return {"serialno": self.serial, "devpath": self.devpath, "state": self.state}
+
+
+def parse_devices(text: str) -> dict[str, TrackedDevice]:
+    """Parse a device list of ``host:track-devices-l``, or ``host:track-devices`` without properties."""
+    devices = {}
+    for line in text.splitlines():
+        if "\t" in line:
+            serial, rest = line.split("\t", 1)
+        elif len(fields := line.split(None, 1)) == 2:
+            serial, rest = fields
+        else:
+            continue
+        # The state may have spaces ("no permissions ..."), the properties never do
+        words = rest.split()
+        properties = dict(word.split(":", 1) for word in words if ":" in word)
+        state = " ".join(word for word in words if ":" not in word)
+        devices[serial.strip()] = TrackedDevice(serial.strip(), state, properties)
+    return devices
+
+
+async def read_device_lists(stream: BufferedByteReceiveStream) -> AsyncIterator[dict[str, TrackedDevice]]:
+    """Read the device lists of a tracking stream, until it ends."""
+    while True:
+        try:
+            header = await stream.receive_exactly(4)
+        except (EndOfStream, IncompleteRead):
+            return
+        try:
+            size = int(header, 16)
+        except ValueError:
+            raise ValueError(f"Invalid device list length: {header!r}") from None
+        data = await stream.receive_exactly(size) if size else b""
+        yield parse_devices(data.decode("utf-8", "replace"))
+
+
+@asynccontextmanager
+async def adb_track_devices() -> AsyncGenerator[ByteReceiveStream]:
+    """Open the device tracking stream of the adb server, starting the server if needed."""
+    connection = await run_sync(adbutils.adb.make_connection)
+    try:
+        await run_sync(connection.send_command, "host:track-devices-l")
+        await run_sync(connection.check_okay)
+        stream = await SocketStream.from_socket(connection.conn)
+    except BaseException:
+        connection.close()
+        raise
+    async with stream:
+        yield stream
+
+
+class DeviceWatcher:
+    """Keeps the table of the devices of the adb server current, from its tracking stream.
+
+    The stream is reopened, with an exponential backoff, when it ends or fails.
+    """
+
+    def __init__(
+        self,
+        source: DeviceSource,
+        *,
+        on_attached: Callable[[str], Coroutine[Any, Any, None]] | None = None,
+        on_detached: Callable[[str], None] | None = None,
+        reconnect_delay: float = 1.0,
+    ) -> None:
+        """
+        Args:
+            source: Opens the tracking stream
+            on_attached: Called, in a task of its own, with the serial of a device that became ready
+            on_detached: Called with the serial of a ready device that went away or changed state
+            reconnect_delay: Seconds to wait before reopening a stream that ended, doubled after each failure
+        """
+        self.devices: dict[str, TrackedDevice] = {}
+        self.error: str | None = None
+        self._source = source
+        self._on_attached = on_attached
+        self._on_detached = on_detached
+        self._reconnect_delay = reconnect_delay
+        self._synced = False
+        self._scope = CancelScope()
+
+    @property
+    def synced(self) -> bool:
+        """Whether the table is current: the stream is open and its first list was read."""
+        return self._synced
+
+    def get(self, serial: str) -> TrackedDevice | None:
+        """Get a device, if the adb server knows it or detached it lately."""
+        return self.devices.get(serial)
+
+    def ready(self) -> list[TrackedDevice]:
+        """The devices in the ``device`` state."""
+        return [device for device in self.devices.values() if device.state == "device"]
+
+    async def run(self, *, task_status: TaskStatus[DeviceWatcher] = TASK_STATUS_IGNORED) -> None:
+        """Watch the devices until stopped. Started with the watcher itself."""
+        try:
+            with self._scope:
+                async with create_task_group() as tg:
+                    task_status.started(self)
+                    await self._watch(tg)
+        finally:
+            self._synced = False
+
+    def stop(self) -> None:
+        """Stop watching the devices."""
+        self._scope.cancel()
+
+    def _apply(self, devices: dict[str, TrackedDevice], tg: TaskGroup) -> None:
+        now = time.time()
+        for serial, old in list(self.devices.items()):
+            if serial not in devices and old.state != "absent":
+                self.devices[serial] = TrackedDevice(serial, "absent", old.properties, now)
+                if old.state == "device":
+                    self._detached(serial)
+        for serial, device in devices.items():
+            known = self.devices.get(serial)
+            if known is not None and known.state == device.state:
+                known.properties = device.properties
+                continue
+            self.devices[serial] = device
+            if known is not None and known.state == "device":
+                self._detached(serial)
+            elif device.state == "device" and self._on_attached is not None:
+                tg.start_soon(self._attached, self._on_attached, serial)
+        absent = sorted((d for d in self.devices.values() if d.state == "absent"), key=lambda d: d.since)
+        for device in absent[: max(0, len(absent) - _MAX_ABSENT)]:
+            del self.devices[device.serial]
+
+    async def _attached(self, on_attached: Callable[[str], Coroutine[Any, Any, None]], serial: str) -> None:
+        try:
+            await on_attached(serial)
+        except Exception:
+            # A callback failing for one device must not stop the watcher, nor the server with it
+            _logger.exception("failed to handle the attached device %s", serial)
+
+    def _detached(self, serial: str) -> None:
+        _logger.info("device %s detached (%s)", serial, self.devices[serial].state)
+        if self._on_detached is not None:
+            try:
+                self._on_detached(serial)
+            except Exception:
+                _logger.exception("failed to handle the detached device %s", serial)
+
+    async def _watch(self, tg: TaskGroup) -> None:
+        delay = self._reconnect_delay
+        while True:
+            try:
+                async with self._source() as stream:
+                    async for devices in read_device_lists(BufferedByteReceiveStream(stream)):
+                        self._apply(devices, tg)
+                        self._synced, self.error = True, None
+                        delay = self._reconnect_delay
+                self.error = "stream ended"
+            except (OSError, RuntimeError, ValueError, TimeoutError, EndOfStream, IncompleteRead, BrokenResourceError) as e:
+                self.error = str(e) or type(e).__name__
+            except adbutils.AdbError as e:
+                self.error = str(e) or type(e).__name__
+            self._synced = False
+            _logger.warning("device tracking of the adb server closed (%s), reopening in %ss", self.error, delay)
+            await sleep(delay)
+            delay = min(delay * 2, _MAX_RECONNECT_DELAY)
+
+
+_watcher: DeviceWatcher | None = None
+
+_device_source: DeviceSource = adb_track_devices
+
+
+def get_device_source() -> DeviceSource:
+    """Get the function opening the tracking stream of the device watcher."""
+    return _device_source
+
+
+def set_device_source(source: DeviceSource) -> None:
+    """Set the function opening the tracking stream of the device watcher."""
+    global _device_source
+    _device_source = source
+
+
+def get_device_watcher() -> DeviceWatcher | None:
+    """Get the running device watcher, if any."""
+    return _watcher
+
+
+async def watch_devices(
+    *,
+    on_attached: Callable[[str], Coroutine[Any, Any, None]] | None = None,
+    on_detached: Callable[[str], None] | None = None,
+    task_status: TaskStatus[DeviceWatcher] = TASK_STATUS_IGNORED,
+) -> None:
+    """Run the device watcher until it is stopped. Started with the watcher."""
+    global _watcher
+    watcher = _watcher = DeviceWatcher(_device_source, on_attached=on_attached, on_detached=on_detached)
+    try:
+        await watcher.run(task_status=task_status)
+    finally:
+        if _watcher is watcher:
+            _watcher = None
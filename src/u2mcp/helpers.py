@@ -2,36 +2,36 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any
+from collections.abc import Collection
+from typing import Any
 
-from docstring_parser import parse
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.panel import Panel
 from rich.table import Table
 
-if TYPE_CHECKING:
-    from .mcp import FastMCP
+__all__ = ["print_bench_report", "print_tags", "print_tool_help", "print_trace_report"]
 
 
-__all__ = ["print_tags", "print_tool_help"]
-
-
-async def print_tags(instance: FastMCP, console: Console, *, filtered: bool = True):
-    """Print tags from an MCP instance.
+def print_tags(
+    catalog: dict[str, Any],
+    console: Console,
+    *,
+    include_tags: Collection[str] | None = None,
+    exclude_tags: Collection[str] | None = None,
+):
+    """Print the tags of the tools of a catalog.
 
     Args:
-        instance: The MCP instance to get tools from
+        catalog: The tool catalog, see :func:`u2mcp.catalog.load_catalog`
         console: The Rich console to print to
-        filtered: If True, only show tags that match include/exclude filters.
-                   If False, show all available tags. Defaults to True.
+        include_tags: If set, only show tools with these tags, and only these tags.
+        exclude_tags: If set, hide tools with these tags, and these tags.
     """
     tags: dict[str, list[str]] = {}
-    include_tags = getattr(instance, "include_tags", None) if filtered else None
-    exclude_tags = getattr(instance, "exclude_tags", None) if filtered else None
 
-    for tool in (await instance.get_tools()).values():
-        tool_tags = tool.tags or []
+    for name, tool in catalog["tools"].items():
+        tool_tags = tool["tags"]
 
         # Skip tools with no tags
         if not tool_tags:
@@ -54,7 +54,7 @@ async def print_tags(instance: FastMCP, console: Console, *, filtered: bool = Tr
 
             if tag not in tags:
                 tags[tag] = []
-            tags[tag].append(tool.name)
+            tags[tag].append(name)
 
     # Sort tags by category
     sorted_tags = sorted(tags.keys())
@@ -94,8 +94,6 @@ async def print_tags(instance: FastMCP, console: Console, *, filtered: bool = Tr
     console.print(f"\n[bold]Total: {len(tags)} tags, {sum(len(v) for v in tags.values())} tool-tag assignments[/bold]")
 
     # Show filter info if filters are active
-    include_tags = getattr(instance, "include_tags", None)
-    exclude_tags = getattr(instance, "exclude_tags", None)
     if include_tags is not None or exclude_tags is not None:
         console.print("\n[dim]Active filters:[/dim]")
         if include_tags is not None:
@@ -105,11 +103,11 @@ async def print_tags(instance: FastMCP, console: Console, *, filtered: bool = Tr
         console.print("\n[dim]Use --include-tags and --exclude-tags when running the server to filter available tools.[/dim]")
 
 
-async def print_tool_help(instance: FastMCP, console: Console, tool_name: str | None = None):
+def print_tool_help(catalog: dict[str, Any], console: Console, tool_name: str | None = None):
     """Print help information for MCP tools.
 
     Args:
-        instance: The MCP instance to get tools from
+        catalog: The tool catalog, see :func:`u2mcp.catalog.load_catalog`
         console: The Rich console to print to
         tool_name: If specified, show help for tools matching the pattern.
                    Can be a tool name pattern or a tag pattern (e.g., device:*).
@@ -117,7 +115,7 @@ async def print_tool_help(instance: FastMCP, console: Console, tool_name: str |
     """
     import fnmatch
 
-    tools = await instance.get_tools()
+    tools: dict[str, Any] = catalog["tools"]
 
     if tool_name:
         # Filter tools by name pattern OR tag pattern
@@ -129,11 +127,10 @@ async def print_tool_help(instance: FastMCP, console: Console, tool_name: str |
                 continue
 
             # Check if any tag matches pattern
-            if tool.tags:
-                for tag in tool.tags:
-                    if fnmatch.fnmatch(tag, tool_name):
-                        matched_tools[name] = tool
-                        break
+            for tag in tool["tags"]:
+                if fnmatch.fnmatch(tag, tool_name):
+                    matched_tools[name] = tool
+                    break
 
         if not matched_tools:
             console.print(f"[red]No tools found matching pattern: {tool_name}[/red]")
@@ -151,12 +148,9 @@ async def print_tool_help(instance: FastMCP, console: Console, tool_name: str |
         table.add_column("Tags", style="green", width=30)
 
         for name, tool in sorted(tools.items()):
-            tags_str = ", ".join(sorted(tool.tags or [])) if tool.tags else ""
-            # Extract short description only, skip Args/Returns sections
-            description = tool.description or ""
-            parsed = parse(description)
-            # Use short description, fall back to full description truncated
-            desc = parsed.short_description if parsed.short_description else description
+            tags_str = ", ".join(tool["tags"])
+            # Short description only, without Args/Returns sections
+            desc = tool["summary"]
             # Truncate if too long
             desc = desc[:57] + "..." if len(desc) > 60 else desc
             table.add_row(name, desc, tags_str)
@@ -168,53 +162,12 @@ async def print_tool_help(instance: FastMCP, console: Console, tool_name: str |
         console.print("[dim]Supports wildcards: 'u2mcp info device:*' (by tag) or 'u2mcp info *screenshot*' (by name)[/dim]")
 
 
-def _print_single_tool_help(console: Console, name: str, tool: Any) -> None:
-    """Print detailed help for a single tool.
-
-    Parses Google-style docstrings and formats Args/Returns with markdown.
-    """
-    # Build markdown content
-    md_lines = []
-
-    # Title and tags (as plain text, not markdown)
-    tags_str = f"**Tags:** {', '.join(sorted(tool.tags))}" if tool.tags else ""
-
-    # Parse the docstring
-    description = tool.description or ""
-    parsed = parse(description)
-
-    # Short description
-    if parsed.short_description:
-        md_lines.append(parsed.short_description)
-
-    # Long description
-    if parsed.long_description:
-        md_lines.append(parsed.long_description)
-
-    # Args section
-    if parsed.params:
-        md_lines.append("\n**Args:**")
-        for p in parsed.params:
-            type_suffix = f" ({p.type_name})" if p.type_name else ""
-            default_suffix = f"(default: `{p.default}`)" if p.default else ""
-            md_lines.append(f"- **{p.arg_name}**{type_suffix}: {p.description}{default_suffix}")
-
-    # Returns section
-    if parsed.returns:
-        md_lines.append("\n**Returns:**")
-        r = parsed.returns
-        if r.type_name:
-            md_lines.append(f"**{r.type_name}**")
-        if r.description:
-            md_lines.append(r.description)
-
-    # Combine tags and description
-    full_md = tags_str + "\n\n" + "\n".join(md_lines) if tags_str else "\n".join(md_lines)
-
+def _print_single_tool_help(console: Console, name: str, tool: dict[str, Any]) -> None:
+    """Print detailed help for a single tool, from the markdown of its catalog entry."""
     # Display in a panel with markdown rendering
     console.print(
         Panel(
-            Markdown(full_md),
+            Markdown(tool["markdown"]),
             title=f"[bold cyan]{name}[/bold cyan]",
             title_align="left",
             border_style="cyan",
@@ -222,3 +175,76 @@ def _print_single_tool_help(console: Console, name: str, tool: Any) -> None:
         )
     )
     console.print()  # Blank line after each tool
+
+
+def print_trace_report(summary: dict[str, dict[str, Any]], console: Console) -> None:
+    """Print the time of each tool split by phase, as summarized by :func:`u2mcp.tracing.summarize_trace`.
+
+    Args:
+        summary: Statistics keyed by tool name
+        console: The Rich console to print to
+    """
+    from .tracing import PHASES
+
+    if not summary:
+        console.print("[yellow]No tool calls found in the trace.[/yellow]")
+        return
+
+    columns = (*PHASES, "server")
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("Tool", style="cyan")
+    table.add_column("Calls", justify="right")
+    table.add_column("Errors", justify="right")
+    table.add_column("p50 ms", justify="right")
+    table.add_column("p95 ms", justify="right")
+    for phase in columns:
+        table.add_column(f"{phase} ms", justify="right", style="green")
+
+    # Slowest tools first
+    for name, stats in sorted(summary.items(), key=lambda item: -item[1]["mean"] * item[1]["calls"]):
+        mean = stats["mean"] or 1.0
+        cells = [
+            f"{stats['phases'][phase] * 1000:.1f} ({stats['phases'][phase] / mean:.0%})" if stats["phases"][phase] else "-"
+            for phase in columns
+        ]
+        table.add_row(
+            name, str(stats["calls"]), str(stats["errors"]), f"{stats['p50'] * 1000:.1f}", f"{stats['p95'] * 1000:.1f}", *cells
+        )
+
+    console.print(table)
+    console.print("\n[dim]Phase columns are mean milliseconds per call, and their share of the mean call time.[/dim]")
+
+
+def print_bench_report(results: list[dict[str, Any]], console: Console) -> None:
+    """Print the throughput, latencies and memory of each tool family, as measured by :func:`u2mcp.bench.run_bench`.
+
+    Args:
+        results: One dict per transport and tool family, see :class:`u2mcp.bench.FamilyResult`
+        console: The Rich console to print to
+    """
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("Transport", style="cyan")
+    table.add_column("Family", style="cyan")
+    table.add_column("Calls", justify="right")
+    table.add_column("Errors", justify="right")
+    table.add_column("Calls/s", justify="right", style="green")
+    table.add_column("p50 ms", justify="right")
+    table.add_column("p95 ms", justify="right")
+    table.add_column("p99 ms", justify="right")
+    table.add_column("Peak RSS MiB", justify="right")
+    for result in results:
+        rss = result["peak_rss"]
+        table.add_row(
+            result["transport"],
+            result["family"],
+            str(result["calls"]),
+            f"[red]{result['errors']}[/red]" if result["errors"] else "0",
+            f"{result['throughput']:.1f}",
+            f"{result['p50'] * 1000:.1f}",
+            f"{result['p95'] * 1000:.1f}",
+            f"{result['p99'] * 1000:.1f}",
+            f"{rss / 2**20:.0f}" if rss is not None else "-",
+        )
+
+    console.print(table)
+    console.print("\n[dim]Peak RSS is the peak memory of the server process after the family, so it only grows.[/dim]")
@@ -0,0 +1,275 @@
+"""Compact rendering of window hierarchies.
+
+A hierarchy dumped from a device is a few hundred kilobytes of XML, most of it layout containers
+that an agent never needs. The functions here stream-parse the XML in a single pass, without building its DOM,
+and keep only the nodes that can be interacted with or that carry text.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Any, Literal
+from xml.etree.ElementTree import iterparse
+
+__all__ = [
+    "DEFAULT_ATTRIBUTES",
+    "HierarchyFormat",
+    "Node",
+    "compact_hierarchy",
+    "diff_nodes",
+    "flatten_nodes",
+    "parse_bounds",
+    "render_json",
+    "render_text",
+]
+
+HierarchyFormat = Literal["xml", "json", "text"]
+
+# Boolean attributes that are interesting only when true
+_FLAG_ATTRIBUTES = frozenset(
+    {"checkable", "checked", "clickable", "focused", "long-clickable", "password", "scrollable", "selected"}
+)
+# Nodes with any of these attributes true can be interacted with
+_INTERACTIVE_ATTRIBUTES = ("clickable", "long-clickable", "scrollable", "checkable")
+
+DEFAULT_ATTRIBUTES: tuple[str, ...] = (
+    "class",
+    "text",
+    "resource-id",
+    "content-desc",
+    "bounds",
+    "clickable",
+    "long-clickable",
+    "scrollable",
+    "checkable",
+    "checked",
+    "selected",
+    "focused",
+    "password",
+    "enabled",
+)
+
+_BOUNDS_PATTERN = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+
+
+def parse_bounds(bounds: str | None) -> tuple[int, int, int, int] | None:
+    """Parse bounds like ``"[0,0][1080,2400]"`` into ``(left, top, right, bottom)``."""
+    if not bounds or not (m := _BOUNDS_PATTERN.fullmatch(bounds)):
+        return None
+    left, top, right, bottom = map(int, m.groups())
+    return left, top, right, bottom
+
+
+@dataclass(slots=True)
+class Node:
+    """A node kept in a compact hierarchy."""
+
+    attributes: dict[str, Any]
+    children: list[Node] = field(default_factory=list)
+
+
+def _is_relevant(attrib: dict[str, str]) -> bool:
+    return bool(attrib.get("text") or attrib.get("content-desc")) or any(
+        attrib.get(name) == "true" for name in _INTERACTIVE_ATTRIBUTES
+    )
+
+
+def _intersects(bounds: tuple[int, int, int, int] | None, rect: Sequence[int]) -> bool:
+    if bounds is None:
+        return False
+    left, top, right, bottom = bounds
+    return left < rect[2] and right > rect[0] and top < rect[3] and bottom > rect[1]
+
+
+def _select_attributes(attrib: dict[str, str], attributes: Iterable[str]) -> dict[str, Any]:
+    """Pick attributes, leaving out empty strings and default boolean values."""
+    result: dict[str, Any] = {}
+    for name in attributes:
+        value = attrib.get(name)
+        if name == "bounds":
+            if (bounds := parse_bounds(value)) is not None:
+                result[name] = list(bounds)
+        elif name in _FLAG_ATTRIBUTES:
+            if value == "true":
+                result[name] = True
+        elif name == "enabled":
+            if value == "false":
+                result[name] = False
+        elif value:
+            result[name] = value
+    return result
+
+
+def compact_hierarchy(
+    xml: str,
+    *,
+    attributes: Sequence[str] | None = None,
+    max_depth: int = 0,
+    within: Sequence[int] | None = None,
+    max_nodes: int = 0,
+) -> tuple[list[Node], bool]:
+    """Parse a hierarchy XML into a tree of the nodes that can be interacted with or carry text.
+
+    The XML is parsed in a single pass, and each element is discarded once its end tag is read.
+    Dropped nodes do not break the tree: the children of a dropped node are attached to its nearest kept ancestor.
+
+    Args:
+        xml: The hierarchy XML dumped from a device
+        attributes: Attributes to keep of each node, defaults to :data:`DEFAULT_ATTRIBUTES`
+        max_depth: Skip nodes deeper than this in the original hierarchy, 0 means no limit
+        within: Only keep nodes whose bounds intersect this ``[left, top, right, bottom]`` rectangle
+        max_nodes: Stop after keeping this many nodes, 0 means no limit
+
+    Returns:
+        The root nodes of the compact tree, and whether it was truncated by ``max_nodes``.
+    """
+    if within is not None and len(within) != 4:
+        raise ValueError("within must be [left, top, right, bottom]")
+    if attributes is None:
+        attributes = DEFAULT_ATTRIBUTES
+
+    roots: list[Node] = []
+    # For each open <node> element, the node kept for it, or None if it was dropped
+    stack: list[Node | None] = []
+    count = 0
+
+    for event, elem in iterparse(BytesIO(xml.encode()), events=("start", "end")):
+        if elem.tag != "node":
+            continue
+        if event == "end":
+            stack.pop()
+            elem.clear()
+            continue
+
+        depth = len(stack) + 1
+        attrib = elem.attrib
+        keep = (
+            (max_depth <= 0 or depth <= max_depth)
+            and _is_relevant(attrib)
+            and (within is None or _intersects(parse_bounds(attrib.get("bounds")), within))
+        )
+        if not keep:
+            stack.append(None)
+            continue
+
+        if max_nodes > 0 and count >= max_nodes:
+            return roots, True
+        node = Node(_select_attributes(attrib, attributes))
+        count += 1
+        parent = next((n for n in reversed(stack) if n is not None), None)
+        (parent.children if parent is not None else roots).append(node)
+        stack.append(node)
+
+    return roots, False
+
+
+def _node_to_dict(node: Node) -> dict[str, Any]:
+    if not node.children:
+        return node.attributes
+    return {**node.attributes, "children": [_node_to_dict(child) for child in node.children]}
+
+
+def render_json(roots: list[Node], truncated: bool) -> str:
+    """Render a compact tree as a compact JSON string ``{"nodes": [...], "truncated": bool}``."""
+    return json.dumps(
+        {"nodes": [_node_to_dict(node) for node in roots], "truncated": truncated}, ensure_ascii=False, separators=(",", ":")
+    )
+
+
+def _node_line(attributes: dict[str, Any]) -> str:
+    parts: list[str] = []
+    if cls := attributes.get("class"):
+        parts.append(cls)
+    if (text := attributes.get("text")) is not None:
+        parts.append(json.dumps(text, ensure_ascii=False))
+    for name, value in attributes.items():
+        if name in ("class", "text"):
+            continue
+        if name == "bounds":
+            parts.append("[{},{},{},{}]".format(*value))
+        elif value is True:
+            parts.append(name)
+        elif value is False:
+            parts.append(f"{name}=false")
+        else:
+            parts.append(f"{name}={json.dumps(value, ensure_ascii=False)}")
+    return " ".join(parts)
+
+
+def render_text(roots: list[Node], truncated: bool) -> str:
+    """Render a compact tree as indented lines, one node per line."""
+    lines: list[str] = []
+    stack: list[tuple[Node, int]] = [(node, 0) for node in reversed(roots)]
+    while stack:
+        node, level = stack.pop()
+        lines.append("  " * level + _node_line(node.attributes))
+        stack.extend((child, level + 1) for child in reversed(node.children))
+    if truncated:
+        lines.append("... (truncated)")
+    return "\n".join(lines)
+
+
+def flatten_nodes(roots: Iterable[Node]) -> list[dict[str, Any]]:
+    """List the attributes of every node of a compact tree, in document order."""
+    result: list[dict[str, Any]] = []
+    stack = list(reversed(list(roots)))
+    while stack:
+        node = stack.pop()
+        result.append(node.attributes)
+        stack.extend(reversed(node.children))
+    return result
+
+
+def _match(
+    old: list[dict[str, Any]], new: list[dict[str, Any]], key: Callable[[dict[str, Any]], Any]
+) -> tuple[list[tuple[dict[str, Any], dict[str, Any]]], list[dict[str, Any]], list[dict[str, Any]]]:
+    """Pair nodes with equal keys in document order, returning the pairs and the nodes left in each list."""
+    pending: dict[Any, list[dict[str, Any]]] = {}
+    for attrs in old:
+        if (k := key(attrs)) is not None:
+            pending.setdefault(k, []).append(attrs)
+    pairs: list[tuple[dict[str, Any], dict[str, Any]]] = []
+    left_new: list[dict[str, Any]] = []
+    for attrs in new:
+        k = key(attrs)
+        if k is not None and (candidates := pending.get(k)):
+            pairs.append((candidates.pop(0), attrs))
+        else:
+            left_new.append(attrs)
+    paired = {id(before) for before, _ in pairs}
+    return pairs, [attrs for attrs in old if id(attrs) not in paired], left_new
+
+
+def diff_nodes(old: list[dict[str, Any]], new: list[dict[str, Any]]) -> dict[str, list[dict[str, Any]]]:
+    """Diff two flattened compact trees.
+
+    Nodes are matched by resource-id, class and bounds.
+    Nodes left unmatched that have a resource-id are then matched by resource-id and class alone,
+    so that a view which moved or was resized is reported as changed rather than removed and added.
+
+    Returns:
+        A dict with the following keys:
+            - added (list[dict]): Nodes only in ``new``
+            - removed (list[dict]): Nodes only in ``old``
+            - changed (list[dict]): Matched nodes with different attributes, as ``{"node": <new attributes>,
+              "changes": {<attribute>: [<old value>, <new value>]}}``
+    """
+    exact, old_left, new_left = _match(old, new, lambda a: (a.get("resource-id"), a.get("class"), tuple(a.get("bounds") or ())))
+    moved, removed, added = _match(
+        old_left, new_left, lambda a: (a["resource-id"], a.get("class")) if a.get("resource-id") else None
+    )
+    order = {id(attrs): i for i, attrs in enumerate(new)}
+    changed: list[dict[str, Any]] = []
+    for before, after in sorted(exact + moved, key=lambda pair: order[id(pair[1])]):
+        changes = {
+            name: [before.get(name), after.get(name)]
+            for name in dict.fromkeys([*before, *after])
+            if before.get(name) != after.get(name)
+        }
+        if changes:
+            changed.append({"node": after, "changes": changes})
+    return {"added": added, "removed": removed, "changed": changed}
@@ -0,0 +1,312 @@
+"""Image encoding of screenshots into data URLs.
+
+All encodings run in a bounded pool of worker threads shared by every device,
+so that a burst of screenshots neither stalls the event loop nor takes all of the worker threads.
+Pillow releases the GIL while resizing and encoding, so the pool scales across CPU cores.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import time
+from base64 import b64encode
+from dataclasses import dataclass
+from functools import partial
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Literal
+
+from anyio import CapacityLimiter, to_thread
+
+from .lazy import lazy_import
+from .tracing import add_span
+
+if TYPE_CHECKING:
+    from PIL import Image as PILImage
+    from PIL import ImageChops
+    from PIL.Image import Image
+else:
+    PILImage = lazy_import("PIL.Image")
+    ImageChops = lazy_import("PIL.ImageChops")
+
+__all__ = [
+    "Frame",
+    "ImageFormat",
+    "encode_frame",
+    "encode_frame_sync",
+    "encode_image",
+    "encode_image_sync",
+    "encode_stats",
+    "get_encode_workers",
+    "set_encode_workers",
+]
+
+ImageFormat = Literal["jpeg", "png", "webp"]
+
+_MIME_TYPES: dict[str, str] = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+_encode_workers: int = min(4, os.cpu_count() or 1)
+# Created on first use, because it must be created within the event loop
+_encode_limiter: CapacityLimiter | None = None
+
+
+def get_encode_workers() -> int:
+    """Get the maximum number of images encoded at the same time."""
+    return _encode_workers
+
+
+def set_encode_workers(workers: int) -> None:
+    """Set the maximum number of images encoded at the same time."""
+    global _encode_workers
+    if workers < 1:
+        raise ValueError("encode workers must be at least 1")
+    _encode_workers = workers
+    if _encode_limiter is not None:
+        _encode_limiter.total_tokens = workers
+
+
+def encode_stats() -> dict[str, int]:
+    """Get the load of the encode pool: its thread limit, busy threads and queued encodes."""
+    if _encode_limiter is None:
+        return {"limit": _encode_workers, "busy": 0, "waiting": 0}
+    statistics = _encode_limiter.statistics()
+    return {"limit": _encode_workers, "busy": statistics.borrowed_tokens, "waiting": statistics.tasks_waiting}
+
+
+def _get_encode_limiter() -> CapacityLimiter:
+    global _encode_limiter
+    if _encode_limiter is None:
+        _encode_limiter = CapacityLimiter(_encode_workers)
+    return _encode_limiter
+
+
+def _target_size(width: int, height: int, scale: float, max_width: int) -> tuple[int, int]:
+    factor = scale
+    if max_width > 0 and width * factor > max_width:
+        factor = max_width / width
+    if factor >= 1:
+        return width, height
+    return max(1, round(width * factor)), max(1, round(height * factor))
+
+
+def _prepare(im: Image, format: str, quality: int, max_width: int, scale: float, grayscale: bool) -> Image:
+    """Validate encoding options, then downscale and convert the image as it is going to be encoded."""
+    if format not in _MIME_TYPES:
+        raise ValueError(f"Unsupported image format: {format}")
+    if not 1 <= quality <= 100:
+        raise ValueError("quality must be in range [1, 100]")
+    if not 0 < scale <= 1:
+        raise ValueError("scale must be in range (0, 1]")
+    if max_width < 0:
+        raise ValueError("max_width cannot be negative")
+
+    size = _target_size(im.width, im.height, scale, max_width)
+    mode = "L" if grayscale else "RGB"
+
+    # Let the JPEG decoder do most of the downscaling (and the grayscale conversion) while decoding,
+    # it is a no-op for images already loaded or in other formats.
+    if size != (im.width, im.height) or grayscale:
+        im.draft(mode, size)
+    if size != (im.width, im.height):
+        im = im.resize(size, PILImage.Resampling.BILINEAR)
+    if grayscale:
+        if im.mode != "L":
+            im = im.convert("L")
+    elif im.mode not in ("RGB", "L") and (format == "jpeg" or im.mode != "RGBA"):
+        im = im.convert("RGB")
+    return im
+
+
+def _encode(im: Image, format: str, quality: int) -> str:
+    params: dict[str, Any] = {} if format == "png" else {"quality": quality}
+    with BytesIO() as fp:
+        im.save(fp, format, **params)
+        data = fp.getvalue()
+    return f"data:{_MIME_TYPES[format]};base64,{b64encode(data).decode()}"
+
+
+def encode_image_sync(
+    im: Image,
+    format: ImageFormat = "jpeg",
+    quality: int = 75,
+    max_width: int = 0,
+    scale: float = 1.0,
+    grayscale: bool = False,
+) -> dict[str, Any]:
+    """Downscale and encode an image into a base64 data URL.
+
+    Args:
+        im: The image to encode
+        format: Output format, one of ``"jpeg"``, ``"png"`` or ``"webp"``
+        quality: Encoding quality of jpeg and webp, from 1 to 100. Ignored by png.
+        max_width: Downscale the image to at most this width, 0 means no limit
+        scale: Downscale factor, in range (0, 1]
+        grayscale: Convert the image to grayscale
+
+    Returns:
+        A dict with the following keys:
+            - width (int): Width of the encoded image
+            - height (int): Height of the encoded image
+            - original_width (int): Width of the source image
+            - original_height (int): Height of the source image
+            - image (str): Base64 encoded image data in data URL format (data:image/<format>;base64,...)
+    """
+    original_width, original_height = im.width, im.height
+    im = _prepare(im, format, quality, max_width, scale, grayscale)
+    return {
+        "width": im.width,
+        "height": im.height,
+        "original_width": original_width,
+        "original_height": original_height,
+        "image": _encode(im, format, quality),
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class Frame:
+    """Fingerprint of the last frame sent to the client, to tell whether the next frame has changed."""
+
+    token: str
+    thumbnail: Image
+    original_size: tuple[int, int]
+
+
+_THUMBNAIL_WIDTH = 270
+
+
+def _make_frame(im: Image, token: str, original_size: tuple[int, int]) -> Frame:
+    thumbnail = im.convert("L")
+    if thumbnail.width > _THUMBNAIL_WIDTH:
+        thumbnail = thumbnail.resize(_target_size(im.width, im.height, 1.0, _THUMBNAIL_WIDTH), PILImage.Resampling.BOX)
+    return Frame(token, thumbnail, original_size)
+
+
+def _changed_bbox(previous: Frame, thumbnail: Image, original_size: tuple[int, int]) -> list[int] | None:
+    """Bounding box of the changed region in original image coordinates, compared on the thumbnails."""
+    if previous.original_size != original_size or previous.thumbnail.size != thumbnail.size:
+        return None
+    bbox = ImageChops.difference(previous.thumbnail, thumbnail).getbbox()
+    if bbox is None:
+        return None
+    x_ratio, y_ratio = original_size[0] / thumbnail.width, original_size[1] / thumbnail.height
+    left, top, right, bottom = bbox
+    return [
+        max(0, math.floor(left * x_ratio)),
+        max(0, math.floor(top * y_ratio)),
+        min(original_size[0], math.ceil(right * x_ratio)),
+        min(original_size[1], math.ceil(bottom * y_ratio)),
+    ]
+
+
+def encode_frame_sync(
+    im: Image,
+    format: ImageFormat = "jpeg",
+    quality: int = 75,
+    max_width: int = 0,
+    scale: float = 1.0,
+    grayscale: bool = False,
+    *,
+    previous: Frame | None = None,
+    if_changed_since: str = "",
+) -> tuple[dict[str, Any], Frame]:
+    """Like :func:`encode_image_sync`, but skip encoding a frame unchanged since the one a client already has.
+
+    The token of a frame is a digest of the image as it is going to be encoded,
+    so the same screen with different encoding options gets different tokens.
+
+    Args:
+        im: The image to encode
+        format: Output format, one of ``"jpeg"``, ``"png"`` or ``"webp"``
+        quality: Encoding quality of jpeg and webp, from 1 to 100. Ignored by png.
+        max_width: Downscale the image to at most this width, 0 means no limit
+        scale: Downscale factor, in range (0, 1]
+        grayscale: Convert the image to grayscale
+        previous: The last frame sent, to find the changed region against
+        if_changed_since: Token of the frame the client already has
+
+    Returns:
+        The result, and the fingerprint of this frame.
+        When the frame is unchanged, the result only has ``changed`` (False) and ``token``.
+        Otherwise it has the keys of :func:`encode_image_sync`, plus:
+            - changed (bool): True
+            - token (str): Token of this frame, for the next ``if_changed_since``
+            - changed_bbox (list[int] | None): (left, top, right, bottom) of the changed region in original coordinates,
+              if ``if_changed_since`` is the token of ``previous``
+    """
+    original_size = im.width, im.height
+    im = _prepare(im, format, quality, max_width, scale, grayscale)
+    token = hashlib.blake2b(
+        f"{im.mode}:{im.width}x{im.height}:{format}:{quality}".encode() + im.tobytes(), digest_size=16
+    ).hexdigest()
+
+    if if_changed_since and token == if_changed_since:
+        frame = previous if previous is not None and previous.token == token else _make_frame(im, token, original_size)
+        return {"changed": False, "token": token}, frame
+
+    frame = _make_frame(im, token, original_size)
+    changed_bbox = None
+    if if_changed_since and previous is not None and previous.token == if_changed_since:
+        changed_bbox = _changed_bbox(previous, frame.thumbnail, original_size)
+    result = {
+        "width": im.width,
+        "height": im.height,
+        "original_width": original_size[0],
+        "original_height": original_size[1],
+        "image": _encode(im, format, quality),
+        "changed": True,
+        "token": token,
+        "changed_bbox": changed_bbox,
+    }
+    return result, frame
+
+
+async def encode_image(
+    im: Image,
+    format: ImageFormat = "jpeg",
+    quality: int = 75,
+    max_width: int = 0,
+    scale: float = 1.0,
+    grayscale: bool = False,
+) -> dict[str, Any]:
+    """Same as :func:`encode_image_sync`, but run in the shared pool of encoding threads to keep the event loop responsive."""
+    started = time.perf_counter()
+    try:
+        return await to_thread.run_sync(
+            partial(encode_image_sync, im, format, quality=quality, max_width=max_width, scale=scale, grayscale=grayscale),
+            limiter=_get_encode_limiter(),
+        )
+    finally:
+        add_span("image.encode", time.perf_counter() - started, format=format)
+
+
+async def encode_frame(
+    im: Image,
+    format: ImageFormat = "jpeg",
+    quality: int = 75,
+    max_width: int = 0,
+    scale: float = 1.0,
+    grayscale: bool = False,
+    *,
+    previous: Frame | None = None,
+    if_changed_since: str = "",
+) -> tuple[dict[str, Any], Frame]:
+    """Same as :func:`encode_frame_sync`, but run in the shared pool of encoding threads to keep the event loop responsive."""
+    started = time.perf_counter()
+    try:
+        return await to_thread.run_sync(
+            partial(
+                encode_frame_sync,
+                im,
+                format,
+                quality=quality,
+                max_width=max_width,
+                scale=scale,
+                grayscale=grayscale,
+                previous=previous,
+                if_changed_since=if_changed_since,
+            ),
+            limiter=_get_encode_limiter(),
+        )
+    finally:
+        add_span("image.encode", time.perf_counter() - started, format=format)
@@ -0,0 +1,73 @@
+"""Lazy imports of heavy dependencies.
+
+Registering the tools only needs their names, tags, docstrings and signatures,
+so modules like ``uiautomator2``, ``adbutils`` and ``PIL`` are imported when a tool first uses them.
+This keeps ``u2mcp tools``, ``u2mcp info`` and server startup from paying for them.
+
+A tool module binds the lazy object to the usual name, with the real import for type checkers::
+
+    if TYPE_CHECKING:
+        import uiautomator2 as u2
+    else:
+        u2 = lazy_import("uiautomator2")
+
+The name stays a module attribute, so tests can still patch it.
+"""
+
+from __future__ import annotations
+
+import threading
+from importlib import import_module
+from typing import Any
+
+__all__ = ["LazyObject", "lazy_import"]
+
+
+class LazyObject:
+    """Stands in for a module, or an attribute of a module, and imports it on first attribute access.
+
+    Setting or deleting an attribute goes to the real object too, so ``mock.patch("...u2.connect")`` patches uiautomator2.
+    """
+
+    __slots__ = ("_attribute", "_lock", "_module", "_target")
+
+    def __init__(self, module: str, attribute: str | None = None):
+        object.__setattr__(self, "_module", module)
+        object.__setattr__(self, "_attribute", attribute)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_target", None)
+
+    def _resolve(self) -> Any:
+        if (target := self._target) is None:
+            # Tools may first use it from several worker threads at once
+            with self._lock:
+                if (target := self._target) is None:
+                    target = import_module(self._module)
+                    if self._attribute is not None:
+                        target = getattr(target, self._attribute)
+                    object.__setattr__(self, "_target", target)
+        return target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._resolve(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        delattr(self._resolve(), name)
+
+    def __repr__(self) -> str:
+        name = self._module if self._attribute is None else f"{self._module}.{self._attribute}"
+        state = "imported" if self._target is not None else "not imported yet"
+        return f"<lazy {name} ({state})>"
+
+
+def lazy_import(module: str, attribute: str | None = None) -> Any:
+    """A stand-in for ``import module`` (or ``from module import attribute``) that imports it on first use.
+
+    Args:
+        module: Absolute module name, e.g. ``"uiautomator2"``
+        attribute: An attribute of the module to stand in for instead, e.g. ``"adb"`` of ``"adbutils"``
+    """
+    return LazyObject(module, attribute)
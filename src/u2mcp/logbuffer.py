@@ -0,0 +1,117 @@
+"""Bounded buffers of the output of background processes, read on demand instead of streamed to clients.
+
+Each line gets a sequence number, so a reader asks for the lines after the last one it has seen.
+Only the last lines are kept: a chatty process costs a fixed amount of memory, and a reader that comes back late
+is told how many lines it missed.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from anyio import Event, sleep
+from anyio.abc import AnyByteReceiveStream
+from anyio.streams.text import TextReceiveStream
+
+__all__ = ["LogBuffer", "LogLine", "forward_logs", "read_lines"]
+
+
+@dataclass(frozen=True, slots=True)
+class LogLine:
+    """A line of output of a process."""
+
+    seq: int
+    time: float
+    stream: str
+    text: str
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"seq": self.seq, "time": self.time, "stream": self.stream, "text": self.text}
+
+
+class LogBuffer:
+    """The last lines of output of a process, numbered from 1."""
+
+    def __init__(self, maxlen: int = 1000) -> None:
+        self._lines: deque[LogLine] = deque(maxlen=maxlen)
+        self._last_seq = 0
+        self._changed = Event()
+
+    @property
+    def last_seq(self) -> int:
+        """Number of the last line, 0 if there is none yet."""
+        return self._last_seq
+
+    def append(self, stream: str, text: str) -> None:
+        """Add a line. Never blocks, the oldest line is dropped when the buffer is full."""
+        self._last_seq += 1
+        self._lines.append(LogLine(self._last_seq, time.time(), stream, text))
+        self._changed.set()
+        self._changed = Event()
+
+    def since(self, seq: int = 0, limit: int = 0) -> tuple[list[LogLine], int]:
+        """The lines after the line numbered ``seq``.
+
+        Args:
+            seq: Number of the last line already seen
+            limit: Return at most this many lines, the oldest first. 0 means no limit.
+
+        Returns:
+            The lines, and how many lines after ``seq`` were dropped from the buffer before they could be read.
+        """
+        lines = [line for line in self._lines if line.seq > seq]
+        dropped = lines[0].seq - seq - 1 if lines else 0
+        if limit > 0:
+            lines = lines[:limit]
+        return lines, dropped
+
+    async def collect(self, stream_name: str, stream: AnyByteReceiveStream) -> None:
+        """Add the lines of a stream of the process, until it ends."""
+        async for line in read_lines(stream):
+            if line.strip():
+                self.append(stream_name, line)
+
+    async def wait(self, seq: int = 0) -> None:
+        """Wait for a line after the line numbered ``seq``."""
+        while self._last_seq <= seq:
+            await self._changed.wait()
+
+
+async def read_lines(stream: AnyByteReceiveStream) -> AsyncIterator[str]:
+    """Read a stream of text line by line, without the line endings."""
+    pending = ""
+    async for text in TextReceiveStream(stream, errors="replace"):
+        *lines, pending = (pending + text).split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def forward_logs(
+    buffer: LogBuffer,
+    send: Callable[[list[LogLine], int], Awaitable[None]],
+    *,
+    interval: float = 1.0,
+    max_lines: int = 20,
+) -> None:
+    """Send the new lines of a buffer, coalesced into one message at most every ``interval`` seconds, until cancelled.
+
+    Args:
+        buffer: The buffer to forward
+        send: Sends the lines, at most ``max_lines`` of the newest, and the number of lines left out
+        interval: Minimum seconds between two messages
+        max_lines: Maximum number of lines in a message
+    """
+    seq = buffer.last_seq
+    while True:
+        await buffer.wait(seq)
+        lines, dropped = buffer.since(seq)
+        seq = buffer.last_seq
+        skipped = dropped + max(0, len(lines) - max_lines)
+        await send(lines[-max_lines:], skipped)
+        await sleep(interval)
@@ -28,7 +28,7 @@ from rich.console import Console
 from rich.markdown import Markdown
 
 from .background import set_background_task_group
-from .helpers import print_tags
+from .catalog import catalog_tags, load_catalog
 
 if sys.version_info >= (3, 12):  # qa: noqa
     from typing import override
@@ -82,13 +82,27 @@ def _expand_wildcards(tags: set[str] | None, all_available_tags: set[str] | None
 
 
 @asynccontextmanager
-async def _lifespan(instance: FastMCP, /, show_tags: bool = True, token: str | None = None):
+async def _lifespan(
+    instance: FastMCP,
+    /,
+    show_tags: bool = True,
+    token: str | None = None,
+    watch_devices: bool = False,
+    prewarm_devices: bool = False,
+):
     console = Console(stderr=True)
 
     # Show enabled tags and tools if requested
     if show_tags:
+        from .helpers import print_tags
+
         console.print("\n[bold cyan]Enabled Tags and Tools:[/bold cyan]")
-        await print_tags(instance, console)
+        print_tags(
+            load_catalog(instance),
+            console,
+            include_tags=getattr(instance, "include_tags", None),
+            exclude_tags=getattr(instance, "exclude_tags", None),
+        )
         console.print("")
 
     if token:
@@ -108,7 +122,17 @@ async def _lifespan(instance: FastMCP, /, show_tags: bool = True, token: str | N
     # Global task group for background tasks - keeps running until server shuts down
     async with create_task_group() as tg:
         set_background_task_group(tg)
-        yield
+        if not watch_devices:
+            yield
+            return
+        # Keep the device table current from the adb server, until the server shuts down
+        from .tools.device import run_device_watcher
+
+        watcher = await tg.start(partial(run_device_watcher, prewarm=prewarm_devices))
+        try:
+            yield
+        finally:
+            watcher.stop()
 
 
 class _SimpleTokenAuthProvider(AuthProvider):
@@ -134,10 +158,27 @@ def make_mcp(
     include_tags: str | None = None,
     exclude_tags: str | None = None,
     show_tags: bool = False,
+    metadata_cache_ttl: float | None = None,
+    encode_workers: int | None = None,
+    hierarchy_cache_ttl: float | None = None,
+    workers: int | None = None,
+    wait_workers: int | None = None,
+    device_workers: int | None = None,
+    scrcpy_max_processes: int | None = None,
+    scrcpy_memory_limit: int | None = None,
+    scrcpy_cpu_limit: int | None = None,
+    metrics: bool = False,
+    trace: str | None = None,
+    watch_devices: bool = False,
+    prewarm_devices: bool = False,
 ) -> FastMCP:
     global mcp
     params: dict[str, Any] = dict(name="uiautomator2", instructions=__doc__)
-    lifespan_kwargs: dict[str, Any] = {"show_tags": show_tags}
+    lifespan_kwargs: dict[str, Any] = {
+        "show_tags": show_tags,
+        "watch_devices": watch_devices,
+        "prewarm_devices": prewarm_devices,
+    }
     if token:
         lifespan_kwargs["token"] = token
         params.update(lifespan=partial(_lifespan, **lifespan_kwargs), auth=_SimpleTokenAuthProvider(token=token))
@@ -148,10 +189,48 @@ def make_mcp(
     # Import tools to register them with the MCP (needed for wildcard expansion)
     from . import tools as _  # noqa: F401
 
-    # Collect all available tags from registered tools for wildcard expansion
-    all_tag_set: set[str] = set()
-    for tool in mcp._tool_manager._tools.values():
-        all_tag_set.update(tool.tags or [])
+    if metadata_cache_ttl is not None:
+        from .tools.device import set_metadata_cache_ttl
+
+        set_metadata_cache_ttl(metadata_cache_ttl)
+
+    if hierarchy_cache_ttl is not None:
+        from .tools.device import set_hierarchy_cache_ttl
+
+        set_hierarchy_cache_ttl(hierarchy_cache_ttl)
+
+    if encode_workers is not None:
+        from .imaging import set_encode_workers
+
+        set_encode_workers(encode_workers)
+
+    if workers is not None or wait_workers is not None or device_workers is not None:
+        from .workers import set_worker_limits
+
+        set_worker_limits(workers, wait_workers, device_workers)
+
+    if scrcpy_max_processes is not None or scrcpy_memory_limit is not None or scrcpy_cpu_limit is not None:
+        from .supervisor import set_supervisor_limits
+
+        set_supervisor_limits(
+            scrcpy_max_processes,
+            scrcpy_cpu_limit,
+            scrcpy_memory_limit * 2**20 if scrcpy_memory_limit is not None else None,
+        )
+
+    if metrics:
+        from .metrics import install_metrics
+
+        install_metrics(mcp)
+
+    if trace:
+        from .tracing import TracingMiddleware, enable_tracing
+
+        enable_tracing(trace)
+        mcp.add_middleware(TracingMiddleware())
+
+    # All available tags for wildcard expansion, from the tool catalog (built and cached on first run)
+    all_tag_set = catalog_tags(load_catalog(mcp))
 
     # Parse and expand tag filters
     parsed_include_tags = _expand_wildcards(_parse_tags(include_tags), all_tag_set)
@@ -0,0 +1,225 @@
+"""Prometheus metrics of the server, served at ``/metrics`` by the HTTP transport.
+
+Tool calls and device lock waits are recorded as they happen, into plain counters and fixed-bucket histograms:
+an observation is a dict look-up, a bisect and a few additions, with no allocation once a series exists.
+Worker pool load and device connection state are read from their own modules when the endpoint is scraped.
+The text exposition format is rendered here, so no client library is needed.
+"""
+
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, Any
+
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
+
+if TYPE_CHECKING:
+    from fastmcp import FastMCP
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+__all__ = [
+    "MetricsMiddleware",
+    "install_metrics",
+    "is_metrics_enabled",
+    "observe_lock_wait",
+    "render_metrics",
+    "reset_metrics",
+]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, from a quick tap to a long element wait
+_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_LOCK_WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+_enabled: bool = False
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A counter with labels."""
+
+    __slots__ = ("help", "labels", "name", "values")
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, labels: tuple[str, ...], amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """A histogram with labels and fixed buckets."""
+
+    __slots__ = ("buckets", "help", "labels", "name", "series")
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # labels -> [count of each bucket (not cumulative) and of +Inf ..., sum]
+        self.series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        if (series := self.series.get(labels)) is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), series, strict=False):
+                cumulative += int(count)
+                le = 'le="' + _format_value(bound) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+
+_tool_calls = Counter("u2mcp_tool_calls_total", "Tool calls by tool and outcome (ok, error, cancelled).", ("tool", "status"))
+_tool_duration = Histogram(
+    "u2mcp_tool_duration_seconds", "Duration of tool calls, including device lock waits.", ("tool",), _DURATION_BUCKETS
+)
+_lock_wait = Histogram(
+    "u2mcp_device_lock_wait_seconds", "Time tool calls waited for a device lock.", ("tool",), _LOCK_WAIT_BUCKETS
+)
+
+
+def is_metrics_enabled() -> bool:
+    """Whether metrics are being recorded."""
+    return _enabled
+
+
+def reset_metrics() -> None:
+    """Clear the recorded tool calls and lock waits."""
+    _tool_calls.values.clear()
+    _tool_duration.series.clear()
+    _lock_wait.series.clear()
+
+
+def observe_lock_wait(tool: str, seconds: float) -> None:
+    """Record how long a tool call waited for a device lock, if metrics are enabled."""
+    if _enabled:
+        _lock_wait.observe((tool,), seconds)
+
+
+class MetricsMiddleware(Middleware):
+    """Count tool calls by outcome, and record their durations."""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        labels = (context.message.name,)
+        status = "ok"
+        started = time.perf_counter()
+        try:
+            return await call_next(context)
+        except Exception:
+            status = "error"
+            raise
+        except BaseException:
+            status = "cancelled"
+            raise
+        finally:
+            _tool_duration.observe(labels, time.perf_counter() - started)
+            _tool_calls.inc((*labels, status))
+
+
+def _by_label(name: str, help: str, type: str, label: str, values: dict[str, float]) -> Iterator[str]:
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} {type}"
+    for key, value in sorted(values.items()):
+        yield f"{name}{_format_labels((label,), (key,))} {_format_value(value)}"
+
+
+def _collect_workers() -> Iterator[str]:
+    from . import imaging, workers
+
+    stats = workers.worker_stats()
+    pools, devices = stats["pools"], stats["devices"]
+    limits: dict[str, float] = {pool: s["limit"] for pool, s in pools.items()}
+    busy: dict[str, float] = {pool: s["busy"] for pool, s in pools.items()}
+    # Screenshots are encoded in their own pool
+    encode = imaging.encode_stats()
+    limits["encode"], busy["encode"] = encode["limit"], encode["busy"]
+
+    yield from _by_label("u2mcp_worker_threads_limit", "Maximum busy threads of each pool.", "gauge", "pool", limits)
+    yield from _by_label("u2mcp_worker_threads_busy", "Busy threads of each pool.", "gauge", "pool", busy)
+    for name, key, type, help in (
+        ("u2mcp_worker_calls_queued", "waiting", "gauge", "Calls queued for a thread of each pool."),
+        ("u2mcp_worker_calls_total", "calls", "counter", "Calls run by each pool."),
+        ("u2mcp_worker_queue_wait_seconds_total", "wait_total", "counter", "Time calls queued for a thread of each pool."),
+    ):
+        yield from _by_label(name, help, type, "pool", {pool: s[key] for pool, s in pools.items()})
+    for name, key, help in (
+        ("u2mcp_device_threads_busy", "busy", "Busy threads of each device."),
+        ("u2mcp_device_calls_queued", "waiting", "Calls queued for the thread budget of each device."),
+    ):
+        yield from _by_label(name, help, "gauge", "serial", {serial: s[key] for serial, s in devices.items()})
+
+
+def _collect_devices() -> Iterator[str]:
+    from .tools import device
+
+    state: dict[str, float] = {serial: 1 if s == "connected" else 0 for serial, s in device.connection_states().items()}
+    yield from _by_label(
+        "u2mcp_device_connected", "Devices known to the server: 1 if connected, 0 while connecting.", "gauge", "serial", state
+    )
+
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for metric in (_tool_calls, _tool_duration, _lock_wait):
+        lines.extend(metric.render())
+    lines.extend(_collect_workers())
+    lines.extend(_collect_devices())
+    return "\n".join(lines) + "\n"
+
+
+async def _metrics_endpoint(request: Request) -> Response:
+    from starlette.responses import Response
+
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
+def install_metrics(server: FastMCP) -> None:
+    """Start recording metrics, and serve them at ``/metrics`` of the HTTP transport.
+
+    The endpoint is not behind the bearer token, so that Prometheus can scrape it.
+    """
+    global _enabled
+    _enabled = True
+    if not any(isinstance(m, MetricsMiddleware) for m in server.middleware):
+        server.add_middleware(MetricsMiddleware())
+        server.custom_route("/metrics", methods=["GET"], name="metrics", include_in_schema=False)(_metrics_endpoint)
@@ -0,0 +1,224 @@
+"""Headless scrcpy recordings, in rotating segment files with a sidecar index.
+
+A recording runs scrcpy without a window, recording into a new segment file every ``segment_seconds``,
+so that no single file grows for hours and old segments can be dropped.
+Next to the segments, ``index.jsonl`` gets one JSON line per event: a segment starting or ending, and every tool call
+on the recorded device, with the segment and the offset into it where the call started.
+A failed step in a long CI run is found in the index, and played from its offset in one segment.
+
+The index is only ever appended to, one line at a time, so long runs cost a small write per event.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from subprocess import DEVNULL
+from typing import IO, Any
+
+from anyio import TASK_STATUS_IGNORED, CancelScope, Event, create_task_group, move_on_after, open_process
+from anyio.abc import Process, TaskStatus
+from fastmcp.utilities.logging import get_logger
+
+from .logbuffer import LogBuffer
+from .supervisor import apply_limits, terminate
+
+__all__ = ["Recording", "RecordingIndex", "locate", "read_index"]
+
+INDEX_NAME = "index.jsonl"
+
+_SEGMENT_PATTERN = re.compile(r"^segment-(\d+)\.(mkv|mp4)$")
+
+_logger = get_logger(__name__)
+
+
+class RecordingIndex:
+    """The append-only index of the segments of a recording and the tool calls made meanwhile."""
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = Path(path)
+        # Line buffered: each event is written as soon as it is added, and nothing is ever rewritten
+        self._fp: IO[str] = open(self.path, "a", encoding="utf-8", buffering=1)  # noqa: SIM115
+        self._segment: str | None = None
+        self._segment_started = 0.0
+
+    def _append(self, entry: dict[str, Any]) -> None:
+        self._fp.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def segment_started(self, file: str, started: float, pid: int) -> None:
+        """Add the start of a segment."""
+        self._segment, self._segment_started = file, started
+        self._append({"event": "segment", "file": file, "time": started, "pid": pid})
+
+    def segment_ended(self, ended: float, returncode: int | None) -> None:
+        """Add the end of the current segment."""
+        if self._segment is not None:
+            self._append({"event": "end", "file": self._segment, "time": ended, "returncode": returncode})
+            self._segment = None
+
+    def segment_removed(self, file: str) -> None:
+        """Add the removal of an old segment."""
+        self._append({"event": "removed", "file": file, "time": time.time()})
+
+    def tool_call(self, tool: str, started: float, duration: float, ok: bool) -> None:
+        """Add a tool call, with where it started in the current segment."""
+        entry: dict[str, Any] = {"event": "call", "tool": tool, "time": started, "duration": duration, "ok": ok}
+        if self._segment is not None:
+            entry.update(file=self._segment, offset=max(0.0, started - self._segment_started))
+        self._append(entry)
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+def read_index(path: str | os.PathLike[str]) -> Iterator[dict[str, Any]]:
+    """Read the events of an index, skipping a last line cut short by a crash."""
+    with open(path, encoding="utf-8") as fp:
+        for line in fp:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def locate(path: str | os.PathLike[str], timestamp: float) -> dict[str, Any] | None:
+    """Find the segment recorded at a time, and the offset of that time into it.
+
+    Args:
+        path: The index of the recording
+        timestamp: Time since the epoch, in seconds
+
+    Returns:
+        A dict with ``file`` and ``offset`` (seconds), or None if nothing was being recorded then.
+    """
+    found = None
+    for entry in read_index(path):
+        event = entry.get("event")
+        if event == "segment" and entry["time"] <= timestamp:
+            found = entry
+        elif event == "end" and found is not None and entry["file"] == found["file"] and entry["time"] < timestamp:
+            found = None
+    if found is None:
+        return None
+    return {"file": found["file"], "offset": timestamp - found["time"]}
+
+
+class Recording:
+    """Runs scrcpy headless, one process per segment, and keeps the index of the recording."""
+
+    def __init__(
+        self,
+        command: list[str],
+        directory: str | os.PathLike[str],
+        *,
+        serial: str = "",
+        segment_seconds: float = 600.0,
+        max_segments: int = 0,
+        format: str = "mkv",
+    ) -> None:
+        """
+        Args:
+            command: scrcpy and its options, to which the recording options are added
+            directory: Where the segments and the index are written
+            serial: The recorded device, whose tool calls are indexed
+            segment_seconds: Seconds recorded in each segment
+            max_segments: Number of segments kept, older ones are removed. 0 keeps them all.
+            format: Container of the segments, ``"mkv"`` or ``"mp4"``. A segment cut short stays readable in mkv.
+        """
+        if segment_seconds <= 0:
+            raise ValueError("segment_seconds must be positive")
+        if max_segments < 0:
+            raise ValueError("max_segments cannot be negative")
+        if format not in ("mkv", "mp4"):
+            raise ValueError(f"Unsupported recording format: {format}")
+        self.command = command
+        self.directory = Path(directory)
+        self.serial = serial
+        self.segment_seconds = segment_seconds
+        self.max_segments = max_segments
+        self.format = format
+        self.segments: list[Path] = []
+        self.error: str | None = None
+        self.returncode: int | None = None
+        # Output of the scrcpy processes of all the segments
+        self.logs = LogBuffer()
+        self.finished = Event()
+        # While recording
+        self.index: RecordingIndex | None = None
+        self._scope = CancelScope()
+        self._process: Process | None = None
+
+    def _next_segment(self) -> Path:
+        numbers = [int(match.group(1)) for path in self.directory.iterdir() if (match := _SEGMENT_PATTERN.match(path.name))]
+        return self.directory / f"segment-{max(numbers, default=0) + 1:05d}.{self.format}"
+
+    def _rotate(self) -> None:
+        if not self.max_segments or self.index is None:
+            return
+        while len(self.segments) > self.max_segments:
+            path = self.segments.pop(0)
+            path.unlink(missing_ok=True)
+            self.index.segment_removed(path.name)
+
+    async def _drain(self, process: Process) -> None:
+        if process.stderr is not None:
+            await self.logs.collect("stderr", process.stderr)
+
+    async def run(self, *, task_status: TaskStatus[int] = TASK_STATUS_IGNORED) -> None:
+        """Record segment after segment until stopped, or until scrcpy exits by itself.
+
+        Started with the pid of the first scrcpy process.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index = RecordingIndex(self.directory / INDEX_NAME)
+        self._scope, self.finished = CancelScope(), Event()
+        self.error = self.returncode = None
+        first = True
+        try:
+            with self._scope:
+                while True:
+                    path = self._next_segment()
+                    command = [*self.command, "--no-display", "--record", str(path)]
+                    _logger.info("record scrcpy segment: %s", command)
+                    process = self._process = await open_process(command, stdin=DEVNULL, stdout=DEVNULL)
+                    apply_limits(process)
+                    self.segments.append(path)
+                    self.index.segment_started(path.name, time.time(), process.pid)
+                    try:
+                        async with create_task_group() as tg:
+                            tg.start_soon(self._drain, process)
+                            if first:
+                                task_status.started(process.pid)
+                                first = False
+                            with move_on_after(self.segment_seconds) as segment_scope:
+                                await process.wait()
+                            await terminate(process)
+                    finally:
+                        await terminate(process)
+                        self.returncode = process.returncode
+                        self.index.segment_ended(time.time(), process.returncode)
+                        self._rotate()
+                    if not segment_scope.cancel_called:
+                        # scrcpy exited by itself: the device is gone, or it could not record at all
+                        lines, _ = self.logs.since(self.logs.last_seq - 1)
+                        last_line = lines[0].text.strip() if lines else ""
+                        self.error = f"scrcpy exited with code {process.returncode}: {last_line}".rstrip(": ")
+                        return
+        finally:
+            self._process = None
+            self.index.close()
+            self.index = None
+            self.finished.set()
+
+    @property
+    def pid(self) -> int | None:
+        """The pid of the scrcpy process recording the current segment."""
+        return self._process.pid if self._process is not None else None
+
+    def stop(self) -> None:
+        """Stop recording. The current segment is finished, and the index closed."""
+        self._scope.cancel()
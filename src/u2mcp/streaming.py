@@ -0,0 +1,410 @@
+"""Live screen streams: the latest frame of each device, kept in memory by a background task.
+
+A frame grabber keeps a minicap stream of a device open in the background task group,
+and remembers the last frame it received, so ``screenshot`` reads the screen from memory
+instead of asking the device for a new capture.
+Frames are kept as the JPEG bytes minicap sends: nothing is decoded until a screenshot asks for one,
+and then the JPEG decoder downscales while decoding (see :mod:`u2mcp.imaging`).
+
+The stream follows the minicap protocol: a banner, then each frame as a 32-bit little-endian length and a JPEG image.
+"""
+
+from __future__ import annotations
+
+import struct
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from dataclasses import dataclass
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from anyio import (
+    TASK_STATUS_IGNORED,
+    BrokenResourceError,
+    CancelScope,
+    EndOfStream,
+    Event,
+    IncompleteRead,
+    create_task_group,
+    fail_after,
+    open_process,
+    sleep,
+)
+from anyio.abc import ByteReceiveStream, SocketStream, TaskStatus
+from anyio.streams.buffered import BufferedByteReceiveStream
+from fastmcp.utilities.logging import get_logger
+
+from .background import get_background_task_group
+from .lazy import lazy_import
+from .workers import run_sync
+
+if TYPE_CHECKING:
+    import adbutils
+    from PIL import Image as PILImage
+    from PIL.Image import Image
+else:
+    adbutils = lazy_import("adbutils")
+    PILImage = lazy_import("PIL.Image")
+
+__all__ = [
+    "FrameGrabber",
+    "FrameSource",
+    "LiveFrame",
+    "MinicapBanner",
+    "RotationSource",
+    "display_rotation",
+    "get_frame_source",
+    "get_grabber",
+    "latest_frame",
+    "minicap_source",
+    "read_banner",
+    "read_frames",
+    "set_frame_source",
+    "start_grabber",
+    "stop_grabber",
+]
+
+FrameSource = Callable[[str], AbstractAsyncContextManager[ByteReceiveStream]]
+"""Opens the minicap stream of a device, given its serial."""
+
+RotationSource = Callable[[str], Awaitable[int]]
+"""Reads the rotation of the display of a device in degrees, given its serial."""
+
+# Largest frame accepted, anything bigger is a corrupted stream
+_MAX_FRAME_SIZE = 64 << 20
+
+_MAX_RECONNECT_DELAY = 30.0
+
+_logger = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class MinicapBanner:
+    """The banner minicap sends once a client connects."""
+
+    version: int
+    pid: int
+    real_width: int
+    real_height: int
+    virtual_width: int
+    virtual_height: int
+    orientation: int
+    quirks: int
+
+
+@dataclass(frozen=True, slots=True)
+class LiveFrame:
+    """A frame of a live stream, still JPEG encoded."""
+
+    data: bytes
+    sequence: int
+    timestamp: float
+
+    def open(self) -> Image:
+        """Open the frame as an image. It is only decoded when its pixels are accessed."""
+        return PILImage.open(BytesIO(self.data))
+
+
+async def read_banner(stream: BufferedByteReceiveStream) -> MinicapBanner:
+    """Read the banner at the start of a minicap stream."""
+    version, length = await stream.receive_exactly(2)
+    if length < 24:
+        raise ValueError(f"Invalid minicap banner length: {length}")
+    pid, real_width, real_height, virtual_width, virtual_height, orientation, quirks = struct.unpack(
+        "<IIIIIBB", (await stream.receive_exactly(length - 2))[:22]
+    )
+    return MinicapBanner(version, pid, real_width, real_height, virtual_width, virtual_height, orientation * 90, quirks)
+
+
+async def read_frames(stream: BufferedByteReceiveStream) -> AsyncIterator[bytes]:
+    """Read the JPEG frames following the banner of a minicap stream, until it ends."""
+    while True:
+        try:
+            header = await stream.receive_exactly(4)
+        except (EndOfStream, IncompleteRead):
+            return
+        (size,) = struct.unpack("<I", header)
+        if not 0 < size <= _MAX_FRAME_SIZE:
+            raise ValueError(f"Invalid minicap frame size: {size}")
+        yield await stream.receive_exactly(size)
+
+
+async def _natural_display(serial: str) -> tuple[int, int, int]:
+    """The natural (not rotated) size of the display of a device, and its rotation in degrees."""
+    from .tools.device import get_info  # The device tools import this module
+
+    info = await get_info(serial, fresh=True)
+    width, height, rotation = info["displayWidth"], info["displayHeight"], info["displayRotation"] * 90
+    if rotation % 180:
+        # The device info gives the size of the display as it is currently rotated
+        width, height = height, width
+    return width, height, rotation
+
+
+async def display_rotation(serial: str) -> int:
+    """The rotation of the display of a device in degrees, from its cached device info."""
+    from .tools.device import get_info  # The device tools import this module
+
+    return (await get_info(serial))["displayRotation"] * 90
+
+
+@asynccontextmanager
+async def minicap_source(serial: str) -> AsyncGenerator[ByteReceiveStream]:
+    """Open the minicap stream of a device, starting minicap if it is not running yet.
+
+    minicap is started for the current rotation of the display, see :func:`display_rotation`.
+    It must be installed in ``/data/local/tmp``, as done by uiautomator2 and STF.
+    """
+    device = adbutils.adb.device(serial)
+
+    async def connect() -> SocketStream:
+        sock = await run_sync(device.create_connection, adbutils.Network.LOCAL_ABSTRACT, "minicap", serial=serial)
+        return await SocketStream.from_socket(sock)
+
+    running: SocketStream | None
+    try:
+        running = await connect()
+    except (OSError, adbutils.AdbError):
+        running = None
+    if running is not None:
+        async with running:
+            yield running
+        return
+
+    width, height, rotation = await _natural_display(serial)
+    projection = f"{width}x{height}@{width}x{height}/{rotation}"
+    command = f"LD_LIBRARY_PATH=/data/local/tmp exec /data/local/tmp/minicap -P {projection}"
+    _logger.info("start minicap on %s: %s", serial, command)
+    process = await open_process([adbutils.adb_path(), "-s", serial, "shell", command])
+    try:
+        with fail_after(5):
+            while True:
+                if process.returncode is not None:
+                    raise RuntimeError(f"minicap exited with code {process.returncode} on {serial}")
+                try:
+                    stream = await connect()
+                    break
+                except (OSError, adbutils.AdbError):
+                    await sleep(0.1)
+        async with stream:
+            yield stream
+    finally:
+        process.kill()
+        await process.aclose()
+
+
+class FrameGrabber:
+    """Keeps the stream of a device open, and the latest frame of it in memory.
+
+    The stream is reopened, with an exponential backoff, when it ends or fails,
+    and right away when the display rotates away from the orientation in the banner of the stream.
+    """
+
+    def __init__(
+        self,
+        serial: str,
+        source: FrameSource,
+        *,
+        notify: Callable[[LiveFrame], Awaitable[None]] | None = None,
+        notify_interval: float = 0.5,
+        reconnect_delay: float = 1.0,
+        rotation: RotationSource | None = None,
+        rotation_interval: float = 1.0,
+    ) -> None:
+        """
+        Args:
+            serial: The device
+            source: Opens the stream of the device
+            notify: Called with new frames, at most once every ``notify_interval`` seconds
+            notify_interval: Seconds between two calls of ``notify``
+            reconnect_delay: Seconds to wait before reopening a stream that ended, doubled after each failure
+            rotation: Reads the rotation of the display, to reopen the stream when it changes. None to never reopen it
+            rotation_interval: Seconds between two reads of the rotation
+        """
+        self.serial = serial
+        self.banner: MinicapBanner | None = None
+        self.error: str | None = None
+        self._source = source
+        self._notify = notify
+        self._notify_interval = notify_interval
+        self._reconnect_delay = reconnect_delay
+        self._rotation = rotation
+        self._rotation_interval = rotation_interval
+        # Orientation of the stream reopened for a rotation, to notice a stream that does not follow it
+        self._rotated_from: int | None = None
+        self._fixed_orientation = False
+        self._stream_scope = CancelScope()
+        self._latest: LiveFrame | None = None
+        self._sequence = 0
+        self._changed = Event()
+        self._scope = CancelScope()
+
+    @property
+    def latest(self) -> LiveFrame | None:
+        """The latest frame, or None if the stream is not connected."""
+        return self._latest
+
+    def _set_latest(self, frame: LiveFrame | None) -> None:
+        self._latest = frame
+        self._changed.set()
+        self._changed = Event()
+
+    async def wait_frame(self, after: int = 0) -> LiveFrame:
+        """Wait for a frame newer than the frame numbered ``after``."""
+        while self._latest is None or self._latest.sequence <= after:
+            await self._changed.wait()
+        return self._latest
+
+    async def run(self, *, task_status: TaskStatus[None] = TASK_STATUS_IGNORED) -> None:
+        """Grab frames until stopped."""
+        try:
+            with self._scope:
+                async with create_task_group() as tg:
+                    tg.start_soon(self._notify_loop)
+                    if self._rotation is not None:
+                        tg.start_soon(self._rotation_loop, self._rotation)
+                    task_status.started()
+                    await self._grab()
+        finally:
+            # The server is shutting down
+            if _grabbers.get(self.serial) is self:
+                del _grabbers[self.serial]
+
+    def configure(self, *, notify: Callable[[LiveFrame], Awaitable[None]] | None, notify_interval: float) -> None:
+        """Replace the function notified of new frames, and the seconds between two notifications."""
+        self._notify = notify
+        self._notify_interval = notify_interval
+
+    def stop(self) -> None:
+        """Stop grabbing frames."""
+        self._scope.cancel()
+        self._set_latest(None)
+
+    async def _grab(self) -> None:
+        delay = self._reconnect_delay
+        while True:
+            try:
+                with CancelScope() as self._stream_scope:
+                    async with self._source(self.serial) as stream:
+                        buffered = BufferedByteReceiveStream(stream)
+                        self.banner = await read_banner(buffered)
+                        self._check_orientation(self.banner.orientation)
+                        self.error = None
+                        delay = self._reconnect_delay
+                        async for data in read_frames(buffered):
+                            self._sequence += 1
+                            self._set_latest(LiveFrame(data, self._sequence, time.monotonic()))
+                    self.error = "stream ended"
+                if self._stream_scope.cancelled_caught:
+                    _logger.info("display of %s rotated, reopening its frame stream", self.serial)
+                    self._set_latest(None)
+                    continue
+            except (OSError, RuntimeError, ValueError, TimeoutError, EndOfStream, IncompleteRead, BrokenResourceError) as e:
+                self.error = str(e) or type(e).__name__
+            except adbutils.AdbError as e:
+                # The device went offline while (re)opening the stream
+                self.error = str(e) or type(e).__name__
+            self._set_latest(None)
+            _logger.warning("frame stream of %s closed (%s), reopening in %ss", self.serial, self.error, delay)
+            await sleep(delay)
+            delay = min(delay * 2, _MAX_RECONNECT_DELAY)
+
+    def _check_orientation(self, orientation: int) -> None:
+        if self._rotated_from is None:
+            return
+        if orientation == self._rotated_from:
+            # e.g. minicap was started by another client, for another rotation
+            _logger.warning("frame stream of %s does not follow the rotation of the display", self.serial)
+            self._fixed_orientation = True
+        self._rotated_from = None
+
+    async def _rotation_loop(self, rotation: RotationSource) -> None:
+        while True:
+            await sleep(self._rotation_interval)
+            if self._fixed_orientation:
+                return
+            if (banner := self.banner) is None or self._latest is None:
+                continue
+            try:
+                current = await rotation(self.serial)
+            except Exception:
+                _logger.debug("failed to read the rotation of %s", self.serial, exc_info=True)
+                continue
+            if current != banner.orientation and self.banner is banner:
+                self._rotated_from = banner.orientation
+                self._stream_scope.cancel()
+
+    async def _notify_loop(self) -> None:
+        sequence = 0
+        while True:
+            frame = await self.wait_frame(sequence)
+            sequence = frame.sequence
+            if (notify := self._notify) is None:
+                continue
+            try:
+                await notify(frame)
+            except Exception:
+                _logger.exception("failed to notify frame %s of %s", sequence, self.serial)
+            await sleep(self._notify_interval)
+
+
+_grabbers: dict[str, FrameGrabber] = {}
+
+_frame_source: FrameSource = minicap_source
+
+
+def get_frame_source() -> FrameSource:
+    """Get the function opening the streams of the frame grabbers."""
+    return _frame_source
+
+
+def set_frame_source(source: FrameSource) -> None:
+    """Set the function opening the streams of the frame grabbers."""
+    global _frame_source
+    _frame_source = source
+
+
+def get_grabber(serial: str) -> FrameGrabber | None:
+    """Get the frame grabber of a device, if it has one."""
+    return _grabbers.get(serial)
+
+
+def latest_frame(serial: str) -> LiveFrame | None:
+    """The latest frame of a device, or None if no stream of it is connected."""
+    grabber = _grabbers.get(serial)
+    return grabber.latest if grabber is not None else None
+
+
+async def start_grabber(
+    serial: str,
+    *,
+    notify: Callable[[LiveFrame], Awaitable[None]] | None = None,
+    notify_interval: float = 0.5,
+) -> FrameGrabber:
+    """Start the frame grabber of a device in the background task group.
+
+    If it is already running, it keeps its stream and is given the new ``notify`` and ``notify_interval``.
+    """
+    if (grabber := _grabbers.get(serial)) is not None:
+        grabber.configure(notify=notify, notify_interval=notify_interval)
+        return grabber
+    # Only minicap started by minicap_source is given a rotation, that a restart changes
+    rotation = display_rotation if _frame_source is minicap_source else None
+    grabber = _grabbers[serial] = FrameGrabber(
+        serial, _frame_source, notify=notify, notify_interval=notify_interval, rotation=rotation
+    )
+    await get_background_task_group().start(grabber.run)
+    return grabber
+
+
+def stop_grabber(serial: str) -> bool:
+    """Stop the frame grabber of a device.
+
+    Returns:
+        bool: Whether the device had one
+    """
+    if (grabber := _grabbers.pop(serial, None)) is None:
+        return False
+    grabber.stop()
+    return True
@@ -0,0 +1,338 @@
+"""Supervision of the background scrcpy processes.
+
+Each device has at most one supervised scrcpy, run as a task of the background task group.
+A process that crashes (exits with a non-zero code without being stopped) is started again after a backoff,
+which doubles after each crash and is reset once a process has run for a while.
+A process that keeps crashing is given up after a few attempts, and one that exits with code 0
+(the mirror window was closed) is not restarted.
+
+The number of supervised processes is capped, and on Linux each process gets limits on its CPU time and memory.
+"""
+
+from __future__ import annotations
+
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from subprocess import DEVNULL
+from typing import TYPE_CHECKING, Any, Literal
+
+from anyio import (
+    TASK_STATUS_IGNORED,
+    CancelScope,
+    Event,
+    create_task_group,
+    move_on_after,
+    open_process,
+    sleep,
+)
+from anyio.abc import Process, TaskStatus
+from fastmcp.utilities.logging import get_logger
+
+from .background import get_background_task_group
+from .logbuffer import LogBuffer
+
+if TYPE_CHECKING:
+    from .recording import Recording
+
+__all__ = [
+    "Supervised",
+    "SupervisorLimits",
+    "apply_limits",
+    "get_supervisor",
+    "get_supervisor_limits",
+    "set_supervisor_limits",
+    "terminate",
+]
+
+State = Literal["starting", "running", "backoff", "stopped", "exited", "failed"]
+
+# Seconds a stopped process gets to exit by itself before it is killed
+_STOP_TIMEOUT = 5.0
+
+# Lines of output kept for each process
+_LOG_LINES = 1000
+
+# Supervised processes kept after they end, for their state and output
+_MAX_ENDED = 16
+
+_logger = get_logger(__name__)
+
+
+@dataclass(slots=True)
+class SupervisorLimits:
+    """Limits of the supervised processes."""
+
+    max_processes: int = 4
+    """Maximum number of processes supervised at the same time"""
+    cpu_seconds: int = 0
+    """CPU time limit of each process (RLIMIT_CPU), 0 means no limit"""
+    memory_bytes: int = 0
+    """Address space limit of each process (RLIMIT_AS), 0 means no limit"""
+    max_restarts: int = 5
+    """Restarts after consecutive crashes before giving up"""
+    backoff: float = 1.0
+    """Seconds before the first restart, doubled after each crash"""
+    max_backoff: float = 60.0
+    """Longest wait before a restart"""
+    stable_seconds: float = 30.0
+    """A process running this long resets the backoff and the count of consecutive crashes"""
+
+
+_limits = SupervisorLimits()
+
+
+async def terminate(process: Process, timeout: float = _STOP_TIMEOUT) -> None:
+    """Terminate a process, then kill it if it has not exited within ``timeout`` seconds, and close it.
+
+    Terminating lets scrcpy finish the file it records into.
+    """
+    if process.returncode is None:
+        process.terminate()
+        with move_on_after(timeout, shield=True) as scope:
+            await process.wait()
+        if scope.cancel_called:
+            process.kill()
+    with CancelScope(shield=True):
+        await process.aclose()
+
+
+def apply_limits(process: Process) -> None:
+    """Apply the CPU and memory limits to a process, where the platform allows it."""
+    if not (_limits.cpu_seconds or _limits.memory_bytes):
+        return
+    if sys.platform != "linux":
+        _logger.warning("CPU and memory limits of scrcpy are only supported on Linux")
+        return
+    import resource
+
+    try:
+        if _limits.cpu_seconds:
+            resource.prlimit(process.pid, resource.RLIMIT_CPU, (_limits.cpu_seconds, _limits.cpu_seconds))
+        if _limits.memory_bytes:
+            resource.prlimit(process.pid, resource.RLIMIT_AS, (_limits.memory_bytes, _limits.memory_bytes))
+    except (OSError, ValueError) as e:
+        _logger.warning("failed to set the limits of pid=%s: %s", process.pid, e)
+
+
+class Supervised:
+    """A supervised scrcpy: the mirror window of a device, or a headless recording of it."""
+
+    def __init__(self, serial: str, command: Sequence[str], *, recording: Recording | None = None) -> None:
+        """
+        Args:
+            serial: The device, empty for the only device connected
+            command: scrcpy and its options
+            recording: Run this recording instead of the command
+        """
+        self.serial = serial
+        self.command = list(command)
+        self.recording = recording
+        self.logs = recording.logs if recording is not None else LogBuffer(_LOG_LINES)
+        self.id = 0
+        self._pid: int | None = None
+        self.state: State = "starting"
+        self.restarts = 0
+        self.returncode: int | None = None
+        self.created = time.time()
+        self.process_started: float | None = None
+        # Set once start_scrcpy confirmed the startup: a crash before that is not restarted
+        self.confirmed = False
+        self.first_exit = Event()
+        self.ended = Event()
+        self._scope = CancelScope()
+
+    def to_dict(self) -> dict[str, Any]:
+        now = time.time()
+        return {
+            "pid": self.id,
+            "current_pid": self.pid,
+            "serial": self.serial,
+            "mode": "record" if self.recording is not None else "mirror",
+            "record_dir": str(self.recording.directory) if self.recording is not None else None,
+            "state": self.state,
+            "uptime": now - self.process_started if self.process_started is not None else None,
+            "age": now - self.created,
+            "restarts": self.restarts,
+            "returncode": self.returncode,
+        }
+
+    @property
+    def pid(self) -> int | None:
+        """The pid of the current process, None between restarts."""
+        if self.recording is not None:
+            return self.recording.pid
+        return self._pid
+
+    @property
+    def active(self) -> bool:
+        return not self.ended.is_set()
+
+    async def _run_process(self, *, task_status: TaskStatus[int] = TASK_STATUS_IGNORED) -> None:
+        """Run the process once, until it exits, and keep its return code. Started with its pid."""
+        if self.recording is not None:
+            async with create_task_group() as tg:
+                pid = await tg.start(self.recording.run)
+                self.process_started = time.time()
+                task_status.started(pid)
+            if self.recording.error:
+                self.logs.append("stderr", self.recording.error)
+            self.returncode = self.recording.returncode
+            return
+
+        process = await open_process(self.command, stdin=DEVNULL)
+        apply_limits(process)
+        self._pid, self.process_started = process.pid, time.time()
+        task_status.started(process.pid)
+        try:
+            async with create_task_group() as tg:
+                for name, stream in (("stdout", process.stdout), ("stderr", process.stderr)):
+                    if stream is not None:
+                        tg.start_soon(self.logs.collect, name, stream)
+                await process.wait()
+        finally:
+            await terminate(process)
+        self.returncode = process.returncode
+
+    async def run(self, *, task_status: TaskStatus[int] = TASK_STATUS_IGNORED) -> None:
+        """Run and restart the process until it is stopped, ends normally, or keeps crashing.
+
+        Started with the pid of the first process, which identifies the supervised process from then on.
+        """
+        backoff, crashes = _limits.backoff, 0
+        try:
+            with self._scope:
+                while True:
+                    try:
+                        async with create_task_group() as tg:
+                            pid = await tg.start(self._run_process)
+                            if not self.id:
+                                self.id = pid
+                                task_status.started(pid)
+                            self.state = "running"
+                    except Exception as e:
+                        self.state = "failed"
+                        if not self.id:
+                            # The first start failed: start_scrcpy reports it
+                            raise
+                        # scrcpy removed, recording directory gone ...: stop supervising, not the server
+                        _logger.exception("scrcpy of %r could not be run, giving up (pid=%s)", self.serial, self.id)
+                        self.logs.append("stderr", f"[supervisor] could not run scrcpy, giving up: {e}")
+                        return
+                    returncode = self.returncode
+                    self.first_exit.set()
+                    ran = time.time() - (self.process_started or time.time())
+                    self._pid = self.process_started = None
+                    if not self.confirmed:
+                        self.state = "failed"
+                        return
+                    if returncode == 0:
+                        self.state = "exited"
+                        return
+                    if ran >= _limits.stable_seconds:
+                        backoff, crashes = _limits.backoff, 0
+                    crashes += 1
+                    if crashes > _limits.max_restarts:
+                        _logger.error("scrcpy of %r keeps crashing, giving up (pid=%s)", self.serial, self.id)
+                        self.state = "failed"
+                        return
+                    _logger.warning(
+                        "scrcpy of %r exited with code %s, restarting in %ss (pid=%s)",
+                        self.serial,
+                        returncode,
+                        backoff,
+                        self.id,
+                    )
+                    self.logs.append("stderr", f"[supervisor] exited with code {returncode}, restarting in {backoff}s")
+                    self.state = "backoff"
+                    await sleep(backoff)
+                    backoff = min(backoff * 2, _limits.max_backoff)
+                    self.restarts += 1
+            self.state = "stopped"
+        finally:
+            if self.state not in ("stopped", "exited", "failed"):
+                self.state = "stopped"
+            self._pid = self.process_started = None
+            self.first_exit.set()
+            self.ended.set()
+
+    async def stop(self, timeout: float = _STOP_TIMEOUT) -> bool:
+        """Stop supervising, and terminate the process.
+
+        Returns:
+            bool: Whether it ended within ``timeout`` seconds
+        """
+        self._scope.cancel()
+        with move_on_after(timeout) as scope:
+            await self.ended.wait()
+        return not scope.cancel_called
+
+
+class _Supervisor:
+    def __init__(self) -> None:
+        self._processes: OrderedDict[int, Supervised] = OrderedDict()
+        # Processes being started, which have no pid yet but already take their slot
+        self._starting: list[Supervised] = []
+
+    def list(self) -> list[Supervised]:
+        return list(self._processes.values())
+
+    def get(self, pid: int) -> Supervised | None:
+        """Find a supervised process by the pid start returned, or by the pid of its current process."""
+        if (supervised := self._processes.get(pid)) is not None:
+            return supervised
+        return next((s for s in self._processes.values() if s.pid == pid), None)
+
+    async def start(self, supervised: Supervised) -> int:
+        """Start supervising a process in the background task group.
+
+        Returns:
+            int: The pid of its first process, which identifies it
+        """
+        active = [s for s in self._processes.values() if s.active] + self._starting
+        if (other := next((s for s in active if s.serial == supervised.serial), None)) is not None:
+            raise RuntimeError(
+                f"scrcpy is already running for {supervised.serial or 'the device'} (pid={other.id}), stop it first"
+            )
+        if len(active) >= _limits.max_processes:
+            raise RuntimeError(f"Too many scrcpy processes (at most {_limits.max_processes}), stop one first")
+        # Reserve the slot before the first await, so that concurrent starts see it
+        self._starting.append(supervised)
+        try:
+            pid = await get_background_task_group().start(supervised.run)
+        finally:
+            self._starting.remove(supervised)
+        self._processes[pid] = supervised
+        ended = [p for p, s in self._processes.items() if not s.active]
+        for p in ended[: max(0, len(ended) - _MAX_ENDED)]:
+            del self._processes[p]
+        return pid
+
+
+_supervisor = _Supervisor()
+
+
+def get_supervisor() -> _Supervisor:
+    """Get the supervisor of the background scrcpy processes."""
+    return _supervisor
+
+
+def get_supervisor_limits() -> SupervisorLimits:
+    """Get the limits of the supervised processes."""
+    return _limits
+
+
+def set_supervisor_limits(
+    max_processes: int | None = None, cpu_seconds: int | None = None, memory_bytes: int | None = None
+) -> None:
+    """Set the limits of the supervised processes. None keeps a limit unchanged."""
+    if max_processes is not None:
+        if max_processes < 1:
+            raise ValueError("max_processes must be at least 1")
+        _limits.max_processes = max_processes
+    if cpu_seconds is not None:
+        _limits.cpu_seconds = cpu_seconds
+    if memory_bytes is not None:
+        _limits.memory_bytes = memory_bytes
@@ -1,8 +1,11 @@
 from .action import *
 from .app import *
+from .batch import *
 from .clipboard import *
 from .device import *
 from .element import *
+from .fanout import *
 from .input import *
 from .misc import *
 from .scrcpy import *
+from .stream import *
@@ -1,8 +1,7 @@
 from __future__ import annotations
 
-from anyio import to_thread
-
 from ..mcp import mcp
+from ..workers import run_sync
 from .device import get_device
 
 __all__ = (
@@ -28,7 +27,7 @@ async def click(serial: str, x: int, y: int):
         y (int): Y coordinate
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.click, x, y)
+        await run_sync(device.click, x, y, serial=serial)
 
 
 @mcp.tool("long_click", tags={"action:touch"})
@@ -42,7 +41,7 @@ async def long_click(serial: str, x: int, y: int, duration: float = 0.5):
         duration (float): Duration of the long click in seconds, default is 0.5
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.long_click, x, y, duration)
+        await run_sync(device.long_click, x, y, duration, serial=serial)
 
 
 @mcp.tool("double_click", tags={"action:touch"})
@@ -56,7 +55,7 @@ async def double_click(serial: str, x: int, y: int, duration: float = 0.1):
         duration (float): Duration between clicks in seconds, default is 0.1
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.double_click, x, y, duration)
+        await run_sync(device.double_click, x, y, duration, serial=serial)
 
 
 @mcp.tool("swipe", tags={"action:gesture"})
@@ -73,7 +72,9 @@ async def swipe(serial: str, fx: int, fy: int, tx: int, ty: int, duration: float
         steps: 1 steps is about 5ms, if set, duration will be ignore
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.swipe, fx, fy, tx, ty, duration if duration > 0 else None, step if step > 0 else None)
+        await run_sync(
+            device.swipe, fx, fy, tx, ty, duration if duration > 0 else None, step if step > 0 else None, serial=serial
+        )
 
 
 @mcp.tool("swipe_points", tags={"action:gesture"})
@@ -86,7 +87,7 @@ async def swipe_points(serial: str, points: list[tuple[int, int]], duration: flo
         duration (float): Duration of swipe in seconds, default is 0.5
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.swipe_points, points, duration)
+        await run_sync(device.swipe_points, points, duration, serial=serial)
 
 
 @mcp.tool("drag", tags={"action:gesture"})
@@ -102,7 +103,7 @@ async def drag(serial: str, sx: int, sy: int, ex: int, ey: int, duration: float
         duration (float): Duration of drag in seconds, default is 0.5
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.drag, sx, sy, ex, ey, duration)
+        await run_sync(device.drag, sx, sy, ex, ey, duration, serial=serial)
 
 
 @mcp.tool("press_key", tags={"action:key"})
@@ -118,7 +119,7 @@ async def press_key(serial: str, key: str):
             volume_mute, camera, power
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.press, key)
+        await run_sync(device.press, key, serial=serial)
 
 
 @mcp.tool("screen_on", tags={"action:screen"})
@@ -129,7 +130,7 @@ async def screen_on(serial: str):
         serial (str): Android device serialno
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.screen_on)
+        await run_sync(device.screen_on, serial=serial)
 
 
 @mcp.tool("screen_off", tags={"action:screen"})
@@ -140,4 +141,4 @@ async def screen_off(serial: str):
         serial (str): Android device serialno
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.screen_off)
+        await run_sync(device.screen_off, serial=serial)
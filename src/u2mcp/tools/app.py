@@ -1,11 +1,23 @@
 from __future__ import annotations
 
-from typing import Any
-
-from anyio import to_thread
-
+import time
+from contextvars import ContextVar
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO
+
+from anyio import from_thread
+from fastmcp import Context
+from fastmcp.server.dependencies import get_context
+from fastmcp.utilities.logging import get_logger
+
+from ..apk import ApkManifest, fetch_apk, is_url, read_apk_manifest
 from ..mcp import mcp
-from .device import get_device
+from ..workers import run_sync
+from .device import get_device, poll_device
+
+if TYPE_CHECKING:
+    import uiautomator2 as u2
 
 __all__ = (
     "app_install",
@@ -23,16 +35,130 @@ __all__ = (
 )
 
 
+# Off while a tool runs on many devices at once, whose progress would mix on the one progress token of the call
+progress_reporting: ContextVar[bool] = ContextVar("progress_reporting", default=True)
+
+
+class _Progress:
+    """Report progress of a transfer to the client, at most a few times per second."""
+
+    _INTERVAL = 0.25
+
+    def __init__(self, ctx: Context | None, message: str) -> None:
+        self._ctx = ctx
+        self._message = message
+        self._reported = 0.0
+
+    def due(self, done: int, total: int | None) -> bool:
+        """Whether to report this much progress, and if so count it as reported."""
+        if self._ctx is None:
+            return False
+        now = time.monotonic()
+        if done != total and now - self._reported < self._INTERVAL:
+            return False
+        self._reported = now
+        return True
+
+    async def report(self, done: int, total: int | None) -> None:
+        if self._ctx is not None:
+            await self._ctx.report_progress(done, total, self._message)
+
+    async def __call__(self, done: int, total: int | None) -> None:
+        if self.due(done, total):
+            await self.report(done, total)
+
+
+class _ProgressReader:
+    """File reader that reports how much was read, called from the worker thread pushing the file."""
+
+    def __init__(self, fp: BinaryIO, total: int, progress: _Progress) -> None:
+        self._fp = fp
+        self._total = total
+        self._progress = progress
+        self._done = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._fp.read(size)
+        self._done += len(chunk)
+        if self._progress.due(self._done, self._total):
+            from_thread.run(self._progress.report, self._done, self._total)
+        return chunk
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+def _push_and_install(device: u2.Device, path: Path, remote_path: str, progress: _Progress) -> None:
+    with path.open("rb") as fp:
+        device.adb_device.sync.push(_ProgressReader(fp, path.stat().st_size, progress), remote_path)  # type: ignore[arg-type]
+    device.adb_device.install_remote(remote_path, clean=True)
+
+
 @mcp.tool("app_install", tags={"app:manage"})
-async def app_install(serial: str, data: str):
+async def app_install(serial: str, data: str, force: bool = False, refresh: bool = False) -> dict[str, Any]:
     """Install app
 
+    An APK from a url is downloaded once into a local cache, and reused for other devices and later installs.
+    After a minute, the cached url is revalidated with the server, and downloaded again if it changed.
+    Progress of the download and of the push to the device is reported to the client.
+    The install is skipped when the device already has the same package with the same versionCode.
+    To install one APK on many devices at once, run this tool with `device_fanout`.
+
     Args:
         serial (str): Android device serialno
         data (str): APK file path or url
+        force (bool): install even if the device already has the same versionCode
+        refresh (bool): download the url again even if it is cached
+
+    Returns:
+        dict[str,Any]: A dict with the following keys:
+            - installed (bool): False if the install was skipped
+            - package_name (str | None): Package name of the APK
+            - version_code (int | None): versionCode of the APK
     """
+    logger = get_logger(f"{__name__}.app_install")
+    try:
+        ctx: Context | None = get_context() if progress_reporting.get() else None
+    except RuntimeError:
+        ctx = None
+
+    if is_url(data):
+        path = await fetch_apk(data, _Progress(ctx, "Downloading"), refresh=refresh)
+    else:
+        path = Path(data)
+    if not path.is_file():
+        raise FileNotFoundError(f"File or URL not found: {data}")
+
+    manifest: ApkManifest | None
+    try:
+        manifest = await run_sync(read_apk_manifest, path)
+    except Exception as e:  # noqa: BLE001
+        logger.warning("Cannot read the manifest of %s: %s", data, e)
+        manifest = None
+    result: dict[str, Any] = {
+        "installed": False,
+        "package_name": manifest.package_name if manifest else None,
+        "version_code": manifest.version_code if manifest else None,
+    }
+
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.app_install, data)
+        if not force and manifest and manifest.package_name and manifest.version_code is not None:
+            from uiautomator2.exceptions import AppNotFoundError
+
+            try:
+                installed = await run_sync(device.app_info, manifest.package_name, serial=serial)
+            except AppNotFoundError:
+                installed = None
+            if installed and installed.get("versionCode") == manifest.version_code:
+                logger.info("%s %s is already installed on %s", manifest.package_name, manifest.version_code, serial)
+                return result
+
+        remote_path = f"/data/local/tmp/{manifest.package_name if manifest and manifest.package_name else path.stem}.apk"
+        await run_sync(
+            partial(_push_and_install, device, path, remote_path, _Progress(ctx, "Pushing")), serial=serial, pool="wait"
+        )
+    result["installed"] = True
+    return result
 
 
 @mcp.tool("app_uninstall", tags={"app:manage"})
@@ -47,7 +173,7 @@ async def app_uninstall(serial: str, package_name: str) -> bool:
         bool: success
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(device.app_uninstall, package_name)
+        return await run_sync(device.app_uninstall, package_name, serial=serial)
 
 
 @mcp.tool("app_uninstall_all", tags={"app:manage"})
@@ -62,7 +188,7 @@ async def app_uninstall_all(serial: str, excludes: list[str] | None = None) -> l
         list[str]: list of uninstalled apps
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(device.app_uninstall_all, excludes or [])
+        return await run_sync(device.app_uninstall_all, excludes or [], serial=serial)
 
 
 @mcp.tool("app_start", tags={"app:lifecycle"})
@@ -83,7 +209,13 @@ async def app_start(
         wait (bool): wait until app started. default False
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.app_start, package_name, activity, wait, stop)
+        await run_sync(device.app_start, package_name, activity, wait, stop, serial=serial, pool="wait" if wait else "quick")
+
+
+def _app_running(device: u2.Device, package_name: str, front: bool) -> bool:
+    if front:
+        return device.app_current()["package"] == package_name
+    return package_name in device.app_list_running()
 
 
 @mcp.tool("app_wait", tags={"app:lifecycle"})
@@ -96,9 +228,8 @@ async def app_wait(serial: str, package_name: str, timeout: float = 20.0, front=
         timeout (float): maximum wait time seconds
         front (bool): wait until app is current app
     """
-    async with get_device(serial) as device:
-        if not await to_thread.run_sync(device.app_wait, package_name, timeout, front):
-            raise RuntimeError(f"Failed to wait App {package_name} to launch")
+    if not await poll_device(serial, partial(_app_running, package_name=package_name, front=front), timeout, 1.0):
+        raise RuntimeError(f"Failed to wait App {package_name} to launch")
 
 
 @mcp.tool("app_stop", tags={"app:lifecycle"})
@@ -110,7 +241,7 @@ async def app_stop(serial: str, package_name: str):
         package_name (str): package name
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.app_stop, package_name)
+        await run_sync(device.app_stop, package_name, serial=serial)
 
 
 @mcp.tool("app_stop_all", tags={"app:lifecycle"})
@@ -124,7 +255,7 @@ async def app_stop_all(serial: str, excludes: list[str] | None = None) -> list[s
         list[str]: a list of killed apps
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(device.app_stop_all, excludes or [])
+        return await run_sync(device.app_stop_all, excludes or [], serial=serial)
 
 
 @mcp.tool("app_clear", tags={"app:config"})
@@ -139,7 +270,7 @@ async def app_clear(serial: str, package_name: str):
         bool: success
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.app_clear, package_name)
+        await run_sync(device.app_clear, package_name, serial=serial)
 
 
 @mcp.tool("app_info", tags={"app:info"})
@@ -158,7 +289,7 @@ async def app_info(serial: str, package_name: str) -> dict[str, Any]:
             {"versionName": "1.1.7", "versionCode": 1001007}
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(device.app_info, package_name)
+        return await run_sync(device.app_info, package_name, serial=serial)
 
 
 @mcp.tool("app_current", tags={"app:info"})
@@ -173,7 +304,7 @@ async def app_current(serial: str) -> dict[str, Any]:
         dict[str,Any]: running app info
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(device.app_current)
+        return await run_sync(device.app_current, serial=serial)
 
 
 @mcp.tool("app_list", tags={"app:info"})
@@ -189,7 +320,7 @@ async def app_list(serial: str, filter: str = "") -> list[str]:
         list[str]: list of apps by filter
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(device.app_list, filter.strip())
+        return await run_sync(device.app_list, filter.strip(), serial=serial)
 
 
 @mcp.tool("app_list_running", tags={"app:info"})
@@ -204,7 +335,7 @@ async def app_list_running(serial: str) -> list[str]:
         list[str]: list of running apps
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(device.app_list_running)
+        return await run_sync(device.app_list_running, serial=serial)
 
 
 @mcp.tool("app_auto_grant_permissions", tags={"app:config"})
@@ -229,4 +360,4 @@ async def app_auto_grant_permissions(serial: str, package_name: str):
             must be an optional permission defined by the app.
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.app_auto_grant_permissions, package_name)
+        await run_sync(device.app_auto_grant_permissions, package_name, serial=serial)
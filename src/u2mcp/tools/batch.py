@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import inspect
+import time
+from typing import Any
+
+from fastmcp.tools import FunctionTool
+
+from ..mcp import mcp
+from .action import click, double_click, drag, long_click, press_key, screen_off, screen_on, swipe, swipe_points
+from .device import call_tool, hold_device
+from .element import (
+    element_click,
+    element_click_nowait,
+    element_get_text,
+    element_long_click,
+    element_set_text,
+    element_swipe,
+    element_wait,
+    element_wait_gone,
+)
+from .input import clear_text, hide_keyboard, send_text
+from .misc import delay
+
+__all__ = ("run_actions",)
+
+
+# Tools that `run_actions` runs, each called with its own arguments and, but for `delay`, the serial of the list
+_STEPS: dict[str, FunctionTool] = {
+    tool.name: tool
+    for tool in (
+        click,
+        long_click,
+        double_click,
+        swipe,
+        swipe_points,
+        drag,
+        press_key,
+        screen_on,
+        screen_off,
+        send_text,
+        clear_text,
+        hide_keyboard,
+        element_wait,
+        element_wait_gone,
+        element_click,
+        element_click_nowait,
+        element_long_click,
+        element_get_text,
+        element_set_text,
+        element_swipe,
+        delay,
+    )
+}
+
+
+def _bind(spec: dict[str, Any], serial: str) -> tuple[FunctionTool, dict[str, Any]]:
+    """Look up the tool of an action spec, and check its arguments against the tool signature."""
+    kwargs = dict(spec)
+    name = kwargs.pop("action", None)
+    if not isinstance(name, str) or (tool := _STEPS.get(name)) is None:
+        raise ValueError(f"Unsupported action: {name}")
+    signature = inspect.signature(tool.fn)
+    if "serial" in kwargs:
+        raise ValueError(f"Invalid arguments for action {name}: unexpected keyword argument 'serial'")
+    if "serial" in signature.parameters:
+        kwargs["serial"] = serial
+    try:
+        signature.bind(**kwargs)
+    except TypeError as e:
+        raise ValueError(f"Invalid arguments for action {name}: {e}") from None
+    return tool, kwargs
+
+
+@mcp.tool("run_actions", tags={"action:batch"})
+async def run_actions(serial: str, actions: list[dict[str, Any]], stop_on_error: bool = True) -> dict[str, Any]:
+    """Run a list of actions back-to-back on a device
+
+    The device is held during the whole list, so a scripted flow (for example a login form) runs
+    without other tools interleaving and without a round-trip per action.
+    Waits and delays sleep between probes of the device, so cancelling the list stops it at once.
+
+    Args:
+        serial (str): Android device serialno
+        actions (list[dict]): Ordered actions. Each one has an "action" key naming the tool to run,
+            and the arguments of that tool, without "serial". For example:
+            [{"action": "element_click", "xpath": "//*[@text='Sign in']"},
+             {"action": "send_text", "text": "alice", "clear": true},
+             {"action": "press_key", "key": "enter"},
+             {"action": "delay", "seconds": 1}]
+            Supported actions: click, long_click, double_click, swipe, swipe_points, drag, press_key, screen_on,
+            screen_off, send_text, clear_text, hide_keyboard, element_wait, element_wait_gone, element_click,
+            element_click_nowait, element_long_click, element_get_text, element_set_text, element_swipe, delay
+        stop_on_error (bool): stop at the first failed action, or go on with the rest. Defaults to True.
+            An unknown action or invalid arguments fail the whole list before any action runs.
+
+    Returns:
+        dict[str,Any]: A dict with the following keys:
+            - ok (bool): Whether every action ran successfully
+            - elapsed (float): Seconds taken by the whole list
+            - steps (list[dict]): One entry per action run, with "index", "action", "ok", "elapsed" (seconds),
+              and "result" (the return value of the action) or "error"
+    """
+    # Check the whole list before running any of it
+    steps = [_bind(spec, serial) for spec in actions]
+    started = time.perf_counter()
+    results: list[dict[str, Any]] = []
+    async with hold_device(serial):
+        for index, (tool, kwargs) in enumerate(steps):
+            result: dict[str, Any] = {"index": index, "action": tool.name}
+            step_started = time.perf_counter()
+            # Each action runs as its tool would on its own, through the middleware of the server
+            try:
+                result["result"] = await call_tool(tool, kwargs)
+                result["ok"] = True
+            except Exception as e:  # noqa: BLE001
+                result["ok"] = False
+                result["error"] = f"{type(e).__name__}: {e}"
+            result["elapsed"] = time.perf_counter() - step_started
+            results.append(result)
+            if not result["ok"] and stop_on_error:
+                break
+    return {
+        "ok": len(results) == len(steps) and all(result["ok"] for result in results),
+        "elapsed": time.perf_counter() - started,
+        "steps": results,
+    }
@@ -1,8 +1,7 @@
 from __future__ import annotations
 
-from anyio import to_thread
-
 from ..mcp import mcp
+from ..workers import run_sync
 from .device import get_device
 
 __all__ = ("read_clipboard", "write_clipboard")
@@ -20,7 +19,7 @@ async def read_clipboard(serial: str) -> str | None:
         None: If there is no text in the clip.
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.clipboard)
+        return await run_sync(lambda: device.clipboard, serial=serial)
 
 
 @mcp.tool("write_clipboard", tags={"clipboard:write"})
@@ -32,4 +31,4 @@ async def write_clipboard(serial: str, text: str):
         text: The actual text in the clip.
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.set_clipboard, text)
+        await run_sync(device.set_clipboard, text, serial=serial)
@@ -1,19 +1,52 @@
 from __future__ import annotations
 
 import argparse
-from base64 import b64encode
-from collections.abc import AsyncGenerator
+import copy
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Callable
 from contextlib import asynccontextmanager
-from io import BytesIO
-from typing import Any
-
-import uiautomator2 as u2
-from adbutils import adb
-from anyio import Lock, to_thread
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from anyio import TASK_STATUS_IGNORED, Event, sleep
+from anyio.abc import TaskStatus
+from fastmcp import Context
+from fastmcp.server.dependencies import get_context
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
+from fastmcp.server.middleware.middleware import make_middleware_wrapper
+from fastmcp.tools import FunctionTool, Tool
 from fastmcp.utilities.logging import get_logger
-from PIL.Image import Image
-
+from mcp.types import CallToolRequestParams
+
+from .. import workers
+from ..devicewatch import DeviceWatcher, get_device_watcher, watch_devices
+from ..hierarchy import (
+    HierarchyFormat,
+    compact_hierarchy,
+    diff_nodes,
+    flatten_nodes,
+    render_json,
+    render_text,
+)
+from ..imaging import Frame, ImageFormat, encode_frame
+from ..lazy import lazy_import
 from ..mcp import mcp
+from ..metrics import observe_lock_wait
+from ..streaming import latest_frame
+from ..tracing import add_span
+from ..workers import run_sync
+
+if TYPE_CHECKING:
+    import uiautomator2 as u2
+    from adbutils import adb
+    from uiautomator2.xpath import PageSource
+else:
+    u2 = lazy_import("uiautomator2")
+    adb = lazy_import("adbutils", "adb")
+    PageSource = lazy_import("uiautomator2.xpath", "PageSource")
 
 __all__ = (
     "device_list",
@@ -25,32 +58,481 @@ __all__ = (
     "window_size",
     "screenshot",
     "dump_hierarchy",
+    "dump_hierarchy_diff",
     "info",
+    "lock_wait_stats",
+    "worker_stats",
 )
 
 
-_devices: dict[str, tuple[Lock, u2.Device]] = {}
-_global_device_connection_lock = Lock()
+class ReadWriteLock:
+    """A writer-preferring reader-writer lock for anyio tasks.
 
+    Any number of readers may hold the lock together, while a writer holds it alone.
+    Once a writer is waiting, new readers queue behind it so that writers are not starved.
+    """
 
-@asynccontextmanager
-async def get_device(serial: str) -> AsyncGenerator[u2.Device]:
-    async with _global_device_connection_lock:
+    def __init__(self) -> None:
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+        self._changed = Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = Event()
+
+    async def acquire_read(self) -> None:
+        while self._writer or self._waiting_writers:
+            await self._changed.wait()
+        self._readers += 1
+
+    def release_read(self) -> None:
+        self._readers -= 1
+        if not self._readers:
+            self._notify()
+
+    async def acquire_write(self) -> None:
+        self._waiting_writers += 1
         try:
-            lock, device = _devices[serial]
+            while self._writer or self._readers:
+                await self._changed.wait()
+        except BaseException:
+            # Readers queued behind this writer may go on now
+            self._notify()
+            raise
+        finally:
+            self._waiting_writers -= 1
+        self._writer = True
+
+    def release_write(self) -> None:
+        self._writer = False
+        self._notify()
+
+    @asynccontextmanager
+    async def read(self) -> AsyncGenerator[None]:
+        await self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @asynccontextmanager
+    async def write(self) -> AsyncGenerator[None]:
+        await self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+# Tools whose tags are all in this set only read from the device,
+# so they share the device lock instead of holding it exclusively.
+SHARED_ACCESS_TAGS = frozenset(
+    {
+        "device:info",
+        "device:capture",
+        "screen:capture",
+        "app:info",
+        "element:query",
+        "element:capture",
+        "clipboard:read",
+    }
+)
+
+
+@dataclass(frozen=True, slots=True)
+class _ToolCall:
+    name: str
+    shared: bool
+
+
+_current_tool_call: ContextVar[_ToolCall | None] = ContextVar("_current_tool_call", default=None)
+
+# The device held by :func:`hold_device` in the current task
+_held_device: ContextVar[tuple[str, u2.Device] | None] = ContextVar("_held_device", default=None)
+
+
+class DeviceAccessMiddleware(Middleware):
+    """Classify each tool call as a shared reader or an exclusive writer of the device, by the tags of the tool."""
+
+    def __init__(self) -> None:
+        self._shared_by_tool: dict[str, bool] = {}
+
+    @staticmethod
+    def is_shared(tool: Tool) -> bool:
+        return bool(tool.tags) and tool.tags <= SHARED_ACCESS_TAGS
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        name = context.message.name
+        try:
+            shared = self._shared_by_tool[name]
         except KeyError:
+            shared = self._shared_by_tool[name] = self.is_shared(await mcp.get_tool(name))
+        token = _current_tool_call.set(_ToolCall(name, shared))
+        try:
+            return await call_next(context)
+        finally:
+            _current_tool_call.reset(token)
+
+
+mcp.add_middleware(DeviceAccessMiddleware())
+
+
+async def call_tool(tool: FunctionTool, arguments: dict[str, Any]) -> Any:
+    """Call a tool from another tool, through the middleware of the server as a call of the client would be.
+
+    So metrics, traces, device access and recording indexes see each call a tool makes on behalf of the client.
+
+    Returns:
+        What the tool function returns, not a tool result
+    """
+
+    async def call(context: MiddlewareContext[CallToolRequestParams]) -> Any:
+        return await tool.fn(**(context.message.arguments or {}))
+
+    try:
+        ctx: Context | None = get_context()
+    except RuntimeError:
+        ctx = None
+    context = MiddlewareContext(
+        message=CallToolRequestParams(name=tool.name, arguments=arguments),
+        fastmcp_context=ctx,
+        source="client",
+        type="request",
+        method="tools/call",
+    )
+    # The chain is built as fastmcp builds it, from its middleware wrapper: fastmcp is pinned to the versions that have it
+    call_next: CallNext[CallToolRequestParams, Any] = call
+    for middleware in reversed(mcp.middleware):
+        call_next = make_middleware_wrapper(middleware, call_next)
+    return await call_next(context)
+
+
+@dataclass(slots=True)
+class _LockWaitStats:
+    shared: bool
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.calls += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+_lock_wait_stats: dict[str, _LockWaitStats] = {}
 
-            def _connect():
-                _d = u2.connect(serial)
-                _d.info
-                return _d
 
-            device = await to_thread.run_sync(_connect)
-            lock = Lock()
-            _devices[serial] = lock, device
+_devices: dict[str, tuple[ReadWriteLock, u2.Device]] = {}
+
+
+class _PendingConnection:
+    """An in-flight connection to one device, shared by every caller asking for the same serial."""
+
+    def __init__(self) -> None:
+        self.event = Event()
+        self.entry: tuple[ReadWriteLock, u2.Device] | None = None
+        self.error: Exception | None = None
+
+    async def wait(self) -> tuple[ReadWriteLock, u2.Device] | None:
+        """Wait for the connection. None if the caller connecting was cancelled, and the connection must be retried."""
+        await self.event.wait()
+        if self.error is not None:
+            # Each waiter raises its own copy, so that their tracebacks do not pile up on one exception
+            try:
+                error = copy.copy(self.error)
+            except Exception:  # noqa: BLE001
+                error = RuntimeError(str(self.error))
+            raise error from self.error
+        return self.entry
+
+
+_pending_connections: dict[str, _PendingConnection] = {}
+
+
+def _connect(serial: str) -> u2.Device:
+    _d = u2.connect(serial)
+    _d.info
+    return _d
+
+
+async def _get_or_connect(serial: str) -> tuple[ReadWriteLock, u2.Device]:
+    """Return the registry entry of a device, connecting to it if needed.
+
+    Concurrent first calls for the same serial share one in-flight connection,
+    while calls for different serials connect in parallel.
+    There is no await between the registry look-ups and the insertion of the pending connection,
+    so no lock is needed to update them.
+    If the caller connecting is cancelled, the others connect again instead of failing with its cancellation.
+    """
+    while True:
+        try:
+            return _devices[serial]
+        except KeyError:
+            pass
+
+        # The device watcher knows a device that is not ready without asking it
+        watcher = get_device_watcher()
+        tracked = watcher.get(serial) if watcher is not None and watcher.synced else None
+        if tracked is not None and tracked.state != "device":
+            raise u2.ConnectError(f"Device {serial} is {tracked.state}")
+
+        if (pending := _pending_connections.get(serial)) is None:
+            break
+        if (entry := await pending.wait()) is not None:
+            return entry
+
+    pending = _pending_connections[serial] = _PendingConnection()
+    try:
+        device = await run_sync(_connect, serial, serial=serial, pool="wait")
+    except Exception as e:
+        pending.error = e
+        raise
+    else:
+        pending.entry = _devices[serial] = ReadWriteLock(), device
+        return pending.entry
+    finally:
+        del _pending_connections[serial]
+        pending.event.set()
+
+
+def connection_states() -> dict[str, str]:
+    """Get the devices known to the server: ``"connected"``, or ``"connecting"`` while their first connection runs."""
+    states = dict.fromkeys(_pending_connections, "connecting")
+    states.update(dict.fromkeys(_devices, "connected"))
+    return states
+
+
+def _forget_device(serial: str) -> bool:
+    """Drop the connection to a device and everything cached about it.
+
+    Returns:
+        bool: Whether the device was connected
+    """
+    invalidate_metadata(serial)
+    invalidate_hierarchy(serial)
+    _hierarchy_snapshots.pop(serial, None)
+    for key in [key for key in _last_frames if key[0] == serial]:
+        del _last_frames[key]
+    return _devices.pop(serial, None) is not None
+
+
+async def _prewarm_device(serial: str) -> None:
+    """Connect to a device that was just attached, so its first tool call does not wait for it."""
+    logger = get_logger(f"{__name__}.prewarm")
+    try:
+        await _get_or_connect(serial)
+    except Exception as e:
+        # Whatever uiautomator2 raises for one device must not stop the watcher, the first tool call will retry
+        logger.warning("Cannot connect to attached device %s: %s", serial, e, exc_info=True)
+        return
+    watcher = get_device_watcher()
+    if watcher is not None and (tracked := watcher.get(serial)) is not None and tracked.state != "device":
+        # Detached while connecting
+        _forget_device(serial)
+
+
+def _device_detached(serial: str) -> None:
+    if _forget_device(serial):
+        get_logger(f"{__name__}.watch").warning("Device %s is no longer connected, delete it!", serial)
+
+
+async def run_device_watcher(*, prewarm: bool = False, task_status: TaskStatus[DeviceWatcher] = TASK_STATUS_IGNORED) -> None:
+    """Watch the devices of the adb server, dropping detached ones.
+
+    Args:
+        prewarm: Also connect to attached devices ahead of their first tool call
+    """
+    await watch_devices(on_attached=_prewarm_device if prewarm else None, on_detached=_device_detached, task_status=task_status)
+
+
+@asynccontextmanager
+async def get_device(serial: str, *, shared: bool | None = None) -> AsyncGenerator[u2.Device]:
+    """Connect to a device if needed, and hold its lock while using it.
+
+    Args:
+        serial: Android device serialno
+        shared: Hold the lock shared with other readers instead of exclusively.
+            If None, it is decided by the tags of the tool being called, and is exclusive outside a tool call.
+    """
+    tool_call = _current_tool_call.get()
+    if shared is None:
+        shared = tool_call is not None and tool_call.shared
+    if (held := _held_device.get()) is not None and held[0] == serial:
+        # Already held exclusively by this task, for a batch of tool calls
+        try:
+            yield held[1]
+        finally:
+            if not shared:
+                invalidate_hierarchy(serial)
+                invalidate_metadata(serial)
+        return
+    if (entry := _devices.get(serial)) is None:
+        started = time.perf_counter()
+        entry = await _get_or_connect(serial)
+        add_span("device.connect", time.perf_counter() - started, serial=serial)
+    lock, device = entry
+    started = time.perf_counter()
+    async with lock.read() if shared else lock.write():
+        waited = time.perf_counter() - started
+        add_span("device.lock", waited, serial=serial, shared=shared)
+        if tool_call is not None:
+            try:
+                stats = _lock_wait_stats[tool_call.name]
+            except KeyError:
+                stats = _lock_wait_stats[tool_call.name] = _LockWaitStats(shared)
+            stats.add(waited)
+            observe_lock_wait(tool_call.name, waited)
+        try:
+            yield device
+        finally:
+            if not shared:
+                # Any exclusive use of the device may change what is on the screen, or rotate it
+                invalidate_hierarchy(serial)
+                invalidate_metadata(serial)
+
+
+@asynccontextmanager
+async def hold_device(serial: str) -> AsyncGenerator[u2.Device]:
+    """Hold a device exclusively across several tool calls.
+
+    The tools called by the holding task use the held device without locking it again,
+    while the tools of other tasks wait until it is released.
+    """
+    async with get_device(serial, shared=False) as device:
+        token = _held_device.set((serial, device))
+        try:
+            yield device
+        finally:
+            _held_device.reset(token)
 
-    async with lock:
-        yield device
+
+# Seconds that cached device metadata (info, window size) stays valid, 0 disables the cache
+_metadata_cache_ttl: float = 30.0
+
+# serial -> metadata key -> (expiry time, value)
+_metadata_cache: dict[str, dict[str, tuple[float, Any]]] = {}
+
+
+# (serial, display_id) -> the last screenshot frame sent
+_last_frames: dict[tuple[str, int], Frame] = {}
+
+
+def set_metadata_cache_ttl(seconds: float) -> None:
+    """Set how many seconds cached device metadata (info, window size) stays valid. 0 disables the cache."""
+    global _metadata_cache_ttl
+    if seconds < 0:
+        raise ValueError("metadata cache TTL cannot be negative")
+    _metadata_cache_ttl = seconds
+    _metadata_cache.clear()
+
+
+def invalidate_metadata(serial: str) -> None:
+    """Drop the cached metadata of a device, e.g. after an action that may rotate the screen or change its state."""
+    _metadata_cache.pop(serial, None)
+
+
+async def _get_metadata(serial: str, key: str, fetch: Callable[[u2.Device], Any], fresh: bool = False) -> Any:
+    cache = _metadata_cache.setdefault(serial, {})
+    if not fresh and (entry := cache.get(key)) is not None and entry[0] > time.monotonic():
+        return entry[1]
+    async with get_device(serial, shared=True) as device:
+        value = await run_sync(fetch, device, serial=serial)
+    if _metadata_cache.get(serial) is not cache:
+        # Invalidated while fetching, e.g. by a disconnect, so do not cache what may be stale already
+        return value
+    if (
+        key == "info"
+        and (old := cache.get("info")) is not None
+        and old[1].get("displayRotation") != value.get("displayRotation")
+    ):
+        # Orientation changed, so the cached window size is stale
+        cache.pop("window_size", None)
+    if _metadata_cache_ttl > 0:
+        cache[key] = time.monotonic() + _metadata_cache_ttl, value
+    return value
+
+
+async def get_info(serial: str, fresh: bool = False) -> dict[str, Any]:
+    """Get the info of a device, from the metadata cache unless ``fresh``."""
+    return dict(await _get_metadata(serial, "info", lambda d: d.info, fresh))
+
+
+# Seconds that a hierarchy snapshot stays valid for read-only element queries, 0 disables the cache
+_hierarchy_cache_ttl: float = 1.0
+
+# serial -> (expiry time, hierarchy xml, page source parsed from the xml)
+_hierarchy_cache: dict[str, tuple[float, str, PageSource]] = {}
+
+
+def set_hierarchy_cache_ttl(seconds: float) -> None:
+    """Set how many seconds a hierarchy snapshot stays valid for read-only element queries. 0 disables the cache."""
+    global _hierarchy_cache_ttl
+    if seconds < 0:
+        raise ValueError("hierarchy cache TTL cannot be negative")
+    _hierarchy_cache_ttl = seconds
+    _hierarchy_cache.clear()
+
+
+def invalidate_hierarchy(serial: str) -> None:
+    """Drop the hierarchy snapshot of a device."""
+    _hierarchy_cache.pop(serial, None)
+
+
+async def get_hierarchy(serial: str, device: u2.Device, fresh: bool = False) -> tuple[str, PageSource]:
+    """Get a snapshot of the window hierarchy, shared by read-only element queries while the screen is unchanged.
+
+    It must be called while holding the device by :func:`get_device`.
+    The snapshot is dropped once any tool holds the device exclusively, or after a short validity window.
+
+    Args:
+        serial: Android device serialno
+        device: The device held
+        fresh: Dump the hierarchy again instead of using the snapshot, and keep the new dump as the snapshot
+
+    Returns:
+        The hierarchy xml, and the page source parsed from it lazily, to run xpath queries on.
+    """
+    if not fresh and (entry := _hierarchy_cache.get(serial)) is not None and entry[0] > time.monotonic():
+        return entry[1], entry[2]
+    xml = await run_sync(device.dump_hierarchy, serial=serial)
+    source = PageSource.parse(xml)
+    if _hierarchy_cache_ttl > 0:
+        _hierarchy_cache[serial] = time.monotonic() + _hierarchy_cache_ttl, xml, source
+    return xml, source
+
+
+async def poll_device(serial: str, probe: Callable[[u2.Device], bool], timeout: float, interval: float) -> bool:
+    """Probe a device until the probe returns True or the timeout expires.
+
+    Each probe holds the device shared, only while it runs, and the device is released during the sleeps
+    between probes. So other tools interleave with a long wait,
+    and a cancelled wait returns at once instead of holding a worker thread and the device until its timeout.
+
+    Args:
+        serial: Android device serialno
+        probe: A short blocking check of the device, run in a worker thread
+        timeout: Seconds to keep probing. The device is probed at least once.
+        interval: Seconds to sleep between probes
+
+    Returns:
+        Whether the probe returned True before the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        async with get_device(serial, shared=True) as device:
+            if await run_sync(probe, device, serial=serial):
+                return True
+        if (remaining := deadline - time.monotonic()) <= 0:
+            return False
+        await sleep(min(interval, remaining))
+
+
+# Flattened compact trees of the last hierarchy dumps of each device, keyed by snapshot token, oldest first
+_hierarchy_snapshots: dict[str, OrderedDict[str, list[dict[str, Any]]]] = {}
+_HIERARCHY_SNAPSHOTS_PER_DEVICE = 8
 
 
 @mcp.tool("init", tags={"device:manage"})
@@ -70,7 +552,7 @@ async def init(serial: str = ""):
     from uiautomator2.__main__ import cmd_init
 
     args = argparse.Namespace(serial=serial, serial_optional=None)
-    return await to_thread.run_sync(cmd_init, args)
+    return await run_sync(cmd_init, args, serial=serial, pool="wait")
 
 
 @mcp.tool("purge", tags={"device:manage"})
@@ -90,7 +572,7 @@ async def purge(serial: str = ""):
     from uiautomator2.__main__ import cmd_purge
 
     args = argparse.Namespace(serial=serial)
-    return await to_thread.run_sync(cmd_purge, args)
+    return await run_sync(cmd_purge, args, serial=serial, pool="wait")
 
 
 @mcp.tool("shell_command", tags={"device:shell"})
@@ -106,7 +588,7 @@ async def shell_command(serial: str, command: str, timeout: float = 60) -> tuple
         tuple[int,str]: Return code and output of the command
     """
     async with get_device(serial) as device:
-        return_value = await to_thread.run_sync(device.adb_device.shell2, command, timeout)
+        return_value = await run_sync(device.adb_device.shell2, command, timeout, serial=serial, pool="wait")
         return return_value.returncode, return_value.output
 
 
@@ -117,49 +599,44 @@ async def device_list() -> list[dict[str, Any]]:
     Returns:
         list[dict[str,Any]]: List Adb Device information
     """
-    device_list = await to_thread.run_sync(adb.device_list)
+    if (watcher := get_device_watcher()) is not None and watcher.synced:
+        return [d.info() for d in watcher.ready()]
+    device_list = await run_sync(adb.device_list)
     return [d.info for d in device_list]
 
 
 @mcp.tool("connect", tags={"device:manage"})
-async def connect(serial: str = "") -> dict[str, Any]:
+async def connect(serial: str = "", fresh: bool = False) -> dict[str, Any]:
     """Connect to an Android device
 
     Args:
         serial (str): Android device serial number. If empty string, connects to the unique device if only one device is connected.
+        fresh (bool): re-read device information from the device instead of the cache
 
     Returns:
         dict[str,Any]: Device information
     """
-    global _devices
-    device: u2.Device | None = None
-
     logger = get_logger(f"{__name__}.connect")
 
     if serial := serial.strip():
         try:
-            async with get_device(serial) as device_1:
-                # Found, then check if it's still connected
-                try:
-                    return await to_thread.run_sync(lambda: device_1.device_info | device_1.info)
-                except u2.ConnectError as e:
-                    # Found, but not connected, delete it
-                    logger.warning("Device %s is no longer connected, delete it!", serial)
-                    del _devices[serial]
-                    raise e from None
-        except KeyError:
-            # Not found, need a new connection!
-            logger.info("Cannot find device with serial %s, connecting...")
-
-    # make new connection here!
-    async with _global_device_connection_lock:
-        device = await to_thread.run_sync(u2.connect, serial)
-        if device is None:
-            raise RuntimeError("Cannot connect to device")
-        logger.info("Connected to device %s", device.serial)
-        result = await to_thread.run_sync(lambda: device.device_info | device.info)
-        _devices[device.serial] = Lock(), device
-        return result
+            # Check it's still connected on every call, only the device information is cached
+            device_info = await _get_metadata(serial, "device_info", lambda d: d.device_info, fresh)
+            return device_info | await get_info(serial, fresh=True)
+        except u2.ConnectError as e:
+            # Found, but not connected, delete it
+            logger.warning("Device %s is no longer connected, delete it!", serial)
+            _forget_device(serial)
+            raise e from None
+
+    # No serial given, connect to the unique device, then register it by its real serial
+    device = await run_sync(u2.connect, serial, serial=serial, pool="wait")
+    if device is None:
+        raise RuntimeError("Cannot connect to device")
+    logger.info("Connected to device %s", device.serial)
+    result = await run_sync(lambda: device.device_info | device.info, serial=serial)
+    _devices.setdefault(device.serial, (ReadWriteLock(), device))
+    return result
 
 
 @mcp.tool("disconnect", tags={"device:manage"})
@@ -174,97 +651,290 @@ async def disconnect(serial: str):
     """
     if not (serial := serial.strip()):
         raise ValueError("serial cannot be empty")
-    async with _global_device_connection_lock:
-        del _devices[serial]
+    if not _forget_device(serial):
+        raise KeyError(serial)
 
 
 @mcp.tool("disconnect_all", tags={"device:manage"})
 async def disconnect_all():
     """Disconnect from all Android devices"""
-    async with _global_device_connection_lock:
-        _devices.clear()
+    _metadata_cache.clear()
+    _hierarchy_cache.clear()
+    _hierarchy_snapshots.clear()
+    _last_frames.clear()
+    _devices.clear()
 
 
 @mcp.tool("window_size", tags={"device:info"})
-async def window_size(serial: str) -> dict[str, int]:
+async def window_size(serial: str, fresh: bool = False) -> dict[str, int]:
     """Get window size of an Android device
 
+    The result is cached per device, and the cache is dropped once any tool uses the device exclusively
+    (a tap, key press, app start, shell command ...), since it may rotate the screen.
+
     Args:
         serial (str): Android device serialno
+        fresh (bool): re-read the window size from the device instead of the cache
 
     Returns:
         dict[str,int]: Window size object:
             - "width" (int): Window width
             - "height" (int): Window height
     """
-    async with get_device(serial) as device:
-        width, height = await to_thread.run_sync(device.window_size)
-        return {"width": width, "height": height}
+    width, height = await _get_metadata(serial, "window_size", lambda d: d.window_size(), fresh)
+    return {"width": width, "height": height}
 
 
 @mcp.tool("screenshot", tags={"device:capture", "screen:capture"})
-async def screenshot(serial: str, display_id: int = -1) -> dict[str, Any]:
+async def screenshot(
+    serial: str,
+    display_id: int = -1,
+    format: ImageFormat = "jpeg",
+    quality: int = 75,
+    max_width: int = 0,
+    scale: float = 1.0,
+    grayscale: bool = False,
+    if_changed_since: str = "",
+) -> dict[str, Any]:
     """
     Take screenshot of device
 
+    When polling the screen until it settles, pass the `token` of the previous screenshot as `if_changed_since`,
+    so that an unchanged screen returns a tiny reply without image data.
+    While a live stream of the device is open by start_stream, the screen is read from its latest frame.
+
     Args:
         serial (str): Android device serialno
         display_id (int): use specific display if device has multiple screen. Defaults to -1.
+        format (str): image format, one of ["jpeg", "png", "webp"]. Defaults to "jpeg".
+        quality (int): jpeg/webp quality in range [1, 100]. Defaults to 75.
+        max_width (int): downscale the image to at most this width, 0 means no limit. Defaults to 0.
+        scale (float): downscale factor in range (0, 1]. Defaults to 1.0.
+        grayscale (bool): convert the image to grayscale. Defaults to False.
+        if_changed_since (str): token of a previous screenshot, return no image if the screen has not changed since.
 
     Returns:
-        dict[str,Any]: Screenshot image JPEG data with the following keys:
+        dict[str,Any]: Screenshot image data with the following keys:
+            - changed (bool): False if the screen is the same as `if_changed_since`, and then only `token` follows
+            - token (str): token of this screenshot, to pass as `if_changed_since` next time
             - image (str): Base64 encoded image data in data URL format (data:image/jpeg;base64,...)
-            - size (tuple[int,int]): Image dimensions as (width, height)
+            - width (int): Image width
+            - height (int): Image height
+            - original_width (int): Screen width before downscaling
+            - original_height (int): Screen height before downscaling
+            - changed_bbox (list[int] | None): (left, top, right, bottom) of the changed region in screen coordinates,
+              if `if_changed_since` is the token of the last screenshot of this display
     """
     display_id = int(display_id)
-    async with get_device(serial) as device:
-        im = await to_thread.run_sync(lambda: device.screenshot(display_id=display_id if display_id >= 0 else None))
+    # The latest frame of a live stream opened by start_stream, decoded only now
+    frame = latest_frame(serial) if display_id < 0 else None
+    if frame is not None:
+        im = frame.open()
+    else:
+        async with get_device(serial) as device:
+            im = await run_sync(lambda: device.screenshot(display_id=display_id if display_id >= 0 else None), serial=serial)
+
+    from PIL.Image import Image
 
     if not isinstance(im, Image):
         raise RuntimeError("Invalid image")
 
-    with BytesIO() as fp:
-        im.save(fp, "jpeg")
-        im_data = fp.getvalue()
-
-    return {
-        "width": im.width,
-        "height": im.height,
-        "image": "data:image/jpeg;base64," + b64encode(im_data).decode(),
-    }
+    key = serial, display_id
+    result, _last_frames[key] = await encode_frame(
+        im,
+        format,
+        quality=quality,
+        max_width=max_width,
+        scale=scale,
+        grayscale=grayscale,
+        previous=_last_frames.get(key),
+        if_changed_since=if_changed_since.strip(),
+    )
+    return result
 
 
 @mcp.tool("dump_hierarchy", tags={"device:capture"})
-async def dump_hierarchy(serial: str, compressed: bool = False, pretty: bool = False, max_depth: int = -1) -> str:
+async def dump_hierarchy(
+    serial: str,
+    compressed: bool = False,
+    pretty: bool = False,
+    max_depth: int = -1,
+    format: HierarchyFormat = "xml",
+    attributes: list[str] | None = None,
+    within: list[int] | None = None,
+    max_nodes: int = 0,
+) -> str:
     """
     Dump window hierarchy
 
+    The "json" and "text" formats are much smaller than "xml":
+    they only keep nodes that can be interacted with (clickable, scrollable, checkable ...) or carry text,
+    leave out empty and default-valued attributes, and express bounds as [left, top, right, bottom].
+
     Args:
         serial (str): Android device serialno
         compressed (bool): return compressed xml
-        pretty (bool): pretty print xml
+        pretty (bool): pretty print xml, only for "xml" format
         max_depth (int): max depth of hierarchy
+        format (str): output format, one of ["xml", "json", "text"]. Defaults to "xml".
+            - xml: the hierarchy xml as dumped from the device
+            - json: compact tree as json {"nodes": [{..., "children": [...]}], "truncated": bool}
+            - text: compact tree as indented lines, one node per line
+        attributes (list[str] | None): attributes to keep of each node, only for "json" and "text" formats.
+            Defaults to class, text, resource-id, content-desc, bounds and the boolean states.
+        within (list[int] | None): only keep nodes intersecting this [left, top, right, bottom] rectangle,
+            only for "json" and "text" formats.
+        max_nodes (int): stop after this many nodes, 0 means no limit, only for "json" and "text" formats.
 
     Returns:
-        str: xml string of the hierarchy tree
+        str: the hierarchy tree in the requested format
     """
+    if format not in ("xml", "json", "text"):
+        raise ValueError(f"Unsupported hierarchy format: {format}")
     async with get_device(serial) as device:
-        return await to_thread.run_sync(
-            lambda: device.dump_hierarchy(compressed=compressed, pretty=pretty, max_depth=max_depth if max_depth > 0 else None)
+        if format != "xml":
+            if compressed:
+                xml = await run_sync(lambda: device.dump_hierarchy(compressed=True), serial=serial)
+            else:
+                xml, _ = await get_hierarchy(serial, device, fresh=True)
+        elif not compressed and not pretty and max_depth <= 0:
+            xml, _ = await get_hierarchy(serial, device, fresh=True)
+            return xml
+        else:
+            return await run_sync(
+                lambda: device.dump_hierarchy(
+                    compressed=compressed, pretty=pretty, max_depth=max_depth if max_depth > 0 else None
+                ),
+                serial=serial,
+            )
+
+    def _compact() -> str:
+        roots, truncated = compact_hierarchy(
+            xml, attributes=attributes, max_depth=max(max_depth, 0), within=within, max_nodes=max_nodes
         )
+        return render_json(roots, truncated) if format == "json" else render_text(roots, truncated)
+
+    return await run_sync(_compact)
+
+
+@mcp.tool("dump_hierarchy_diff", tags={"device:capture"})
+async def dump_hierarchy_diff(serial: str, since: str = "") -> dict[str, Any]:
+    """
+    Dump window hierarchy, and return only the nodes changed since a previous dump
+
+    Nodes are those of the compact "json" format of `dump_hierarchy`, without children.
+    They are matched between dumps by resource-id, class and bounds;
+    a node with a resource-id that moved or was resized is reported as changed.
+
+    Args:
+        serial (str): Android device serialno
+        since (str): snapshot token of a previous dump to diff against. Defaults to the last dump of this tool.
+            The last few snapshots of each device are kept.
+
+    Returns:
+        dict[str,Any]: The diff, with the following keys:
+            - token (str): Snapshot token of this dump, for the next `since`
+            - since (str | None): Token of the dump diffed against, None if there is no such dump
+            - nodes (list[dict]): All nodes, only when `since` is None
+            - added (list[dict]): New nodes, only when `since` is not None
+            - removed (list[dict]): Nodes gone, only when `since` is not None
+            - changed (list[dict]): Nodes with changed attributes as {"node": {...}, "changes": {attribute: [old, new]}},
+              only when `since` is not None
+    """
+    async with get_device(serial) as device:
+        xml, _ = await get_hierarchy(serial, device, fresh=True)
+    token = hashlib.blake2b(xml.encode(), digest_size=16).hexdigest()
+
+    snapshots = _hierarchy_snapshots.setdefault(serial, OrderedDict())
+    if not since and snapshots:
+        since = next(reversed(snapshots))
+    base = snapshots.get(since) if since else None
+    if (nodes := snapshots.get(token)) is None:
+        nodes = await run_sync(lambda: flatten_nodes(compact_hierarchy(xml)[0]))
+    snapshots[token] = nodes
+    snapshots.move_to_end(token)
+    while len(snapshots) > _HIERARCHY_SNAPSHOTS_PER_DEVICE:
+        snapshots.popitem(last=False)
+
+    if base is None:
+        return {"token": token, "since": None, "nodes": nodes}
+    if since == token:
+        return {"token": token, "since": since, "added": [], "removed": [], "changed": []}
+    return {"token": token, "since": since, **await run_sync(diff_nodes, base, nodes)}
 
 
 @mcp.tool("info", tags={"device:info"})
-async def info(serial: str) -> dict[str, Any]:
+async def info(serial: str, fresh: bool = False) -> dict[str, Any]:
     """
     Get device info
 
+    The result is cached per device, and the cache is dropped once any tool uses the device exclusively
+    (a tap, key press, app start, shell command ...), since it may rotate the screen.
+
     Args:
         serial (str): Android device serialno
+        fresh (bool): re-read device info from the device instead of the cache
 
     Returns:
         dict[str,Any]: Device info
     """
+    return await get_info(serial, fresh)
 
-    async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.info)
+
+@mcp.tool("lock_wait_stats", tags={"server:stats"})
+async def lock_wait_stats(reset: bool = False) -> dict[str, dict[str, Any]]:
+    """
+    Get how long tool calls have waited for device locks
+
+    Read-only tools share a device lock with each other, while other tools hold it exclusively.
+
+    Args:
+        reset (bool): clear the statistics after reading them
+
+    Returns:
+        dict[str,dict[str,Any]]: Statistics keyed by tool name, each with the following keys:
+            - calls (int): Number of lock acquisitions
+            - total (float): Total seconds spent waiting
+            - mean (float): Mean seconds spent waiting
+            - max (float): Longest wait in seconds
+            - shared (bool): Whether the tool shares the lock with other readers
+    """
+    result = {
+        name: {
+            "calls": stats.calls,
+            "total": stats.total,
+            "mean": stats.total / stats.calls if stats.calls else 0.0,
+            "max": stats.max,
+            "shared": stats.shared,
+        }
+        for name, stats in sorted(_lock_wait_stats.items())
+    }
+    if reset:
+        _lock_wait_stats.clear()
+    return result
+
+
+@mcp.tool("worker_stats", tags={"server:stats"})
+async def worker_stats(reset: bool = False) -> dict[str, dict[str, Any]]:
+    """
+    Get the load of the worker threads running blocking device calls
+
+    Calls that block until something happens on the screen (waits, app install, shell commands ...) run in the "wait" pool,
+    other calls in the "quick" pool. Each device also has its own budget of threads across both pools.
+
+    Args:
+        reset (bool): clear the counters after reading them
+
+    Returns:
+        dict[str,dict[str,Any]]: A dict with "pools" keyed by pool name and "devices" keyed by serialno,
+            each with the following keys:
+            - limit (int): Maximum number of busy threads
+            - busy (int): Threads running now
+            - waiting (int): Calls queued now
+            - peak_waiting (int): Most calls queued at the same time
+            - calls (int): Number of calls run
+            - wait_total (float): Total seconds calls spent queued
+            - wait_mean (float): Mean seconds calls spent queued
+            - wait_max (float): Longest seconds a call spent queued
+    """
+    return workers.worker_stats(reset)
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
-from base64 import b64encode
-from io import BytesIO
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from anyio import to_thread
-from PIL.Image import Image
+from anyio import sleep
 
+from ..imaging import ImageFormat, encode_image
 from ..mcp import mcp
-from .device import get_device
+from ..workers import run_sync
+from .device import get_device, get_hierarchy, poll_device
+
+if TYPE_CHECKING:
+    import uiautomator2 as u2
+    from uiautomator2.xpath import PageSource, XMLElement
 
 __all__ = (
     "activity_wait",
@@ -22,11 +25,60 @@ __all__ = (
     "element_get_text",
     "element_set_text",
     "element_bounds",
+    "element_query_many",
     "element_swipe",
     "element_scroll",
     "element_scroll_to",
 )
 
+# Seconds between two probes of element and activity waits, as in uiautomator2
+_ELEMENT_POLL_INTERVAL = 0.2
+_ACTIVITY_POLL_INTERVAL = 0.5
+
+
+async def _wait_timeout(serial: str, timeout: float | None) -> float:
+    """The timeout of an element wait, the `wait_timeout` setting of the device when none is given."""
+    if timeout:
+        return timeout
+    async with get_device(serial, shared=True) as device:
+        return float(device.wait_timeout)
+
+
+def _element_exists(device: u2.Device, xpath: str) -> bool:
+    return device.xpath(xpath).exists
+
+
+def _click_exists(device: u2.Device, xpath: str) -> bool:
+    """Click the first element matching the xpath, if there is one, without waiting for it."""
+    if elements := device.xpath(xpath).all():
+        elements[0].click()
+    return bool(elements)
+
+
+async def _find_element(serial: str, xpath: str) -> XMLElement:
+    """Find the first element matching the xpath in the hierarchy snapshot, else wait for it on the live screen.
+
+    Raises:
+        XPathElementNotFoundError: if the element does not show up within the `wait_timeout` of the device
+    """
+    async with get_device(serial) as device:
+        _, source = await get_hierarchy(serial, device)
+        if elements := await run_sync(lambda: device.xpath(xpath, source).all(), serial=serial):
+            return elements[0]
+
+    # Not in the snapshot, wait for it without holding the device between probes
+    found: list[XMLElement] = []
+
+    def probe(device: u2.Device) -> bool:
+        found[:] = device.xpath(xpath).all()[:1]
+        return bool(found)
+
+    if not await poll_device(serial, probe, await _wait_timeout(serial, None), _ELEMENT_POLL_INTERVAL):
+        from uiautomator2.exceptions import XPathElementNotFoundError
+
+        raise XPathElementNotFoundError(xpath)
+    return found[0]
+
 
 @mcp.tool("activity_wait", tags={"element:wait"})
 async def activity_wait(serial: str, activity: str, timeout: float = 20.0) -> bool:
@@ -40,9 +92,9 @@ async def activity_wait(serial: str, activity: str, timeout: float = 20.0) -> bo
     Returns:
         bool of activity
     """
-    async with get_device(serial) as device:
-        # timeout: float here is actually no problem
-        return await to_thread.run_sync(device.wait_activity, activity, timeout)  # type: ignore[arg-type]
+    return await poll_device(
+        serial, lambda device: device.app_current().get("activity") == activity, timeout, _ACTIVITY_POLL_INTERVAL
+    )
 
 
 @mcp.tool("element_wait", tags={"element:wait"})
@@ -58,8 +110,9 @@ async def element_wait(serial: str, xpath: str, timeout: float | None = None) ->
     Returns:
         bool: if element found
     """
-    async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).wait(timeout))
+    return await poll_device(
+        serial, lambda device: _element_exists(device, xpath), await _wait_timeout(serial, timeout), _ELEMENT_POLL_INTERVAL
+    )
 
 
 @mcp.tool("element_wait_gone", tags={"element:wait"})
@@ -75,8 +128,12 @@ async def element_wait_gone(serial: str, xpath: str, timeout: float | None = Non
     Returns:
         bool: True if gone else False
     """
-    async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).wait_gone(timeout))
+    return await poll_device(
+        serial,
+        lambda device: not _element_exists(device, xpath),
+        await _wait_timeout(serial, timeout),
+        _ELEMENT_POLL_INTERVAL,
+    )
 
 
 @mcp.tool("element_click", tags={"element:interact"})
@@ -93,7 +150,7 @@ async def element_click(serial: str, xpath: str, timeout: float | None = None) -
         bool: True if click success else False
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).click_exists(timeout))
+        return await run_sync(lambda: device.xpath(xpath).click_exists(timeout), serial=serial, pool="wait")
 
 
 @mcp.tool("element_click_nowait", tags={"element:interact"})
@@ -106,7 +163,7 @@ async def element_click_nowait(serial: str, xpath: str):
         xpath (str): element xpath
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).click_nowait())
+        return await run_sync(lambda: device.xpath(xpath).click_nowait(), serial=serial)
 
 
 @mcp.tool("element_click_until_gone", tags={"element:interact"})
@@ -123,8 +180,17 @@ async def element_click_until_gone(serial: str, xpath: str, maxretry=10, interva
     Return:
         bool: if element is gone
     """
+    # The device is released while sleeping between clicks
     async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).click_gone(maxretry, interval))
+        await run_sync(_click_exists, device, xpath, serial=serial)
+    for _ in range(maxretry):
+        await sleep(interval)
+        async with get_device(serial, shared=True) as device:
+            if not await run_sync(_element_exists, device, xpath, serial=serial):
+                return True
+        async with get_device(serial) as device:
+            await run_sync(_click_exists, device, xpath, serial=serial)
+    return False
 
 
 @mcp.tool("element_long_click", tags={"element:interact"})
@@ -137,37 +203,48 @@ async def element_long_click(serial: str, xpath: str):
         xpath (str): element xpath
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).long_click())
+        return await run_sync(lambda: device.xpath(xpath).long_click(), serial=serial)
 
 
 @mcp.tool("element_screenshot", tags={"element:capture"})
-async def element_screenshot(serial: str, xpath: str) -> dict[str, Any]:
+async def element_screenshot(
+    serial: str,
+    xpath: str,
+    format: ImageFormat = "jpeg",
+    quality: int = 75,
+    max_width: int = 0,
+    scale: float = 1.0,
+    grayscale: bool = False,
+) -> dict[str, Any]:
     """
     find element and take screenshot
 
     Args:
         serial (str): Android device serialno
         xpath (str): element xpath
+        format (str): image format, one of ["jpeg", "png", "webp"]. Defaults to "jpeg".
+        quality (int): jpeg/webp quality in range [1, 100]. Defaults to 75.
+        max_width (int): downscale the image to at most this width, 0 means no limit. Defaults to 0.
+        scale (float): downscale factor in range (0, 1]. Defaults to 1.0.
+        grayscale (bool): convert the image to grayscale. Defaults to False.
 
     Returns:
-        dict[str,Any]: Screenshot image JPEG data with the following keys:
+        dict[str,Any]: Screenshot image data with the following keys:
             - image (str): Base64 encoded image data in data URL format (data:image/jpeg;base64,...)
-            - size (tuple[int,int]): Image dimensions as (width, height)
+            - width (int): Image width
+            - height (int): Image height
+            - original_width (int): Element width before downscaling
+            - original_height (int): Element height before downscaling
     """
     async with get_device(serial) as device:
-        im = await to_thread.run_sync(lambda: device.xpath(xpath).screenshot())
-        if not isinstance(im, Image):
-            raise RuntimeError("Invalid image")
+        im = await run_sync(lambda: device.xpath(xpath).screenshot(), serial=serial)
+
+    from PIL.Image import Image
 
-        with BytesIO() as fp:
-            im.save(fp, "jpeg")
-            im_data = fp.getvalue()
+    if not isinstance(im, Image):
+        raise RuntimeError("Invalid image")
 
-        return {
-            "width": im.width,
-            "height": im.height,
-            "image": "data:image/jpeg;base64," + b64encode(im_data).decode(),
-        }
+    return await encode_image(im, format, quality=quality, max_width=max_width, scale=scale, grayscale=grayscale)
 
 
 @mcp.tool("element_get_text", tags={"element:query"})
@@ -183,8 +260,7 @@ async def element_get_text(serial: str, xpath: str) -> str | None:
         str: string of node text
         None: if element has no text attribute
     """
-    async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).get_text())
+    return (await _find_element(serial, xpath)).text
 
 
 @mcp.tool("element_set_text", tags={"element:modify"})
@@ -198,7 +274,7 @@ async def element_set_text(serial: str, xpath: str, text: str) -> None:
         text (str): string of node text
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).set_text(text))
+        return await run_sync(lambda: device.xpath(xpath).set_text(text), serial=serial)
 
 
 @mcp.tool("element_bounds", tags={"element:query"})
@@ -213,8 +289,91 @@ async def element_bounds(serial: str, xpath: str) -> tuple[int, int, int, int]:
     Returns:
         tuple[int]: tuple of (left, top, right, bottom)
     """
+    return (await _find_element(serial, xpath)).bounds
+
+
+_BOOLEAN_ATTRIBUTES = frozenset(
+    {
+        "checkable",
+        "checked",
+        "clickable",
+        "enabled",
+        "focusable",
+        "focused",
+        "long-clickable",
+        "password",
+        "scrollable",
+        "selected",
+        "visible-to-user",
+    }
+)
+
+
+def _element_attributes(element: XMLElement, attributes: list[str]) -> dict[str, Any]:
+    result: dict[str, Any] = {}
+    for name in attributes:
+        if name == "bounds":
+            result[name] = list(element.bounds)
+        elif name == "class":
+            # PageSource moves the class of a node into its tag
+            result[name] = element.elem.tag
+        elif name in _BOOLEAN_ATTRIBUTES:
+            result[name] = element.elem.get(name) == "true"
+        else:
+            result[name] = element.elem.get(name)
+    return result
+
+
+def _query_many(device: u2.Device, source: PageSource, xpaths: list[str], attributes: list[str]) -> list[dict[str, Any]]:
+    from lxml import etree
+    from uiautomator2.xpath import XPathError
+
+    results: list[dict[str, Any]] = []
+    for xpath in xpaths:
+        try:
+            # The same lookup as the other element tools, with the xpath shortcuts of uiautomator2
+            elements = device.xpath(xpath, source).all()
+        except (XPathError, etree.XPathError) as e:
+            results.append({"xpath": xpath, "found": False, "error": str(e)})
+            continue
+        if elements:
+            results.append(
+                {"xpath": xpath, "found": True, "count": len(elements), **_element_attributes(elements[0], attributes)}
+            )
+        else:
+            results.append({"xpath": xpath, "found": False})
+    return results
+
+
+@mcp.tool("element_query_many", tags={"element:query"})
+async def element_query_many(serial: str, xpaths: list[str], attributes: list[str] | None = None) -> list[dict[str, Any]]:
+    """
+    find many elements and get their attributes, all from one hierarchy dump
+
+    Use it instead of many element_get_text/element_bounds calls to read a whole screen at once.
+    Elements are not waited for: an element not on the screen is reported as not found.
+
+    Args:
+        serial (str): Android device serialno
+        xpaths (list[str]): element xpaths
+        attributes (list[str] | None): attributes to get of the first element matching each xpath,
+            e.g. text, bounds, resource-id, content-desc, class, checked, enabled, selected.
+            Defaults to ["text", "resource-id", "content-desc", "bounds"].
+
+    Returns:
+        list[dict[str,Any]]: one result per xpath in input order, with the following keys:
+            - xpath (str): the xpath
+            - found (bool): if any element matches
+            - count (int): number of matching elements, if found
+            - error (str): why the xpath is invalid, if it is
+            - the requested attributes, if found. bounds is [left, top, right, bottom],
+              boolean attributes are bool, others are str or None if the element does not have it.
+    """
+    if attributes is None:
+        attributes = ["text", "resource-id", "content-desc", "bounds"]
     async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).bounds())
+        _, source = await get_hierarchy(serial, device)
+        return await run_sync(_query_many, device, source, xpaths, attributes, serial=serial)
 
 
 @mcp.tool("element_swipe", tags={"element:gesture"})
@@ -229,7 +388,7 @@ async def element_swipe(serial: str, xpath: str, direction: str, scale: float =
         scale: percent of swipe, range (0, 1.0)
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).swipe(direction, scale))
+        return await run_sync(lambda: device.xpath(xpath).swipe(direction, scale), serial=serial)
 
 
 @mcp.tool("element_scroll", tags={"element:gesture"})
@@ -246,7 +405,7 @@ async def element_scroll(serial: str, xpath: str, direction: str = "forward") ->
         bool: if can be scroll again
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).swipe(direction))
+        return await run_sync(lambda: device.xpath(xpath).swipe(direction), serial=serial)
 
 
 @mcp.tool("element_scroll_to", tags={"element:gesture"})
@@ -264,4 +423,4 @@ async def element_scroll_to(serial: str, xpath: str, direction: str = "forward",
         bool: if can be scroll again
     """
     async with get_device(serial) as device:
-        return await to_thread.run_sync(lambda: device.xpath(xpath).scroll_to(direction, max_swipes))
+        return await run_sync(lambda: device.xpath(xpath).scroll_to(direction, max_swipes), serial=serial, pool="wait")
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import inspect
+import time
+from typing import TYPE_CHECKING, Any
+
+from anyio import CapacityLimiter, create_task_group
+from fastmcp import Context
+from fastmcp.server.dependencies import get_context
+from fastmcp.tools import FunctionTool
+
+from ..devicewatch import get_device_watcher
+from ..lazy import lazy_import
+from ..mcp import mcp
+from ..workers import run_sync
+from . import app, device
+from .device import call_tool
+
+if TYPE_CHECKING:
+    from adbutils import adb
+else:
+    adb = lazy_import("adbutils", "adb")
+
+__all__ = ("device_fanout",)
+
+
+def _fanout_tools() -> dict[str, FunctionTool]:
+    """Tools of the app and device modules that operate on one device given by `serial`"""
+    result: dict[str, FunctionTool] = {}
+    for module in (app, device):
+        for name in module.__all__:
+            tool = getattr(module, name)
+            if isinstance(tool, FunctionTool) and "serial" in inspect.signature(tool.fn).parameters:
+                result[tool.name] = tool
+    return result
+
+
+_FANOUT_TOOLS = _fanout_tools()
+
+
+def _is_enabled(tool: FunctionTool) -> bool:
+    """Whether the server lists the tool to clients, by its enabled flag and the include and exclude tags."""
+    if not tool.enabled:
+        return False
+    if mcp.exclude_tags is not None and any(tag in mcp.exclude_tags for tag in tool.tags):
+        return False
+    return mcp.include_tags is None or any(tag in mcp.include_tags for tag in tool.tags)
+
+
+async def _call(tool: FunctionTool, serial: str, arguments: dict[str, Any], limiter: CapacityLimiter) -> dict[str, Any]:
+    async with limiter:
+        # The progress of each device would mix on the one progress token of the call
+        app.progress_reporting.set(False)
+        started = time.perf_counter()
+        try:
+            result = {"serial": serial, "ok": True, "result": await call_tool(tool, {**arguments, "serial": serial})}
+        except Exception as e:  # noqa: BLE001
+            result = {"serial": serial, "ok": False, "error": f"{type(e).__name__}: {e}"}
+        result["elapsed"] = time.perf_counter() - started
+        return result
+
+
+async def _default_serials() -> list[str]:
+    """The ready devices of the device watcher when it is synced, else those of the adb server."""
+    watcher = get_device_watcher()
+    if watcher is not None and watcher.synced:
+        return [d.serial for d in watcher.ready()]
+    return [d.serial for d in await run_sync(adb.device_list) if d.serial]
+
+
+@mcp.tool("device_fanout", tags={"device:fanout"})
+async def device_fanout(
+    tool: str,
+    arguments: dict[str, Any] | None = None,
+    serials: list[str] | None = None,
+    concurrency: int = 8,
+) -> dict[str, Any]:
+    """Run an app or device tool on many devices at once
+
+    Useful to install a build, start or stop an app, or run a shell command across a device farm in one call.
+    A failure on one device does not stop the others.
+    Each device done counts as one step of the progress reported to the client.
+
+    Args:
+        tool (str): name of the tool to run, one of the app tools (app_install, app_start, app_stop, app_clear,
+            app_info ...) or the device tools taking a serial (shell_command, init, info, window_size, screenshot ...)
+        arguments (dict[str,Any] | None): arguments of the tool, without "serial"
+        serials (list[str] | None): Android device serialnos. Defaults to all connected devices.
+        concurrency (int): maximum number of devices operated at the same time. Defaults to 8.
+
+    Returns:
+        dict[str,Any]: A dict with the following keys:
+            - ok (bool): Whether the tool succeeded on every device
+            - elapsed (float): Seconds taken on all devices
+            - results (list[dict]): One entry per device, in the order of `serials`, with "serial", "ok",
+              "elapsed" (seconds), and "result" (the return value of the tool) or "error"
+    """
+    if (target := _FANOUT_TOOLS.get(tool)) is None or not _is_enabled(target):
+        raise ValueError(f"Unsupported tool: {tool}")
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    arguments = arguments or {}
+    try:
+        inspect.signature(target.fn).bind(serial="", **arguments)
+    except TypeError as e:
+        raise ValueError(f"Invalid arguments for tool {tool}: {e}") from None
+    if serials is None:
+        serials = await _default_serials()
+    try:
+        ctx: Context | None = get_context()
+    except RuntimeError:
+        ctx = None
+
+    started = time.perf_counter()
+    limiter = CapacityLimiter(concurrency)
+    results: list[dict[str, Any]] = [{}] * len(serials)
+    done = 0
+
+    async def run(index: int, serial: str) -> None:
+        nonlocal done
+        results[index] = await _call(target, serial, arguments, limiter)
+        done += 1
+        if ctx is not None:
+            await ctx.report_progress(done, len(serials), f"{serial} done")
+
+    async with create_task_group() as tg:
+        for index, serial in enumerate(serials):
+            tg.start_soon(run, index, serial)
+
+    return {
+        "ok": all(result["ok"] for result in results),
+        "elapsed": time.perf_counter() - started,
+        "results": results,
+    }
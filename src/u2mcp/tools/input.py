@@ -1,8 +1,7 @@
 from __future__ import annotations
 
-from anyio import to_thread
-
 from ..mcp import mcp
+from ..workers import run_sync
 from .device import get_device
 
 __all__ = (
@@ -22,7 +21,7 @@ async def send_text(serial: str, text: str, clear: bool = False):
             clear: clear text before input
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.send_keys, text, clear)
+        await run_sync(device.send_keys, text, clear, serial=serial)
 
 
 @mcp.tool("clear_text", tags={"input:text"})
@@ -33,7 +32,7 @@ async def clear_text(serial: str):
         serial (str): Android device serialno
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.clear_text)
+        await run_sync(device.clear_text, serial=serial)
 
 
 @mcp.tool("hide_keyboard", tags={"input:keyboard"})
@@ -44,4 +43,4 @@ async def hide_keyboard(serial: str):
         serial (str): Android device serialno
     """
     async with get_device(serial) as device:
-        await to_thread.run_sync(device.hide_keyboard)
+        await run_sync(device.hide_keyboard, serial=serial)
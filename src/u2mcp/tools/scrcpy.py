@@ -1,24 +1,68 @@
 from __future__ import annotations
 
 import os
+import time
+from functools import partial
+from typing import TYPE_CHECKING, Any
 
-from anyio import create_task_group, move_on_after, open_process
-from anyio.abc import AnyByteReceiveStream, Process
-from anyio.streams.text import TextReceiveStream
+from anyio import create_task_group, move_on_after
 from fastmcp.server.dependencies import get_context
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
 from fastmcp.utilities.logging import get_logger
 
-from ..background import get_background_task_group
+from ..lazy import lazy_import
+from ..logbuffer import LogLine, forward_logs
 from ..mcp import mcp
+from ..recording import Recording
+from ..supervisor import Supervised, get_supervisor
+from ..workers import run_sync
+
+if TYPE_CHECKING:
+    import adbutils
+    from adbutils import adb
+else:
+    adbutils = lazy_import("adbutils")
+    adb = lazy_import("adbutils", "adb")
+
+__all__ = ("list_scrcpy", "scrcpy_logs", "start_scrcpy", "stop_scrcpy")
+
+# Minimum seconds between two log messages sent to the client during startup
+_LOG_FORWARD_INTERVAL = 1.0
+
+
+class RecordingIndexMiddleware(Middleware):
+    """Add the tool calls on a device being recorded to the index of its recording."""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        recordings = [s.recording for s in get_supervisor().list() if s.recording is not None]
+        if not recordings:
+            return await call_next(context)
+        serial = str((context.message.arguments or {}).get("serial") or "").strip()
+        indexes = [r.index for r in recordings if r.serial == serial and r.index is not None]
+        if not indexes:
+            return await call_next(context)
+        started, ok = time.time(), False
+        try:
+            result = await call_next(context)
+            ok = True
+            return result
+        finally:
+            duration = time.time() - started
+            for index in indexes:
+                index.tool_call(context.message.name, started, duration, ok)
 
-__all__ = ("start_scrcpy", "stop_scrcpy")
 
-# Keep track of background scrcpy processes
-_background_processes: dict[int, Process] = {}
+mcp.add_middleware(RecordingIndexMiddleware())
 
 
 @mcp.tool("start_scrcpy", tags={"screen:mirror"})
-async def start_scrcpy(serial: str = "", timeout: float = 5.0) -> int:
+async def start_scrcpy(
+    serial: str = "",
+    timeout: float = 5.0,
+    record_dir: str = "",
+    segment_seconds: float = 600.0,
+    max_segments: int = 0,
+) -> int:
     """Startup scrcpy in background and returns process id.
 
     scrcpy is an application mirrors Android devices (video and audio) connected via USB or TCP/IP and allows control using the computer's keyboard and mouse.
@@ -26,10 +70,18 @@ async def start_scrcpy(serial: str = "", timeout: float = 5.0) -> int:
     The scrcpy process will run in the background after successful startup.
     Use stop_scrcpy to terminate the process.
 
+    With `record_dir`, scrcpy records the screen headless (no window) instead, into a new segment file every
+    `segment_seconds`, and the `index.jsonl` file next to them maps every tool call on the device to the segment and
+    offset where it started.
+
     Args:
         serial (str): Android device serialno. If empty string, connects to the unique device if only one device is connected.
         timeout (float): Seconds to wait for process to confirm startup.
             If process is still running after this time, startup is considered successful.
+        record_dir (str): Directory to record the screen into, headless. Empty string opens a mirror window instead.
+            Without a serial, the unique connected device is recorded.
+        segment_seconds (float): Seconds of video in each segment file when recording.
+        max_segments (int): Number of segment files kept when recording, older ones are removed. 0 keeps them all.
 
     Returns:
         int: process id (pid)
@@ -43,66 +95,53 @@ async def start_scrcpy(serial: str = "", timeout: float = 5.0) -> int:
     if serial := serial.strip():
         command.extend(["--serial", serial])
 
-    logger.info("start scrcpy: %s", command)
+    recording = None
+    if record_dir := record_dir.strip():
+        if not serial:
+            # Tool calls name their device, so the recording must know which one it records to index them
+            try:
+                serial = (await run_sync(adb.device)).serial or ""
+            except adbutils.AdbError as e:
+                raise ValueError(f"serial is required to record unless exactly one device is connected: {e}") from None
+            command.extend(["--serial", serial])
+        recording = Recording(command, record_dir, serial=serial, segment_seconds=segment_seconds, max_segments=max_segments)
 
-    process = await open_process(command)
-    pid = process.pid
-
-    # Stream monitoring function
-    async def receive(name: str, stream: AnyByteReceiveStream):
-        logger.info("Starting to monitor %s for pid=%s", name, pid)
-        async for line in TextReceiveStream(stream):
-            logger.debug("Received %s line: %s", name, line.strip())
-            match name:
-                case "stdout":
-                    await ctx.info(line)
-                case "stderr":
-                    await ctx.error(line)
-                case _:
-                    raise ValueError(f"Unknown stream name: {name}")
-        logger.info("Finished monitoring %s for pid=%s", name, pid)
-
-    # Monitor streams and auto-cleanup on process exit
-    async def monitor_streams():
-        if process.stdout is None:
-            raise RuntimeError("stdout is None")
-        if process.stderr is None:
-            raise RuntimeError("stderr is None")
-        try:
-            async with create_task_group() as inner_tg:
-                for name, handle in zip(("stdout", "stderr"), (process.stdout, process.stderr)):
-                    inner_tg.start_soon(receive, name, handle)
-        finally:
-            # Cleanup only if we still own the process (i.e., not manually stopped)
-            if _background_processes.pop(pid, None) is process:
-                logger.info("scrcpy process exited naturally, cleaning up (pid=%s)", pid)
-                await process.aclose()
-            else:
-                logger.info("scrcpy process was manually stopped, skipping cleanup (pid=%s)", pid)
-
-    # Start monitoring immediately (before startup wait) to capture startup logs
-    tg = get_background_task_group()
-    if tg is None:
-        raise RuntimeError("Monitor task group not initialized - server not started?")
-    tg.start_soon(monitor_streams)
-
-    # Store process
-    _background_processes[pid] = process
+    logger.info("start scrcpy: %s", command)
+    supervised = Supervised(serial, command, recording=recording)
+    pid = await get_supervisor().start(supervised)
+
+    # Forward the startup output to the client, coalesced and rate limited, only while this request lasts
+    async def send(lines: list[LogLine], skipped: int) -> None:
+        text = "\n".join(line.text for line in lines)
+        if skipped:
+            text = f"... {skipped} more lines, see scrcpy_logs(pid={pid})\n{text}"
+        if any(line.stream == "stderr" for line in lines):
+            await ctx.error(text)
+        else:
+            await ctx.info(text)
 
     # Startup phase: wait for process exit with timeout
-    with move_on_after(timeout) as timeout_scope:
-        await process.wait()
+    async with create_task_group() as startup_tg:
+        startup_tg.start_soon(partial(forward_logs, supervised.logs, send, interval=_LOG_FORWARD_INTERVAL))
+        with move_on_after(timeout) as timeout_scope:
+            await supervised.first_exit.wait()
+        startup_tg.cancel_scope.cancel()
 
     if timeout_scope.cancel_called:
-        # Timeout reached, process is still running - success!
+        # Timeout reached, process is still running - success! From now on, it is restarted if it crashes
+        supervised.confirmed = True
         logger.info("scrcpy started successfully in background (pid=%s)", pid)
     else:
         # Process exited before timeout - failure
-        _background_processes.pop(pid, None)
-        if process.returncode == 0:
+        await supervised.stop()
+        if recording is not None:
+            raise RuntimeError(f"scrcpy recording failed during startup (pid={pid}): {recording.error}")
+        if supervised.returncode == 0:
             raise RuntimeError(f"scrcpy closed during startup (pid={pid}, return code 0)")
         else:
-            raise RuntimeError(f"scrcpy exited during startup wait with code: {process.returncode} (pid={pid})")
+            raise RuntimeError(
+                f"scrcpy exited during startup wait with code: {supervised.returncode} (pid={pid}), see scrcpy_logs"
+            )
 
     return pid
 
@@ -122,21 +161,63 @@ async def stop_scrcpy(pid: int, timeout: float = 5.0) -> None:
     """
     logger = get_logger(f"{__name__}.stop_scrcpy")
 
-    if pid not in _background_processes:
+    supervised = get_supervisor().get(pid)
+    if supervised is None or not supervised.active:
         raise ValueError(f"No scrcpy process found with pid: {pid}")
 
-    process = _background_processes.pop(pid)
-    try:
-        process.kill()
-        # Wait for process to exit with timeout
-        with move_on_after(timeout) as timeout_scope:
-            await process.wait()
-    finally:
-        # Always close the process when manually stopping
-        # The monitor task will detect we popped the process and skip cleanup
-        await process.aclose()
-
-    if timeout_scope.cancel_called:
-        logger.warning("scrcpy process did not exit within %ss (pid=%s)", timeout, pid)
+    if await supervised.stop(timeout):
+        logger.info("scrcpy process stopped (pid=%s)", supervised.id)
     else:
-        logger.info("scrcpy process stopped (pid=%s)", pid)
+        logger.warning("scrcpy process did not exit within %ss (pid=%s)", timeout, supervised.id)
+
+
+@mcp.tool("list_scrcpy", tags={"screen:mirror"})
+async def list_scrcpy() -> list[dict[str, Any]]:
+    """List the scrcpy processes started by start_scrcpy, running or recently ended.
+
+    A scrcpy process that crashes is restarted after a delay, keeping the pid start_scrcpy returned.
+
+    Returns:
+        list[dict[str,Any]]: The processes, each with the following keys:
+            - pid (int): Process id returned by start_scrcpy
+            - current_pid (int | None): Process id of the running scrcpy, None while waiting to restart it
+            - serial (str): Android device serialno
+            - mode (str): "mirror" or "record"
+            - record_dir (str | None): Directory recorded into
+            - state (str): "running", "backoff" (waiting to restart), "stopped", "exited" or "failed"
+            - uptime (float | None): Seconds the current process has been running
+            - age (float): Seconds since start_scrcpy
+            - restarts (int): Number of restarts after a crash
+            - returncode (int | None): Return code of the last process that exited
+    """
+    return [supervised.to_dict() for supervised in get_supervisor().list()]
+
+
+@mcp.tool("scrcpy_logs", tags={"screen:mirror"})
+async def scrcpy_logs(pid: int, since: int = 0, limit: int = 200) -> dict[str, Any]:
+    """Get the output of a scrcpy process started by start_scrcpy.
+
+    The last lines of output of each process are kept, also for a while after it exits.
+    Pass the `next` of the previous call as `since` to get only the new lines.
+
+    Args:
+        pid (int): Process id returned by start_scrcpy
+        since (int): Number of the last line already read, 0 to read from the oldest line kept.
+        limit (int): Maximum number of lines returned, the oldest first. 0 means no limit.
+
+    Returns:
+        dict[str,Any]: The output, with the following keys:
+            - lines (list[dict]): Lines with seq (int), time (float, seconds since the epoch), stream (stdout or stderr) and text (str)
+            - next (int): Number of the last line returned, to pass as `since`
+            - dropped (int): Number of lines after `since` no longer kept
+            - running (bool): Whether the process is still running
+    """
+    if (supervised := get_supervisor().get(pid)) is None:
+        raise ValueError(f"No scrcpy process found with pid: {pid}")
+    lines, dropped = supervised.logs.since(since, limit)
+    return {
+        "lines": [line.to_dict() for line in lines],
+        "next": lines[-1].seq if lines else since,
+        "dropped": dropped,
+        "running": supervised.active,
+    }
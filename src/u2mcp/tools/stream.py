@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+from weakref import WeakSet
+
+import fastmcp
+from anyio import BrokenResourceError, ClosedResourceError, fail_after
+from fastmcp.utilities.logging import get_logger
+
+from ..mcp import mcp
+from ..streaming import LiveFrame, get_grabber, start_grabber, stop_grabber
+
+if TYPE_CHECKING:
+    from mcp.server.session import ServerSession
+    from pydantic import AnyUrl
+
+__all__ = ("start_stream", "stop_stream", "stream_frame")
+
+_FRAME_URI = "screen://{serial}/frame"
+
+_logger = get_logger(__name__)
+
+# Sessions subscribed to the frame resource of each device, by URI
+_subscriptions: dict[str, WeakSet[ServerSession]] = {}
+
+
+def _frame_uri(serial: str) -> str:
+    return _FRAME_URI.format(serial=serial)
+
+
+async def _notify_subscribers(serial: str, frame: LiveFrame) -> None:
+    uri = _frame_uri(serial)
+    for session in list(_subscriptions.get(uri, ())):
+        try:
+            await session.send_resource_updated(uri)  # type: ignore[arg-type]
+        except (BrokenResourceError, ClosedResourceError):
+            # The session is gone
+            _subscriptions[uri].discard(session)
+
+
+# fastmcp versions whose low-level server is patched for resource subscriptions, same bounds as the requirement
+_SUBSCRIPTIONS_FASTMCP = ((2, 11), (2, 15))
+
+
+def _fastmcp_version() -> tuple[int, ...]:
+    parts = []
+    for part in fastmcp.__version__.split(".")[:2]:
+        if not part.isdigit():
+            break
+        parts.append(int(part))
+    return tuple(parts)
+
+
+def enable_resource_subscriptions(server: Any) -> bool:
+    """Handle resource subscriptions on the low-level MCP server of a FastMCP server, and advertise them.
+
+    This is the only place that reaches into the internals of fastmcp for subscriptions.
+    It works around fastmcp having no API for ``resources/subscribe`` and ``resources/unsubscribe``,
+    while the low-level ``mcp.server.lowlevel.Server`` it wraps (``FastMCP._mcp_server``) always advertises
+    ``subscribe=False`` in its capabilities, even once handlers of those requests are registered.
+    Only the fastmcp versions it was checked against are patched: with another version, or a server laid out
+    differently, nothing is changed, and streams still work without update notifications.
+
+    Returns:
+        bool: Whether subscriptions are enabled
+    """
+    low, high = _SUBSCRIPTIONS_FASTMCP
+    if not low <= _fastmcp_version() < high:
+        _logger.warning("resource subscriptions are not supported with fastmcp %s", fastmcp.__version__)
+        return False
+    lowlevel: Any = getattr(server, "_mcp_server", None)
+    if not all(
+        callable(getattr(lowlevel, name, None)) for name in ("subscribe_resource", "unsubscribe_resource", "get_capabilities")
+    ):
+        _logger.warning("resource subscriptions are not supported by this server")
+        return False
+    get_capabilities = lowlevel.get_capabilities
+
+    def _get_capabilities(*args: Any, **kwargs: Any) -> Any:
+        capabilities = get_capabilities(*args, **kwargs)
+        if getattr(capabilities, "resources", None) is not None:
+            capabilities.resources.subscribe = True
+        return capabilities
+
+    async def _subscribe(uri: AnyUrl) -> None:
+        _subscriptions.setdefault(str(uri), WeakSet()).add(lowlevel.request_context.session)
+
+    async def _unsubscribe(uri: AnyUrl) -> None:
+        if (sessions := _subscriptions.get(str(uri))) is not None:
+            sessions.discard(lowlevel.request_context.session)
+
+    lowlevel.subscribe_resource()(_subscribe)
+    lowlevel.unsubscribe_resource()(_unsubscribe)
+    lowlevel.get_capabilities = _get_capabilities
+    return True
+
+
+_subscriptions_enabled = enable_resource_subscriptions(mcp)
+
+
+@mcp.tool("start_stream", tags={"screen:stream"})
+async def start_stream(serial: str, notify_interval: float = 0.5, timeout: float = 10.0) -> dict[str, Any]:
+    """Keep a live stream of the screen of a device open in background, with minicap.
+
+    While the stream is open, `screenshot` returns its latest frame from memory instead of capturing the screen,
+    and clients subscribed to the `screen://{serial}/frame` resource are notified when the screen changes.
+    Use stop_stream to close it. Calling it again for an open stream only changes `notify_interval`.
+
+    Args:
+        serial (str): Android device serialno
+        notify_interval (float): Minimum seconds between two notifications to subscribers of the frame resource.
+        timeout (float): Seconds to wait for the first frame.
+
+    Returns:
+        dict[str,Any]: The stream, with the following keys:
+            - uri (str): URI of the frame resource
+            - width (int): Width of the frames
+            - height (int): Height of the frames
+    """
+    serial = serial.strip()
+
+    async def notify(frame: LiveFrame) -> None:
+        await _notify_subscribers(serial, frame)
+
+    grabber = await start_grabber(serial, notify=notify, notify_interval=notify_interval)
+    try:
+        with fail_after(timeout):
+            await grabber.wait_frame()
+    except TimeoutError:
+        stop_grabber(serial)
+        raise RuntimeError(f"No frame from the stream of {serial} within {timeout}s: {grabber.error}") from None
+    banner = grabber.banner
+    if banner is None:
+        raise RuntimeError(f"The stream of {serial} closed")
+    return {"uri": _frame_uri(serial), "width": banner.virtual_width, "height": banner.virtual_height}
+
+
+@mcp.tool("stop_stream", tags={"screen:stream"})
+async def stop_stream(serial: str) -> None:
+    """Close the live stream of the screen of a device.
+
+    Args:
+        serial (str): Android device serialno
+    """
+    if not stop_grabber(serial.strip()):
+        raise ValueError(f"No stream of device {serial}")
+
+
+@mcp.resource(_FRAME_URI, mime_type="image/jpeg", tags={"screen:stream"})
+async def stream_frame(serial: str) -> bytes:
+    """Latest frame of the live stream of a device screen, opened by start_stream."""
+    grabber = get_grabber(serial)
+    if grabber is None:
+        raise ValueError(f"No stream of device {serial}, call start_stream first")
+    if (frame := grabber.latest) is None:
+        raise RuntimeError(f"The stream of {serial} is not connected: {grabber.error}")
+    return frame.data
@@ -0,0 +1,302 @@
+"""Opt-in tracing of tool calls, split into the phases where their time goes.
+
+Each tool call is a root span, and the phases within it are its child spans:
+
+- ``device.connect``: connecting to the device (instant once connected)
+- ``device.lock``: waiting for the device lock
+- ``worker.queue``: waiting for a thread of a worker pool or of the device budget
+- ``worker.run``: running a blocking call in a worker thread (uiautomator2 HTTP calls, hierarchy parsing ...)
+- ``image.encode``: encoding a screenshot
+
+Spans are written as OTLP/JSON, one ``ExportTraceServiceRequest`` per line holding all the spans of one tool call,
+so a file can be read back by an OpenTelemetry Collector (``otlpjsonfile`` receiver) or summarized by
+``u2mcp trace-report``. When tracing is off, recording a span is a single ``None`` check.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import secrets
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import IO, Any
+
+from fastmcp.server.middleware import CallNext, Middleware, MiddlewareContext
+
+from .version import __version__
+
+__all__ = [
+    "PHASES",
+    "TracingMiddleware",
+    "add_span",
+    "disable_tracing",
+    "enable_tracing",
+    "is_tracing_enabled",
+    "read_trace",
+    "summarize_trace",
+]
+
+# Child span names, in the order a tool call goes through them
+PHASES = ("device.connect", "device.lock", "worker.queue", "worker.run", "image.encode")
+
+_SPAN_KIND_INTERNAL = 1
+_SPAN_KIND_SERVER = 2
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+
+@dataclass(slots=True)
+class _Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str
+    start: int
+    end: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    def to_otlp(self) -> dict[str, Any]:
+        span: dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": _SPAN_KIND_INTERNAL if self.parent_id else _SPAN_KIND_SERVER,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": _STATUS_ERROR, "message": self.error} if self.error is not None else {"code": _STATUS_OK},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+@dataclass(slots=True)
+class _Trace:
+    """The root span of a tool call, and the child spans recorded so far."""
+
+    root: _Span
+    spans: list[_Span] = field(default_factory=list)
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _from_otlp_value(value: dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    if "arrayValue" in value:
+        return [_from_otlp_value(v) for v in value["arrayValue"].get("values", [])]
+    return next(iter(value.values()), None)
+
+
+_output: IO[str] | None = None
+_current_trace: ContextVar[_Trace | None] = ContextVar("_current_trace", default=None)
+
+
+def enable_tracing(path: str) -> None:
+    """Start writing spans to a file, appending to it. ``-`` writes to stderr, as stdout may carry the stdio transport."""
+    global _output
+    disable_tracing()
+    _output = sys.stderr if path == "-" else open(path, "a", encoding="utf-8", buffering=1)  # noqa: SIM115
+
+
+def disable_tracing() -> None:
+    """Stop writing spans, closing the trace file."""
+    global _output
+    if _output is not None and _output is not sys.stderr:
+        _output.close()
+    _output = None
+
+
+def is_tracing_enabled() -> bool:
+    """Whether spans are being written."""
+    return _output is not None
+
+
+def _write(spans: list[_Span]) -> None:
+    if _output is None:
+        return
+    request = {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "u2mcp"}},
+                        {"key": "service.version", "value": {"stringValue": __version__}},
+                        {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "u2mcp"}, "spans": [span.to_otlp() for span in spans]}],
+            }
+        ]
+    }
+    _output.write(json.dumps(request, separators=(",", ":")) + "\n")
+
+
+# Keyword arguments of `add_span`, and the span attributes they are recorded as
+_ATTRIBUTE_NAMES = {
+    "serial": "device.serial",
+    "shared": "device.lock.shared",
+    "pool": "worker.pool",
+    "function": "code.function",
+    "format": "image.format",
+}
+
+
+def add_span(name: str, seconds: float, **kwargs: Any) -> None:
+    """Record a phase that took ``seconds`` and ended now, as a child of the current tool call span.
+
+    Outside a tool call, the span is written on its own.
+
+    Args:
+        name: One of :data:`PHASES`
+        seconds: Duration of the phase
+        **kwargs: Attributes of the span: ``serial``, ``shared``, ``pool``, ``function`` or ``format``.
+            Empty strings are left out.
+    """
+    if _output is None:
+        return
+    attributes = {_ATTRIBUTE_NAMES.get(key, key): value for key, value in kwargs.items() if value != ""}
+    end = time.time_ns()
+    start = end - int(seconds * 1e9)
+    if (trace := _current_trace.get()) is None:
+        _write([_Span(name, secrets.token_hex(16), secrets.token_hex(8), "", start, end, attributes)])
+        return
+    root = trace.root
+    if "device.serial" in attributes:
+        root.attributes.setdefault("device.serial", attributes["device.serial"])
+    attributes.setdefault("mcp.tool.name", root.name)
+    trace.spans.append(_Span(name, root.trace_id, secrets.token_hex(8), root.span_id, start, end, attributes))
+
+
+@contextmanager
+def _tool_span(name: str, tags: set[str]) -> Iterator[None]:
+    attributes: dict[str, Any] = {"mcp.tool.name": name, "mcp.tool.tags": sorted(tags)}
+    root = _Span(name, secrets.token_hex(16), secrets.token_hex(8), "", time.time_ns(), attributes=attributes)
+    trace = _Trace(root)
+    token = _current_trace.set(trace)
+    try:
+        yield
+    except BaseException as e:
+        root.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_trace.reset(token)
+        root.end = time.time_ns()
+        _write([root, *trace.spans])
+
+
+class TracingMiddleware(Middleware):
+    """Record a span for each tool call, with the name and tags of the tool."""
+
+    def __init__(self) -> None:
+        self._tags_by_tool: dict[str, set[str]] = {}
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next: CallNext) -> Any:
+        if _output is None:
+            return await call_next(context)
+        name = context.message.name
+        if (tags := self._tags_by_tool.get(name)) is None and context.fastmcp_context is not None:
+            tool = await context.fastmcp_context.fastmcp.get_tool(name)
+            tags = self._tags_by_tool[name] = set(tool.tags or ())
+        with _tool_span(name, tags or set()):
+            return await call_next(context)
+
+
+def read_trace(path: str) -> list[dict[str, Any]]:
+    """Read the spans of a trace file, as dicts with name, ids, start, end (ns), attributes and error."""
+    spans: list[dict[str, Any]] = []
+    with open(path, encoding="utf-8") as fp:
+        for line in fp:
+            if not line.strip():
+                continue
+            for resource in json.loads(line).get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    for span in scope.get("spans", []):
+                        spans.append(
+                            {
+                                "name": span["name"],
+                                "trace_id": span["traceId"],
+                                "span_id": span["spanId"],
+                                "parent_id": span.get("parentSpanId", ""),
+                                "start": int(span["startTimeUnixNano"]),
+                                "end": int(span["endTimeUnixNano"]),
+                                "attributes": {a["key"]: _from_otlp_value(a["value"]) for a in span.get("attributes", [])},
+                                "error": span.get("status", {}).get("code") == _STATUS_ERROR,
+                            }
+                        )
+    return spans
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize_trace(spans: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Summarize tool calls by phase.
+
+    Returns:
+        Statistics keyed by tool name, each with the following keys:
+            - calls (int): Number of calls
+            - errors (int): Number of failed calls
+            - p50, p95, mean (float): Seconds per call
+            - phases (dict[str,float]): Mean seconds per call spent in each phase of :data:`PHASES`,
+              and in "server" for the rest of the call (validation, serialization, waits between polls ...)
+    """
+    children: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        if span["parent_id"]:
+            children[span["parent_id"]].append(span)
+
+    durations: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    phases: dict[str, dict[str, float]] = defaultdict(lambda: dict.fromkeys((*PHASES, "server"), 0.0))
+    for span in spans:
+        if span["parent_id"] or span["name"] in PHASES:
+            continue
+        name = span["name"]
+        total = (span["end"] - span["start"]) / 1e9
+        durations[name].append(total)
+        errors[name] += span["error"]
+        in_phases = 0.0
+        spans_of_call = [child for child in children[span["span_id"]] if child["name"] in PHASES]
+        # Connecting runs in a worker thread too, which is counted as connecting only
+        connects = [(c["start"], c["end"]) for c in spans_of_call if c["name"] == "device.connect"]
+        for child in spans_of_call:
+            if child["name"] != "device.connect" and any(s <= child["start"] and child["end"] <= e for s, e in connects):
+                continue
+            seconds = (child["end"] - child["start"]) / 1e9
+            phases[name][child["name"]] += seconds
+            in_phases += seconds
+        # Phases of concurrent calls (device_fanout) can add up to more than the call itself
+        phases[name]["server"] += max(total - in_phases, 0.0)
+
+    return {
+        name: {
+            "calls": len(values),
+            "errors": errors[name],
+            "p50": _percentile(values, 0.5),
+            "p95": _percentile(values, 0.95),
+            "mean": sum(values) / len(values),
+            "phases": {phase: seconds / len(values) for phase, seconds in phases[name].items()},
+        }
+        for name, values in sorted(durations.items())
+    }
@@ -0,0 +1,189 @@
+"""Worker threads running the blocking calls to devices.
+
+Blocking calls run in one of two pools, each with its own cap on the number of busy threads:
+the "quick" pool for calls that return promptly (queries, taps, key presses ...),
+and the "wait" pool for calls that block until something shows up on the screen (element waits, app waits ...).
+On top of that, each device has a budget of threads across both pools,
+so that one busy device cannot take the threads that the other devices need.
+
+anyio's default limiter of 40 threads is bypassed: the caps here are what bounds the number of threads.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, Literal, TypeVar, TypeVarTuple, Unpack
+
+from anyio import CapacityLimiter, WouldBlock, to_thread
+
+from .tracing import add_span
+
+__all__ = [
+    "Pool",
+    "get_worker_limits",
+    "run_sync",
+    "set_worker_limits",
+    "worker_stats",
+]
+
+T = TypeVar("T")
+PosArgsT = TypeVarTuple("PosArgsT")
+
+Pool = Literal["quick", "wait"]
+
+_pool_workers: dict[str, int] = {"quick": 32, "wait": 64}
+_device_workers: int = 4
+
+# Created on first use, because they must be created within the event loop
+_pool_limiters: dict[str, CapacityLimiter] = {}
+_device_limiters: dict[str, CapacityLimiter] = {}
+# Both caps above are held while a thread runs, so the threads themselves are not limited again
+_unlimited: CapacityLimiter | None = None
+
+
+@dataclass(slots=True)
+class _WaitStats:
+    calls: int = 0
+    waiting: int = 0
+    peak_waiting: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.calls += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def to_dict(self, limiter: CapacityLimiter | None, limit: int) -> dict[str, Any]:
+        return {
+            "limit": limit,
+            "busy": limiter.borrowed_tokens if limiter is not None else 0,
+            "waiting": self.waiting,
+            "peak_waiting": self.peak_waiting,
+            "calls": self.calls,
+            "wait_total": self.wait_total,
+            "wait_mean": self.wait_total / self.calls if self.calls else 0.0,
+            "wait_max": self.wait_max,
+        }
+
+
+_pool_stats: dict[str, _WaitStats] = {"quick": _WaitStats(), "wait": _WaitStats()}
+_device_stats: dict[str, _WaitStats] = {}
+
+
+def get_worker_limits() -> dict[str, int]:
+    """Get the thread caps of the quick pool, the wait pool and each device."""
+    return {"workers": _pool_workers["quick"], "wait_workers": _pool_workers["wait"], "device_workers": _device_workers}
+
+
+def set_worker_limits(workers: int | None = None, wait_workers: int | None = None, device_workers: int | None = None) -> None:
+    """Set the thread caps of the quick pool, the wait pool and each device. None leaves a cap unchanged."""
+    global _device_workers
+    for name, value in (("workers", workers), ("wait workers", wait_workers), ("device workers", device_workers)):
+        if value is not None and value < 1:
+            raise ValueError(f"{name} must be at least 1")
+    for pool, value in (("quick", workers), ("wait", wait_workers)):
+        if value is not None:
+            _pool_workers[pool] = value
+            if (limiter := _pool_limiters.get(pool)) is not None:
+                limiter.total_tokens = value
+    if device_workers is not None:
+        _device_workers = device_workers
+        for limiter in _device_limiters.values():
+            limiter.total_tokens = device_workers
+
+
+def _get_unlimited() -> CapacityLimiter:
+    global _unlimited
+    if _unlimited is None:
+        _unlimited = CapacityLimiter(math.inf)
+    return _unlimited
+
+
+def _get_pool_limiter(pool: str) -> CapacityLimiter:
+    if (limiter := _pool_limiters.get(pool)) is None:
+        limiter = _pool_limiters[pool] = CapacityLimiter(_pool_workers[pool])
+    return limiter
+
+
+def _get_device_limiter(serial: str) -> CapacityLimiter:
+    if (limiter := _device_limiters.get(serial)) is None:
+        limiter = _device_limiters[serial] = CapacityLimiter(_device_workers)
+        _device_stats[serial] = _WaitStats()
+    return limiter
+
+
+async def _acquire(limiter: CapacityLimiter, stats: _WaitStats) -> None:
+    try:
+        limiter.acquire_nowait()
+    except WouldBlock:
+        pass
+    else:
+        stats.record(0.0)
+        return
+    started = time.monotonic()
+    stats.waiting += 1
+    stats.peak_waiting = max(stats.peak_waiting, stats.waiting)
+    try:
+        await limiter.acquire()
+    finally:
+        stats.waiting -= 1
+    stats.record(time.monotonic() - started)
+
+
+async def run_sync(func: Callable[[Unpack[PosArgsT]], T], *args: *PosArgsT, serial: str = "", pool: Pool = "quick") -> T:
+    """Run a blocking function in a worker thread, within the thread caps of a pool and a device.
+
+    Args:
+        func: The blocking function
+        *args: Positional arguments of the function
+        serial: The device the function operates on, empty if none
+        pool: ``"wait"`` for functions that block until something happens on the device, ``"quick"`` otherwise
+
+    Returns:
+        The return value of the function
+    """
+    queued = time.perf_counter()
+    # Take the device budget first, so calls queued on a busy device do not hold threads of the shared pool
+    device_limiter = None
+    if serial:
+        device_limiter = _get_device_limiter(serial)
+        await _acquire(device_limiter, _device_stats[serial])
+    try:
+        pool_limiter = _get_pool_limiter(pool)
+        await _acquire(pool_limiter, _pool_stats[pool])
+        started = time.perf_counter()
+        add_span("worker.queue", started - queued, serial=serial, pool=pool)
+        try:
+            return await to_thread.run_sync(func, *args, limiter=_get_unlimited())
+        finally:
+            pool_limiter.release()
+            function = getattr(func, "__qualname__", type(func).__name__)
+            add_span("worker.run", time.perf_counter() - started, serial=serial, pool=pool, function=function)
+    finally:
+        if device_limiter is not None:
+            device_limiter.release()
+
+
+def worker_stats(reset: bool = False) -> dict[str, Any]:
+    """Get the load of each pool and each device: busy threads, queued calls and time spent queuing.
+
+    Args:
+        reset: clear the counters after reading them
+
+    Returns:
+        A dict with "pools" and "devices", each keyed by pool name or serial.
+    """
+    result = {
+        "pools": {pool: stats.to_dict(_pool_limiters.get(pool), _pool_workers[pool]) for pool, stats in _pool_stats.items()},
+        "devices": {
+            serial: stats.to_dict(_device_limiters.get(serial), _device_workers) for serial, stats in _device_stats.items()
+        },
+    }
+    if reset:
+        for stats in (*_pool_stats.values(), *_device_stats.values()):
+            stats.calls, stats.wait_total, stats.wait_max, stats.peak_waiting = 0, 0.0, 0.0, stats.waiting
+    return result
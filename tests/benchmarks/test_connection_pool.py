@@ -0,0 +1,81 @@
+"""
+Stress benchmark for per-serial device connections.
+
+A fake ``u2.connect`` with configurable latency stands in for slow phones,
+and the time-to-first-call of N devices connecting at once is measured.
+"""
+
+from __future__ import annotations
+
+import time
+from unittest.mock import MagicMock
+
+import anyio
+import pytest
+
+from u2mcp.tools.device import get_device
+
+CONNECT_LATENCY = 0.2
+
+
+def _make_slow_connect(latency: float):
+    def slow_connect(serial: str) -> MagicMock:
+        time.sleep(latency)
+        device = MagicMock()
+        device.serial = serial
+        return device
+
+    return slow_connect
+
+
+async def _time_to_first_call(n_devices: int) -> list[float]:
+    elapsed: list[float] = []
+    started = time.perf_counter()
+
+    async def first_call(serial: str):
+        async with get_device(serial):
+            elapsed.append(time.perf_counter() - started)
+
+    async with anyio.create_task_group() as tg:
+        for i in range(n_devices):
+            tg.start_soon(first_call, f"emulator-{5554 + 2 * i}")
+    return elapsed
+
+
+@pytest.mark.asyncio
+@pytest.mark.slow
+@pytest.mark.parametrize("n_devices", [1, 10, 40])
+async def test_time_to_first_call(mock_u2_module: MagicMock, clean_device_registry: dict, n_devices: int) -> None:
+    """Devices connect in parallel, so the slowest first call takes about one connect latency."""
+    mock_u2_module.connect.side_effect = _make_slow_connect(CONNECT_LATENCY)
+
+    elapsed = await _time_to_first_call(n_devices)
+
+    assert len(elapsed) == n_devices
+    assert mock_u2_module.connect.call_count == n_devices
+    # Serialized connections would need n_devices * CONNECT_LATENCY
+    assert max(elapsed) < CONNECT_LATENCY * 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.slow
+async def test_hung_device_does_not_block_others(mock_u2_module: MagicMock, clean_device_registry: dict) -> None:
+    """A device that takes long to connect does not delay the first call of other devices."""
+    slow_connect = _make_slow_connect(CONNECT_LATENCY)
+    hung_connect = _make_slow_connect(CONNECT_LATENCY * 5)
+    mock_u2_module.connect.side_effect = lambda serial: hung_connect(serial) if serial == "hung" else slow_connect(serial)
+
+    elapsed: dict[str, float] = {}
+    started = time.perf_counter()
+
+    async def first_call(serial: str):
+        async with get_device(serial):
+            elapsed[serial] = time.perf_counter() - started
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(first_call, "hung")
+        await anyio.sleep(0.01)
+        tg.start_soon(first_call, "emulator-5554")
+
+    assert elapsed["emulator-5554"] < CONNECT_LATENCY * 3
+    assert elapsed["hung"] >= CONNECT_LATENCY * 5
@@ -0,0 +1,130 @@
+"""
+Benchmark of compact hierarchy output.
+
+Renders a synthetic hierarchy shaped like a feed screen of a real app in each format,
+and reports payload size and conversion time.
+"""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from u2mcp.hierarchy import compact_hierarchy, render_json, render_text
+
+ROUNDS = 5
+
+
+def _fixture_hierarchy(items: int = 60) -> str:
+    """A feed screen: toolbar, a recycler view of cards nested in layout containers, and a bottom navigation bar."""
+    nodes: list[str] = []
+
+    def node(
+        cls: str, bounds: tuple[int, int, int, int], *, text: str = "", rid: str = "", desc: str = "", **flags: bool
+    ) -> str:
+        attrs = {
+            "index": "0",
+            "text": text,
+            "resource-id": rid,
+            "class": cls,
+            "package": "com.example.feed",
+            "content-desc": desc,
+            "checkable": "false",
+            "checked": "false",
+            "clickable": "false",
+            "enabled": "true",
+            "focusable": "false",
+            "focused": "false",
+            "scrollable": "false",
+            "long-clickable": "false",
+            "password": "false",
+            "selected": "false",
+            "visible-to-user": "true",
+            "bounds": "[{},{}][{},{}]".format(*bounds),
+        }
+        attrs.update({name.replace("_", "-"): str(value).lower() for name, value in flags.items()})
+        return "<node " + " ".join(f'{k}="{v}"' for k, v in attrs.items())
+
+    def container(cls: str, bounds: tuple[int, int, int, int], depth: int) -> None:
+        for _ in range(depth):
+            nodes.append(node(cls, bounds) + ">")
+
+    def close(depth: int) -> None:
+        nodes.extend(["</node>"] * depth)
+
+    container("android.widget.FrameLayout", (0, 0, 1080, 2400), 4)
+    nodes.append(node("android.widget.TextView", (40, 80, 800, 200), text="Home", rid="com.example.feed:id/title") + " />")
+    nodes.append(node("android.widget.ImageButton", (900, 80, 1040, 200), desc="Search", clickable=True) + " />")
+    nodes.append(
+        node("androidx.recyclerview.widget.RecyclerView", (0, 220, 1080, 2200), rid="com.example.feed:id/list", scrollable=True)
+        + ">"
+    )
+    for i in range(items):
+        top = 220 + i * 300
+        card = (0, top, 1080, top + 300)
+        container("android.view.ViewGroup", card, 3)
+        nodes.append(
+            node("android.widget.LinearLayout", card, rid="com.example.feed:id/card", clickable=True, long_clickable=True) + ">"
+        )
+        container("android.widget.LinearLayout", card, 2)
+        nodes.append(node("android.widget.ImageView", (40, top + 20, 200, top + 180), rid="com.example.feed:id/avatar") + " />")
+        nodes.append(
+            node(
+                "android.widget.TextView", (220, top + 20, 1040, top + 80), text=f"Author {i}", rid="com.example.feed:id/author"
+            )
+            + " />"
+        )
+        nodes.append(
+            node(
+                "android.widget.TextView",
+                (220, top + 90, 1040, top + 200),
+                text=f"Post body number {i}",
+                rid="com.example.feed:id/body",
+            )
+            + " />"
+        )
+        close(2)
+        nodes.append(
+            node("android.widget.CheckBox", (40, top + 220, 200, top + 280), desc="Like", clickable=True, checkable=True)
+            + " />"
+        )
+        nodes.append("</node>")
+        close(3)
+    nodes.append("</node>")
+    container("android.widget.LinearLayout", (0, 2200, 1080, 2400), 2)
+    for j, label in enumerate(("Home", "Explore", "Inbox", "Profile")):
+        nodes.append(
+            node(
+                "android.widget.FrameLayout", (j * 270, 2200, j * 270 + 270, 2400), desc=label, clickable=True, selected=j == 0
+            )
+            + " />"
+        )
+    close(2)
+    close(4)
+    return (
+        "<?xml version='1.0' encoding='UTF-8' standalone='yes' ?><hierarchy rotation=\"0\">" + "".join(nodes) + "</hierarchy>"
+    )
+
+
+@pytest.mark.slow
+def test_compact_formats() -> None:
+    """The compact formats are several times smaller than the raw XML."""
+    xml = _fixture_hierarchy()
+    results: dict[str, tuple[int, float]] = {"xml (raw)": (len(xml), 0.0)}
+
+    for name, render in (("json", render_json), ("text", render_text)):
+        elapsed = []
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            output = render(*compact_hierarchy(xml))
+            elapsed.append(time.perf_counter() - started)
+        results[name] = len(output), min(elapsed)
+
+    print()
+    print(f"{'format':<12}{'bytes':>12}{'ratio':>8}{'convert ms':>12}")
+    for name, (size, seconds) in results.items():
+        print(f"{name:<12}{size:>12}{size / len(xml):>8.2f}{seconds * 1000:>12.2f}")
+
+    assert results["json"][0] < len(xml) / 5
+    assert results["text"][0] < len(xml) / 5
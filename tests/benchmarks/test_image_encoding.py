@@ -0,0 +1,110 @@
+"""
+Benchmark of screenshot encoding options.
+
+Encodes a synthetic 1440x3200 screen with each set of options and reports payload bytes and encode time.
+"""
+
+from __future__ import annotations
+
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image as PILImage
+from PIL import ImageDraw
+
+from u2mcp.imaging import encode_image_sync
+
+ROUNDS = 3
+
+OPTIONS: dict[str, dict] = {
+    "jpeg q75 (default)": {},
+    "jpeg q50": {"quality": 50},
+    "jpeg q75 max_width=720": {"max_width": 720},
+    "jpeg q75 scale=0.25": {"scale": 0.25},
+    "jpeg q75 grayscale": {"grayscale": True},
+    "jpeg q50 max_width=540 grayscale": {"quality": 50, "max_width": 540, "grayscale": True},
+    "png": {"format": "png"},
+    "png max_width=720": {"format": "png", "max_width": 720},
+    "webp q75": {"format": "webp"},
+    "webp q50 max_width=720": {"format": "webp", "quality": 50, "max_width": 720},
+}
+
+
+def _fixture_screen_jpeg() -> bytes:
+    """A phone-sized screen with text-like rows and colored blocks, as the device would send it."""
+    im = PILImage.new("RGB", (1440, 3200), "white")
+    draw = ImageDraw.Draw(im)
+    for row in range(0, 3200, 160):
+        draw.rectangle((40, row + 20, 1400, row + 140), fill=((row * 7) % 256, (row * 3) % 256, 200))
+        for col in range(80, 1300, 90):
+            draw.text((col, row + 70), "Lorem ipsum", fill="black")
+    with BytesIO() as fp:
+        im.save(fp, "jpeg", quality=80)
+        return fp.getvalue()
+
+
+@pytest.mark.slow
+def test_encode_options() -> None:
+    """Every downscaling option produces a smaller payload than the default full-size JPEG."""
+    source = _fixture_screen_jpeg()
+    results: dict[str, tuple[int, float]] = {}
+
+    for name, kwargs in OPTIONS.items():
+        elapsed = []
+        for _ in range(ROUNDS):
+            # Open a fresh image each round, as a screenshot from the device is not decoded yet
+            im = PILImage.open(BytesIO(source))
+            started = time.perf_counter()
+            result = encode_image_sync(im, **kwargs)
+            elapsed.append(time.perf_counter() - started)
+        results[name] = len(result["image"]), min(elapsed)
+
+    print()
+    print(f"{'options':<36}{'bytes':>12}{'encode ms':>12}")
+    for name, (size, seconds) in results.items():
+        print(f"{name:<36}{size:>12}{seconds * 1000:>12.2f}")
+
+    default_size, default_time = results["jpeg q75 (default)"]
+    for name in ("jpeg q75 max_width=720", "jpeg q75 scale=0.25", "jpeg q50 max_width=540 grayscale"):
+        size, seconds = results[name]
+        assert size < default_size
+        assert seconds < default_time
+
+
+@pytest.mark.asyncio
+@pytest.mark.slow
+async def test_encode_does_not_delay_concurrent_calls(mock_u2_device, clean_device_registry: dict) -> None:
+    """An `info` call made while screenshots are being encoded is not delayed by the encoding."""
+    import anyio
+
+    from u2mcp.tools.device import info, screenshot
+
+    # PNG at full size is the slowest encoding, so it would be noticed on the event loop
+    source = _fixture_screen_jpeg()
+    mock_u2_device.screenshot.side_effect = lambda display_id=None: PILImage.open(BytesIO(source))
+    encode_started = anyio.Event()
+    info_elapsed: list[float] = []
+    screenshot_elapsed: list[float] = []
+
+    async def take_screenshot():
+        started = time.perf_counter()
+        encode_started.set()
+        await screenshot.fn("emulator-5554", format="png")
+        screenshot_elapsed.append(time.perf_counter() - started)
+
+    async def get_info():
+        await encode_started.wait()
+        await anyio.sleep(0.01)
+        started = time.perf_counter()
+        await info.fn("emulator-5554", fresh=True)
+        info_elapsed.append(time.perf_counter() - started)
+
+    await info.fn("emulator-5554")  # connect first
+    async with anyio.create_task_group() as tg:
+        for _ in range(4):
+            tg.start_soon(take_screenshot)
+        tg.start_soon(get_info)
+
+    print(f"\ninfo: {info_elapsed[0] * 1000:.2f}ms, screenshots: {max(screenshot_elapsed) * 1000:.2f}ms")
+    assert info_elapsed[0] < min(screenshot_elapsed) / 2
@@ -0,0 +1,53 @@
+"""
+Import-time budget of the CLI and of tool registration.
+
+Runs `python -X importtime` in a fresh interpreter and checks which modules are imported, and how long it takes:
+the CLI entry point imports neither the server nor rich, and registering the tools imports neither
+uiautomator2, adbutils, PIL nor lxml, which are only needed once a tool is called.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative import time budgets in seconds, generous for slow CI machines
+CLI_BUDGET = 0.3
+REGISTER_BUDGET = 3.0
+
+DEVICE_MODULES = ("uiautomator2", "adbutils", "PIL", "lxml")
+
+
+def _importtime(code: str) -> dict[str, float]:
+    """Cumulative import time in seconds of each module imported by running `code`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    modules: dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+@pytest.mark.slow
+def test_cli_import_time() -> None:
+    """`u2mcp --help` and `u2mcp version` do not import the server."""
+    modules = _importtime("import u2mcp.__main__")
+
+    print(f"\nimport u2mcp.__main__: {modules['u2mcp.__main__'] * 1000:.0f}ms")
+    assert not [name for name in modules if name.split(".")[0] in ("fastmcp", "rich", *DEVICE_MODULES)]
+    assert modules["u2mcp.__main__"] < CLI_BUDGET
+
+
+@pytest.mark.slow
+def test_tool_registration_import_time() -> None:
+    """Registering every tool, as `u2mcp tools`, `info` and `tags` do, does not import device libraries."""
+    modules = _importtime("from u2mcp.mcp import make_mcp; make_mcp()")
+
+    total = modules["u2mcp.mcp"] + modules.get("u2mcp.tools", 0.0)
+    print(f"\nimport u2mcp.mcp and the tools: {total * 1000:.0f}ms")
+    assert not [name for name in modules if name.split(".")[0] in DEVICE_MODULES]
+    assert total < REGISTER_BUDGET
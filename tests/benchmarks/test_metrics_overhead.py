@@ -0,0 +1,79 @@
+"""
+Microbenchmark of the cost of metrics per tool call.
+
+Times the metrics middleware around a no-op tool call, against the bare call,
+then a real tool call through an in-memory MCP client with and without the middleware.
+"""
+
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from u2mcp.metrics import MetricsMiddleware, install_metrics, reset_metrics
+
+CALLS = 20_000
+CLIENT_CALLS = 300
+
+
+async def _noop(context):
+    return None
+
+
+@pytest.mark.asyncio
+@pytest.mark.slow
+async def test_middleware_overhead_per_call() -> None:
+    """Recording a tool call costs a few microseconds."""
+    middleware = MetricsMiddleware()
+    context = SimpleNamespace(message=SimpleNamespace(name="click"))
+    reset_metrics()
+
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        await _noop(context)
+    bare = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        await middleware.on_call_tool(context, _noop)  # type: ignore[arg-type]
+    instrumented = time.perf_counter() - started
+    reset_metrics()
+
+    overhead = (instrumented - bare) / CALLS
+    print(f"\nmetrics middleware: {overhead * 1e6:.2f}us per call")
+    assert overhead < 20e-6
+
+
+@pytest.mark.asyncio
+@pytest.mark.slow
+async def test_tool_call_overhead(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Metrics add a small fraction to the server-side cost of a tool call."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    install_metrics(mcp)
+    installed = [m for m in mcp.middleware if isinstance(m, MetricsMiddleware)]
+
+    async def run(client: Client) -> float:
+        started = time.perf_counter()
+        for _ in range(CLIENT_CALLS):
+            await client.call_tool("click", {"serial": "emulator-5554", "x": 1, "y": 2})
+        return (time.perf_counter() - started) / CLIENT_CALLS
+
+    async with Client(mcp) as client:
+        await run(client)  # warm up
+        for m in installed:
+            mcp.middleware.remove(m)
+        try:
+            bare = await run(client)
+        finally:
+            mcp.middleware.extend(installed)
+        instrumented = await run(client)
+    reset_metrics()
+
+    print(f"\nclick: {bare * 1e6:.0f}us per call without metrics, {instrumented * 1e6:.0f}us with metrics")
+    assert instrumented < bare * 1.5
@@ -0,0 +1,44 @@
+"""
+Benchmark of a scripted flow as separate tool calls versus one `run_actions` call.
+
+Runs a 20-step login-like flow through an in-memory MCP client, which pays the tool call overhead
+of the server (validation, middleware, device lock, thread hop) but no network round-trip.
+"""
+
+from __future__ import annotations
+
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+FLOW: list[dict] = [
+    {"action": "click", "x": 540, "y": 300 + 100 * i} if i % 2 == 0 else {"action": "send_text", "text": f"field {i}"}
+    for i in range(19)
+] + [{"action": "press_key", "key": "enter"}]
+
+
+@pytest.mark.asyncio
+@pytest.mark.slow
+async def test_run_actions_vs_separate_calls(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """One `run_actions` call is faster than the same steps as separate tool calls."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    async with Client(mcp) as client:
+        await client.call_tool("click", {"serial": "emulator-5554", "x": 0, "y": 0})  # connect first
+
+        started = time.perf_counter()
+        for spec in FLOW:
+            args = {k: v for k, v in spec.items() if k != "action"}
+            await client.call_tool(spec["action"], {"serial": "emulator-5554", **args})
+        separate = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = await client.call_tool("run_actions", {"serial": "emulator-5554", "actions": FLOW})
+        batched = time.perf_counter() - started
+
+    assert result.data["ok"] is True
+    print(f"\n{len(FLOW)} steps: separate calls {separate * 1000:.2f}ms, run_actions {batched * 1000:.2f}ms")
+    assert batched < separate / 2
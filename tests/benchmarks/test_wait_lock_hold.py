@@ -0,0 +1,93 @@
+"""
+Benchmark of how long an element wait holds the device lock.
+
+A fake device whose element shows up after a while, with a fixed latency per probe, is waited on
+while another task taps the screen every few milliseconds. The longest time a tap queues for the device
+is the longest time the wait held the lock: the whole wait when it blocks inside uiautomator2,
+as `element_wait` used to, and about one probe when it polls.
+"""
+
+from __future__ import annotations
+
+import time
+from unittest.mock import MagicMock
+
+import anyio
+import pytest
+
+from u2mcp.tools.device import get_device
+from u2mcp.tools.element import element_wait
+from u2mcp.workers import run_sync
+
+PROBE_LATENCY = 0.02
+APPEAR_AFTER = 1.0
+
+
+class FakeSelector:
+    def __init__(self, appear_at: float):
+        self._appear_at = appear_at
+
+    @property
+    def exists(self) -> bool:
+        time.sleep(PROBE_LATENCY)
+        return time.monotonic() >= self._appear_at
+
+
+def _make_fake_device() -> MagicMock:
+    device = MagicMock()
+    selector = FakeSelector(time.monotonic() + APPEAR_AFTER)
+    device.xpath = MagicMock(return_value=selector)
+    return device
+
+
+def _blocking_wait(device: MagicMock, xpath: str, timeout: float) -> bool:
+    """The loop of uiautomator2's ``XPathSelector.wait``, run in one worker thread"""
+    deadline = time.time() + timeout
+    while True:
+        if device.xpath(xpath).exists:
+            return True
+        if time.time() > deadline:
+            return False
+        time.sleep(0.2)
+
+
+async def _blocking_element_wait(serial: str, xpath: str, timeout: float) -> bool:
+    async with get_device(serial) as device:
+        return await run_sync(_blocking_wait, device, xpath, timeout, serial=serial, pool="wait")
+
+
+async def _max_tap_queue_time(wait) -> float:
+    """Run a wait, tapping the device meanwhile, and return the longest time a tap queued for the device."""
+    queued: list[float] = []
+    async with anyio.create_task_group() as tg:
+
+        async def tap() -> None:
+            while True:
+                started = time.perf_counter()
+                async with get_device("emulator-5554"):
+                    queued.append(time.perf_counter() - started)
+                await anyio.sleep(0.01)
+
+        async def run_wait() -> None:
+            assert await wait("emulator-5554", "//*[@text='Done']", 5.0) is True
+            tg.cancel_scope.cancel()
+
+        tg.start_soon(run_wait)
+        await anyio.sleep(0.05)
+        tg.start_soon(tap)
+    return max(queued)
+
+
+@pytest.mark.asyncio
+@pytest.mark.slow
+async def test_element_wait_lock_hold(mock_u2_module: MagicMock, clean_device_registry: dict) -> None:
+    """Polling holds the device for about one probe at a time, instead of for the whole wait."""
+    mock_u2_module.connect.side_effect = lambda serial: _make_fake_device()
+
+    blocking = await _max_tap_queue_time(_blocking_element_wait)
+    clean_device_registry.clear()
+    polling = await _max_tap_queue_time(element_wait.fn)
+
+    print(f"\nlongest tap queue time: blocking wait {blocking * 1000:.1f}ms, polling wait {polling * 1000:.1f}ms")
+    assert blocking > APPEAR_AFTER * 0.8
+    assert polling < PROBE_LATENCY * 10
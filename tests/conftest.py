@@ -5,9 +5,20 @@ Pytest configuration and shared fixtures for uiautomator2-mcp-server tests.
 from __future__ import annotations
 
 import asyncio
+import struct
+import tempfile
+import zipfile
+from collections.abc import Callable
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
+from PIL import Image as PILImage
+
+from u2mcp.catalog import set_catalog_path
+
+# Keep the tool catalog cached by make_mcp out of the user's cache
+set_catalog_path(Path(tempfile.mkdtemp(prefix="u2mcp-tests-")) / "tool-catalog.json")
 
 # Initialize mcp at module import time, before any test modules are imported
 # This ensures @mcp.tool() decorators in tool modules work during test collection
@@ -32,7 +43,7 @@ def mock_u2_device() -> MagicMock:
 
         # Setup methods - use MagicMock for methods called with to_thread.run_sync
         mock_device.window_size = MagicMock(return_value=(1080, 2400))
-        mock_device.screenshot = MagicMock(return_value=MagicMock())
+        mock_device.screenshot = MagicMock(return_value=PILImage.new("RGB", (1080, 2400)))
         mock_device.dump_hierarchy = MagicMock(return_value="<hierarchy/>")
         mock_device.wait_activity = MagicMock(return_value=True)
 
@@ -73,6 +84,7 @@ def mock_u2_device() -> MagicMock:
 
         # Element/XPath methods
         mock_xpath = MagicMock()
+        mock_xpath.exists = True
         mock_xpath.wait = MagicMock(return_value=True)
         mock_xpath.wait_gone = MagicMock(return_value=True)
         mock_xpath.click_exists = MagicMock(return_value=True)
@@ -85,15 +97,13 @@ def mock_u2_device() -> MagicMock:
         mock_xpath.swipe = MagicMock()
         mock_xpath.scroll_to = MagicMock(return_value=True)
 
-        # Mock screenshot method
-        from PIL.Image import Image
-
-        mock_image = MagicMock(spec=Image)
-        mock_image.width = 100
-        mock_image.height = 200
-        mock_image.save = MagicMock()
+        mock_element = MagicMock()
+        mock_element.text = "Sample text"
+        mock_element.bounds = (100, 200, 300, 400)
+        mock_xpath.all = MagicMock(return_value=[mock_element])
+        mock_xpath.get = MagicMock(return_value=mock_element)
 
-        mock_xpath.screenshot = MagicMock(return_value=mock_image)
+        mock_xpath.screenshot = MagicMock(return_value=PILImage.new("RGB", (100, 200)))
         mock_device.xpath = MagicMock(return_value=mock_xpath)
 
         return mock_device
@@ -145,10 +155,39 @@ def mock_device_dependencies(
     state pollution between tests. The mock_u2_device fixture is called for each test,
     ensuring clean state.
     """
-    with patch("u2mcp.tools.device.u2", mock_u2_module), patch("u2mcp.tools.device.adb", mock_adb):
+    from u2mcp.tools.device import _hierarchy_cache, _metadata_cache
+
+    _metadata_cache.clear()
+    _hierarchy_cache.clear()
+    with (
+        patch("u2mcp.tools.device.u2", mock_u2_module),
+        patch("u2mcp.tools.device.adb", mock_adb),
+        patch("u2mcp.tools.scrcpy.adb", mock_adb),
+    ):
         yield
 
 
+@pytest.fixture
+def clean_device_registry():
+    """Start and end the test with no connected devices registered."""
+    from u2mcp.tools.device import _devices
+
+    _devices.clear()
+    yield _devices
+    _devices.clear()
+
+
+@pytest.fixture
+def server_lifespan() -> None:
+    """Run the lifespan of the server again in the next session.
+
+    fastmcp does not reset it after an in-memory session that called a tool, which leaves the background task group closed.
+    """
+    from u2mcp.mcp import mcp
+
+    mcp._lifespan_result_set = False
+
+
 @pytest.fixture
 def mock_context() -> MagicMock:
     """Create a mocked FastMCP context."""
@@ -156,3 +195,47 @@ def mock_context() -> MagicMock:
     mock_context.session = MagicMock()
     mock_context.session.id = "test-session-id"
     return mock_context
+
+
+def _binary_manifest(package_name: str, version_code: int) -> bytes:
+    """A minimal binary AndroidManifest.xml with a <manifest> element declaring package and versionCode."""
+    strings = ["versionCode", "package", "manifest", package_name]
+    offsets, data = [], b""
+    for string in strings:
+        offsets.append(len(data))
+        data += struct.pack("<H", len(string)) + string.encode("utf-16-le") + b"\0\0"
+    data += b"\0" * (-len(data) % 4)
+    header_size = 28
+    pool = struct.pack(
+        "<HHIIIIII",
+        0x0001,
+        header_size,
+        header_size + 4 * len(strings) + len(data),
+        len(strings),
+        0,
+        0,
+        header_size + 4 * len(strings),
+        0,
+    )
+    pool += struct.pack(f"<{len(strings)}I", *offsets) + data
+    resource_map = struct.pack("<HHII", 0x0180, 8, 12, 0x0101021B)
+    attributes = struct.pack("<IIIHBBI", 0xFFFFFFFF, 0, 0xFFFFFFFF, 8, 0, 0x10, version_code)
+    attributes += struct.pack("<IIIHBBI", 0xFFFFFFFF, 1, 3, 8, 0, 0x03, 3)
+    element = struct.pack("<HHIII", 0x0102, 16, 16 + 20 + len(attributes), 1, 0xFFFFFFFF)
+    element += struct.pack("<IIHHHHHH", 0xFFFFFFFF, 2, 20, 20, 2, 0, 0, 0) + attributes
+    body = pool + resource_map + element
+    return struct.pack("<HHI", 0x0003, 8, 8 + len(body)) + body
+
+
+@pytest.fixture
+def make_apk(tmp_path: Path) -> Callable[..., Path]:
+    """Create a fake APK file with the given package name and versionCode."""
+
+    def make(package_name: str = "com.example.app", version_code: int = 1, size: int = 1 << 16) -> Path:
+        path = tmp_path / f"{package_name}-{version_code}.apk"
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("AndroidManifest.xml", _binary_manifest(package_name, version_code))
+            zf.writestr("classes.dex", bytes(range(256)) * (size // 256))
+        return path
+
+    return make
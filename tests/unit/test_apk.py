@@ -0,0 +1,229 @@
+"""
+Unit tests for the APK download cache and manifest reading, against a local HTTP server.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import anyio
+import pytest
+
+from u2mcp import apk
+from u2mcp.apk import fetch_apk, parse_binary_manifest, read_apk_manifest
+
+
+class _ApkServer:
+    def __init__(self) -> None:
+        self.files: dict[str, bytes] = {}
+        self.requests: list[str] = []
+        self.not_modified = 0
+        self.etags = False
+
+
+@pytest.fixture
+def apk_server() -> Iterator[tuple[str, _ApkServer]]:
+    """A local HTTP server serving APK bytes, counting requests."""
+    state = _ApkServer()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            state.requests.append(self.path)
+            if (body := state.files.get(self.path)) is None:
+                self.send_error(404)
+                return
+            etag = f'"{hashlib.sha256(body).hexdigest()}"'
+            if state.etags and self.headers.get("If-None-Match") == etag:
+                state.not_modified += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            if state.etags:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", state
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def apk_cache_dir(tmp_path: Path) -> Iterator[Path]:
+    original = apk.get_apk_cache_dir()
+    apk.set_apk_cache_dir(tmp_path / "cache")
+    yield tmp_path / "cache"
+    apk.set_apk_cache_dir(original)
+
+
+def _read_all(fp) -> bytes:
+    """Read a file object the way adb sync push does."""
+    data = b""
+    while chunk := fp.read(4096):
+        data += chunk
+    fp.close()
+    return data
+
+
+@pytest.mark.unit
+def test_read_apk_manifest(make_apk) -> None:
+    """Test package name and versionCode are read from the binary manifest."""
+    manifest = read_apk_manifest(make_apk("com.example.demo", 1001007))
+    assert (manifest.package_name, manifest.version_code) == ("com.example.demo", 1001007)
+
+    with pytest.raises(ValueError):
+        parse_binary_manifest(b"<manifest/>")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_apk_cache(apk_server, make_apk) -> None:
+    """Test a URL is downloaded once, concurrent fetches share the download, and content is stored by hash."""
+    base_url, state = apk_server
+    body = make_apk(size=1 << 20).read_bytes()
+    state.files["/a.apk"] = state.files["/b.apk"] = body
+    progress: list[tuple[int, int | None]] = []
+
+    async def on_progress(done: int, total: int | None) -> None:
+        progress.append((done, total))
+
+    paths: list[Path] = []
+
+    async def fetch(url: str) -> None:
+        paths.append(await fetch_apk(url, on_progress))
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(4):
+            tg.start_soon(fetch, f"{base_url}/a.apk")
+    await fetch(f"{base_url}/b.apk")
+
+    assert state.requests == ["/a.apk", "/b.apk"]
+    assert len(set(paths)) == 1
+    assert paths[0].read_bytes() == body
+    assert progress[-1] == (len(body), len(body))
+
+    await fetch_apk(f"{base_url}/a.apk", refresh=True)
+    assert state.requests[-1] == "/a.apk" and len(state.requests) == 3
+
+    with pytest.raises(Exception, match="404"):
+        await fetch_apk(f"{base_url}/missing.apk")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_apk_revalidates(apk_server, make_apk, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A cached URL is revalidated once it is no longer fresh, and downloaded again when its content changed."""
+    base_url, state = apk_server
+    state.etags = True
+    url = f"{base_url}/latest.apk"
+    state.files["/latest.apk"] = make_apk(version_code=1).read_bytes()
+
+    first = await fetch_apk(url)
+    assert await fetch_apk(url) == first
+    assert (len(state.requests), state.not_modified) == (1, 0)
+
+    monkeypatch.setattr(apk, "_fresh_seconds", 0)
+    assert await fetch_apk(url) == first
+    assert (len(state.requests), state.not_modified) == (2, 1)
+
+    state.files["/latest.apk"] = make_apk(version_code=2).read_bytes()
+    second = await fetch_apk(url)
+    assert second != first
+    assert read_apk_manifest(second).version_code == 2
+    assert apk._downloads == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_apk_cache_io_off_loop(apk_server, make_apk, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The index and the cached files are read and written in worker threads, not on the event loop."""
+    base_url, state = apk_server
+    state.etags = True
+    state.files["/app.apk"] = make_apk().read_bytes()
+    on_loop: list[str] = []
+
+    def off_loop(func):
+        def wrapper(*args, **kwargs):
+            if threading.current_thread() is threading.main_thread():
+                on_loop.append(func.__name__)
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    for name in ("_read_index", "_write_index", "_touch", "_prune"):
+        monkeypatch.setattr(apk, name, off_loop(getattr(apk, name)))
+
+    url = f"{base_url}/app.apk"
+    await fetch_apk(url)
+    await fetch_apk(url)
+    monkeypatch.setattr(apk, "_fresh_seconds", 0)
+    await fetch_apk(url)
+
+    assert state.not_modified == 1
+    assert on_loop == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fetch_apk_prunes_cache(apk_server, make_apk, apk_cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The least recently used APKs are removed beyond the size limit, with their index entries."""
+    base_url, state = apk_server
+    bodies = [make_apk(version_code=i, size=1 << 16).read_bytes() for i in range(3)]
+    for i, body in enumerate(bodies):
+        state.files[f"/{i}.apk"] = body
+    monkeypatch.setattr(apk, "_max_cache_bytes", 2 * max(len(b) for b in bodies))
+
+    paths = []
+    for i in range(3):
+        paths.append(await fetch_apk(f"{base_url}/{i}.apk"))
+        await anyio.sleep(0.01)
+
+    assert [p.is_file() for p in paths] == [False, True, True]
+    index = json.loads((apk_cache_dir / "index.json").read_text())
+    assert sorted(index) == [f"{base_url}/1.apk", f"{base_url}/2.apk"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_app_install_from_url(apk_server, make_apk, mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test installing from a URL reports download and push progress, and reuses the cached download."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    base_url, state = apk_server
+    state.files["/app.apk"] = make_apk(version_code=7, size=1 << 20).read_bytes()
+    mock_u2_device.adb_device.sync.push.side_effect = lambda fp, dst: len(_read_all(fp))
+    messages: list[str | None] = []
+
+    async def on_progress(progress: float, total: float | None, message: str | None) -> None:
+        messages.append(message)
+
+    async with Client(mcp) as client:
+        for _ in range(2):
+            result = await client.call_tool(
+                "app_install",
+                {"serial": "emulator-5554", "data": f"{base_url}/app.apk", "force": True},
+                progress_handler=on_progress,
+            )
+            assert result.data == {"installed": True, "package_name": "com.example.app", "version_code": 7}
+
+    assert state.requests == ["/app.apk"]
+    assert "Downloading" in messages and "Pushing" in messages
+    assert mock_u2_device.adb_device.install_remote.call_count == 2
@@ -27,9 +27,25 @@ from u2mcp.tools.app import (
 
 @pytest.mark.asyncio
 @pytest.mark.unit
-async def test_app_install(mock_u2_device: MagicMock) -> None:
-    """Test app_install executes without error."""
-    await app_install.fn("emulator-5554", "/path/to/app.apk")
+async def test_app_install(mock_u2_device: MagicMock, clean_device_registry: dict, make_apk) -> None:
+    """Test app_install pushes and installs a local APK, unless the device has the same versionCode."""
+    path = make_apk(version_code=2)
+
+    result = await app_install.fn("emulator-5554", str(path))
+    assert result == {"installed": True, "package_name": "com.example.app", "version_code": 2}
+    mock_u2_device.adb_device.sync.push.assert_called_once()
+    mock_u2_device.adb_device.install_remote.assert_called_once_with("/data/local/tmp/com.example.app.apk", clean=True)
+
+    mock_u2_device.app_info.return_value = {"versionName": "1.1", "versionCode": 2}
+    result = await app_install.fn("emulator-5554", str(path))
+    assert result["installed"] is False
+    assert mock_u2_device.adb_device.install_remote.call_count == 1
+
+    result = await app_install.fn("emulator-5554", str(path), force=True)
+    assert result["installed"] is True
+
+    with pytest.raises(FileNotFoundError):
+        await app_install.fn("emulator-5554", "/path/to/missing.apk")
 
 
 @pytest.mark.asyncio
@@ -55,9 +71,19 @@ async def test_app_start(mock_u2_device: MagicMock) -> None:
 
 @pytest.mark.asyncio
 @pytest.mark.unit
-async def test_app_wait(mock_u2_device: MagicMock) -> None:
+async def test_app_wait(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
     """Test app_wait executes without error."""
-    await app_wait.fn("emulator-5554", "com.example.app", timeout=10.0)
+    await app_wait.fn("emulator-5554", "com.example.app1", timeout=10.0)
+    await app_wait.fn("emulator-5554", "com.example.app", timeout=10.0, front=True)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_app_wait_timeout(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """app_wait fails once the app is still not running at the timeout."""
+    with pytest.raises(RuntimeError, match="Failed to wait"):
+        await app_wait.fn("emulator-5554", "com.example.other", timeout=0.1)
+    mock_u2_device.app_list_running.assert_called()
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,115 @@
+"""
+Unit tests for the run_actions batch tool.
+"""
+
+from __future__ import annotations
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from u2mcp.mcp import mcp
+from u2mcp.tools.batch import _STEPS, run_actions
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_steps_are_tools() -> None:
+    """Test every step is the tool of the same name."""
+    for name, step in _STEPS.items():
+        assert step is await mcp.get_tool(name), name
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_run_actions(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test actions run in order and report a result and timing per step."""
+    result = await run_actions.fn(
+        "emulator-5554",
+        [
+            {"action": "click", "x": 10, "y": 20},
+            {"action": "send_text", "text": "alice", "clear": True},
+            {"action": "element_get_text", "xpath": "//*[@text='Sample text']"},
+            {"action": "delay", "seconds": 0},
+        ],
+    )
+
+    assert result["ok"] is True
+    assert [step["action"] for step in result["steps"]] == ["click", "send_text", "element_get_text", "delay"]
+    assert result["steps"][2]["result"] == "Sample text"
+    assert all(step["elapsed"] >= 0 for step in result["steps"])
+    mock_u2_device.click.assert_called_with(10, 20)
+    mock_u2_device.send_keys.assert_called_with("alice", True)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_run_actions_errors(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test a failed step stops the list unless stop_on_error is off, and invalid specs fail before running."""
+    mock_u2_device.click.side_effect = RuntimeError("boom")
+    mock_u2_device.press.reset_mock()
+    actions = [{"action": "click", "x": 1, "y": 2}, {"action": "press_key", "key": "back"}]
+
+    result = await run_actions.fn("emulator-5554", actions)
+    assert result["ok"] is False
+    assert result["steps"] == [
+        {"index": 0, "action": "click", "ok": False, "error": "RuntimeError: boom", "elapsed": result["steps"][0]["elapsed"]}
+    ]
+    mock_u2_device.press.assert_not_called()
+
+    result = await run_actions.fn("emulator-5554", actions, stop_on_error=False)
+    assert result["ok"] is False
+    assert [step["ok"] for step in result["steps"]] == [False, True]
+    mock_u2_device.press.assert_called_once_with("back")
+
+    mock_u2_device.click.reset_mock()
+    with pytest.raises(ValueError, match="Unsupported action"):
+        await run_actions.fn("emulator-5554", [{"action": "click", "x": 1, "y": 2}, {"action": "explode"}])
+    with pytest.raises(ValueError, match="Invalid arguments"):
+        await run_actions.fn("emulator-5554", [{"action": "click", "x": 1}])
+    mock_u2_device.click.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_run_actions_cancel_wait(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test a list waiting for an element is cancelled at once, releases the device and drops stale metadata."""
+    import anyio
+
+    from u2mcp.tools.device import _metadata_cache, get_device
+
+    mock_u2_device.xpath.return_value.exists = False
+    _metadata_cache["emulator-5554"] = {"info": (float("inf"), {})}
+    actions = [{"action": "press_key", "key": "home"}, {"action": "element_wait", "xpath": "//*", "timeout": 60}]
+
+    with anyio.fail_after(2):
+        with anyio.move_on_after(0.3):
+            await run_actions.fn("emulator-5554", actions)
+        async with get_device("emulator-5554"):
+            pass
+
+    assert "emulator-5554" not in _metadata_cache
+    assert mock_u2_device.xpath.call_count >= 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_run_actions_middleware(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test each action goes through the middleware of the server, as a call of its own tool."""
+    from fastmcp.server.middleware import Middleware
+
+    calls: list[tuple[str, dict]] = []
+
+    class Spy(Middleware):
+        async def on_call_tool(self, context, call_next):
+            calls.append((context.message.name, dict(context.message.arguments or {})))
+            return await call_next(context)
+
+    mcp.middleware.append(Spy())
+    try:
+        result = await run_actions.fn("emulator-5554", [{"action": "click", "x": 1, "y": 2}, {"action": "delay", "seconds": 0}])
+    finally:
+        mcp.middleware.pop()
+
+    assert result["ok"] is True
+    assert calls == [("click", {"serial": "emulator-5554", "x": 1, "y": 2}), ("delay", {"seconds": 0})]
@@ -0,0 +1,129 @@
+"""
+Unit tests for the benchmark suite and its fake devices.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from u2mcp.bench import FakeBackend, FakeDeviceOptions, run_bench
+from u2mcp.bench.fake import PACKAGE, synthetic_hierarchy
+
+# Fast fake devices, to time the server only
+_OPTIONS = FakeDeviceOptions(latency=0, jitter=0, screen=(360, 800), hierarchy_nodes=30)
+
+
+@pytest.fixture
+def fake_backend(monkeypatch: pytest.MonkeyPatch, clean_device_registry: dict) -> FakeBackend:
+    """The tools connected to fake devices."""
+    from u2mcp.tools import device, fanout
+
+    backend = FakeBackend(_OPTIONS, ["bench-test-0", "bench-test-1"])
+    monkeypatch.setattr(device, "u2", backend)
+    monkeypatch.setattr(device, "adb", backend)
+    monkeypatch.setattr(fanout, "adb", backend)
+    return backend
+
+
+@pytest.mark.unit
+def test_synthetic_hierarchy() -> None:
+    """The synthetic hierarchy has about the requested number of nodes, with numbered items."""
+    xml = synthetic_hierarchy(300)
+    assert 290 <= xml.count("<node") <= 300
+    assert f'resource-id="{PACKAGE}:id/item_1"' in xml
+    assert 'text="Item 1"' in xml
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_fake_device_tools(fake_backend: FakeBackend) -> None:
+    """Tools work against fake devices, element tools parsing their hierarchy with the real xpath engine."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    async with Client(mcp) as client:
+        devices = await client.call_tool("device_list", {})
+        text = await client.call_tool(
+            "element_get_text", {"serial": "bench-test-0", "xpath": f"//*[@resource-id='{PACKAGE}:id/item_2']"}
+        )
+        clicked = await client.call_tool("element_click", {"serial": "bench-test-1", "xpath": "//*[@text='Item 3']"})
+        size = await client.call_tool("window_size", {"serial": "bench-test-0"})
+        current = await client.call_tool("app_current", {"serial": "bench-test-0"})
+
+    assert [d["serial"] for d in devices.structured_content["result"]] == ["bench-test-0", "bench-test-1"]
+    assert text.data == "Item 2"
+    assert clicked.data is True
+    assert size.structured_content == {"width": 360, "height": 800}
+    assert current.structured_content["package"] == PACKAGE
+
+
+@pytest.mark.unit
+def test_recorded_payloads(tmp_path: Path) -> None:
+    """Recorded screenshots and hierarchies are replayed as they are."""
+    from PIL import Image as PILImage
+
+    screenshot = tmp_path / "screen.png"
+    PILImage.new("RGB", (200, 100), (1, 2, 3)).save(screenshot)
+    hierarchy = tmp_path / "hierarchy.xml"
+    hierarchy.write_text("<hierarchy><node text='recorded' /></hierarchy>")
+
+    device = FakeBackend(FakeDeviceOptions(latency=0, jitter=0, screenshot=str(screenshot), hierarchy=str(hierarchy))).connect()
+
+    assert device.screenshot().size == (200, 100)
+    assert device.dump_hierarchy() == hierarchy.read_text()
+
+
+@pytest.mark.asyncio
+@pytest.mark.slow
+async def test_run_bench_http() -> None:
+    """A benchmark over HTTP times every call, with the memory of the server process."""
+    results = await run_bench(["http"], ["action", "element"], calls=12, concurrency=3, devices=2, options=_OPTIONS)
+
+    assert [(r.transport, r.family) for r in results] == [("http", "action"), ("http", "element")]
+    for result in results:
+        assert result.calls == 12 and result.errors == 0
+        assert 0 < result.p50 <= result.p95 <= result.p99
+        assert result.throughput > 0
+        assert result.peak_rss is None or result.peak_rss > 0
+
+
+@pytest.mark.slow
+def test_bench_command(tmp_path: Path) -> None:
+    """`u2mcp bench` prints a row per family and writes the results as JSON."""
+    from typer.testing import CliRunner
+
+    from u2mcp.__main__ import cli
+
+    path = tmp_path / "bench.json"
+    result = CliRunner().invoke(
+        cli,
+        ["bench", "--transport", "stdio", "--families", "device,batch", "-n", "6", "--latency", "0", "--jitter", "0"]
+        + ["--screen", "360x800", "--json", str(path)],
+        env={"COLUMNS": "200"},
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "device" in result.output and "batch" in result.output
+    report = json.loads(path.read_text())
+    assert [(r["transport"], r["family"], r["errors"]) for r in report["results"]] == [
+        ("stdio", "device", 0),
+        ("stdio", "batch", 0),
+    ]
+    assert report["options"]["screen"] == [360, 800]
+
+
+@pytest.mark.unit
+def test_bench_command_unknown_family() -> None:
+    """Unknown tool families are rejected before starting any server."""
+    from typer.testing import CliRunner
+
+    from u2mcp.__main__ import cli
+
+    result = CliRunner().invoke(cli, ["bench", "--families", "action,nope"])
+
+    assert result.exit_code != 0
+    assert "nope" in result.output
@@ -0,0 +1,88 @@
+"""
+Unit tests for the cached tool catalog.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from u2mcp import catalog
+from u2mcp.catalog import build_catalog, catalog_tags, get_catalog_path, load_catalog, read_catalog, set_catalog_path
+
+
+@pytest.fixture
+def catalog_path(tmp_path: Path) -> Iterator[Path]:
+    """An empty catalog cache."""
+    previous = get_catalog_path()
+    path = tmp_path / "cache" / "tool-catalog.json"
+    set_catalog_path(path)
+    yield path
+    set_catalog_path(previous)
+
+
+@pytest.mark.unit
+def test_build_catalog() -> None:
+    """Each tool has its tags, its parsed docstring and its help in markdown."""
+    from u2mcp.mcp import mcp
+
+    tools = build_catalog(mcp)["tools"]
+
+    screenshot = tools["screenshot"]
+    assert screenshot["tags"] == ["device:capture", "screen:capture"]
+    assert screenshot["summary"] == "Take screenshot of device"
+    assert [p["name"] for p in screenshot["params"]][:2] == ["serial", "display_id"]
+    assert screenshot["returns"]["type"] == "dict[str,Any]"
+    assert "serial" in screenshot["parameters"]["properties"]
+    assert screenshot["markdown"].startswith("**Tags:** device:capture, screen:capture")
+    assert "device:shell" in catalog_tags({"tools": tools})
+
+
+@pytest.mark.unit
+def test_load_catalog_caches(catalog_path: Path) -> None:
+    """The catalog is built once, then read from the cache until the version changes."""
+    from u2mcp.mcp import mcp
+
+    built = load_catalog(mcp)
+    assert catalog_path.exists()
+    assert read_catalog() == built
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(catalog, "__version__", "99.0")
+        assert read_catalog() is None
+
+
+@pytest.mark.unit
+def test_unwritable_cache(tmp_path: Path) -> None:
+    """A cache that cannot be written is not an error."""
+    from u2mcp.mcp import mcp
+
+    previous = get_catalog_path()
+    (tmp_path / "file").write_text("")
+    set_catalog_path(tmp_path / "file" / "tool-catalog.json")
+    try:
+        assert "click" in load_catalog(mcp)["tools"]
+        assert read_catalog() is None
+    finally:
+        set_catalog_path(previous)
+
+
+@pytest.mark.slow
+def test_info_command_reads_cache(tmp_path: Path) -> None:
+    """Once the catalog is cached, `u2mcp info` does not import the server."""
+    env = dict(os.environ, XDG_CACHE_HOME=str(tmp_path), COLUMNS="200")
+    command = [sys.executable, "-X", "importtime", "-m", "u2mcp", "info", "device:*"]
+
+    first = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+    second = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+
+    assert (tmp_path / "u2mcp" / "tool-catalog.json").exists()
+    assert "fastmcp" in first.stderr
+    assert "fastmcp" not in second.stderr
+    assert second.stdout == first.stdout
+    assert "shell_command" in second.stdout
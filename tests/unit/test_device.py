@@ -102,3 +102,364 @@ async def test_disconnect_all(mock_u2_device: MagicMock) -> None:
     result = await disconnect_all.fn()
     # Just ensure no exception raised
     assert result is None or isinstance(result, str)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_get_device_shares_inflight_connection(mock_u2_module: MagicMock, clean_device_registry: dict) -> None:
+    """Test concurrent first calls for the same serial share one connection."""
+    import time
+
+    import anyio
+
+    from u2mcp.tools.device import get_device
+
+    def slow_connect(serial: str) -> MagicMock:
+        time.sleep(0.1)
+        device = MagicMock()
+        device.serial = serial
+        return device
+
+    mock_u2_module.connect.side_effect = slow_connect
+    devices: list[MagicMock] = []
+
+    async def use_device():
+        async with get_device("emulator-5554") as device:
+            devices.append(device)
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(5):
+            tg.start_soon(use_device)
+
+    assert mock_u2_module.connect.call_count == 1
+    assert len(devices) == 5
+    assert all(d is devices[0] for d in devices)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_get_device_connection_error_is_not_cached(
+    mock_u2_module: MagicMock, mock_u2_device: MagicMock, clean_device_registry: dict
+) -> None:
+    """Test a failed connection is reported to the caller and retried by the next call."""
+    from u2mcp.tools.device import get_device
+
+    mock_u2_module.connect.side_effect = [ConnectionError("offline"), mock_u2_device]
+
+    with pytest.raises(ConnectionError):
+        async with get_device("emulator-5554"):
+            pass
+    assert "emulator-5554" not in clean_device_registry
+
+    async with get_device("emulator-5554") as device:
+        assert device is mock_u2_device
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_get_device_inflight_cancel_and_error(
+    mock_u2_module: MagicMock, clean_device_registry: dict, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test waiters connect again when the caller connecting is cancelled, and each gets its own copy of an error."""
+    import anyio
+
+    from u2mcp.tools.device import connection_states, get_device
+
+    attempts = 0
+
+    async def slow_run_sync(func, *args, **kwargs) -> MagicMock:
+        # A connection that can be cancelled while in flight, as when queued on the worker limits
+        nonlocal attempts
+        attempts += 1
+        await anyio.sleep(0.1)
+        return func(*args)
+
+    monkeypatch.setattr("u2mcp.tools.device.run_sync", slow_run_sync)
+    devices: list[MagicMock] = []
+    errors: list[Exception] = []
+
+    async def use_device(cancel_after: float | None = None):
+        with anyio.move_on_after(cancel_after):
+            try:
+                async with get_device("emulator-5554") as device:
+                    devices.append(device)
+            except ConnectionError as e:
+                errors.append(e)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(use_device, 0.05)
+        await anyio.sleep(0.01)
+        assert connection_states() == {"emulator-5554": "connecting"}
+        for _ in range(3):
+            tg.start_soon(use_device)
+
+    # The cancelled connection is tried again once, for all the waiters
+    assert attempts == 2
+    assert len(devices) == 3
+    assert connection_states() == {"emulator-5554": "connected"}
+
+    clean_device_registry.clear()
+    original = ConnectionError("offline")
+    mock_u2_module.connect.side_effect = original
+    async with anyio.create_task_group() as tg:
+        for _ in range(3):
+            tg.start_soon(use_device)
+
+    assert len(errors) == 3
+    assert len({id(e) for e in errors}) == 3
+    assert all(e is original or e.__cause__ is original for e in errors)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_read_write_lock() -> None:
+    """Test readers share the lock, while a writer excludes readers and other writers."""
+    import anyio
+
+    from u2mcp.tools.device import ReadWriteLock
+
+    lock = ReadWriteLock()
+    events: list[str] = []
+
+    async def reader(name: str):
+        async with lock.read():
+            events.append(f"{name}+")
+            await anyio.sleep(0.05)
+            events.append(f"{name}-")
+
+    async def writer(name: str):
+        async with lock.write():
+            events.append(f"{name}+")
+            await anyio.sleep(0.05)
+            events.append(f"{name}-")
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(reader, "r1")
+        tg.start_soon(reader, "r2")
+        await anyio.sleep(0.01)
+        tg.start_soon(writer, "w1")
+        await anyio.sleep(0.01)
+        # Queues behind the waiting writer
+        tg.start_soon(reader, "r3")
+
+    assert events[:2] == ["r1+", "r2+"]
+    assert events[4:] == ["w1+", "w1-", "r3+", "r3-"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_read_only_tools_do_not_queue_behind_each_other(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test read-only tools called through the server share the device lock."""
+    import time
+
+    import anyio
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+    from u2mcp.tools.device import lock_wait_stats
+
+    def slow_window_size():
+        time.sleep(0.2)
+        return 1080, 2400
+
+    mock_u2_device.window_size.side_effect = slow_window_size
+    await lock_wait_stats.fn(reset=True)
+
+    async with Client(mcp) as client:
+        started = time.perf_counter()
+        async with anyio.create_task_group() as tg:
+            for _ in range(3):
+                tg.start_soon(client.call_tool, "window_size", {"serial": "emulator-5554"})
+        elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.5
+    stats = await lock_wait_stats.fn(reset=True)
+    assert stats["window_size"]["calls"] == 3
+    assert stats["window_size"]["shared"] is True
+    assert stats["window_size"]["max"] < 0.1
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_window_size_is_cached(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test window_size reads the device once until fresh is requested."""
+    assert await window_size.fn("emulator-5554") == {"width": 1080, "height": 2400}
+    assert await window_size.fn("emulator-5554") == {"width": 1080, "height": 2400}
+    assert mock_u2_device.window_size.call_count == 1
+
+    await window_size.fn("emulator-5554", fresh=True)
+    assert mock_u2_device.window_size.call_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_window_size_cache_invalidation(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test key presses and rotation drop the cached window size."""
+    from u2mcp.tools.action import press_key
+
+    await window_size.fn("emulator-5554")
+    await press_key.fn("emulator-5554", "home")
+    await window_size.fn("emulator-5554")
+    assert mock_u2_device.window_size.call_count == 2
+
+    mock_u2_device.info = {"displayRotation": 0}
+    await info.fn("emulator-5554", fresh=True)
+    mock_u2_device.info = {"displayRotation": 1}
+    mock_u2_device.window_size.return_value = (2400, 1080)
+    await info.fn("emulator-5554", fresh=True)
+    assert await window_size.fn("emulator-5554") == {"width": 2400, "height": 1080}
+    assert mock_u2_device.window_size.call_count == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_connect_probes_cached_device(
+    mock_u2_module: MagicMock, mock_u2_device: MagicMock, clean_device_registry: dict
+) -> None:
+    """Test connect checks the device is alive even with cached information, and forgets it once gone."""
+    from unittest.mock import PropertyMock
+
+    from u2mcp.tools.device import _metadata_cache
+
+    mock_u2_module.ConnectError = type("ConnectError", (Exception,), {})
+    await connect.fn("emulator-5554")
+    type(mock_u2_device).info = PropertyMock(side_effect=mock_u2_module.ConnectError("gone"))
+    try:
+        with pytest.raises(mock_u2_module.ConnectError):
+            await connect.fn("emulator-5554")
+    finally:
+        del type(mock_u2_device).info
+
+    assert clean_device_registry == {}
+    assert "emulator-5554" not in _metadata_cache
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_metadata_invalidated_while_fetching(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test metadata fetched while the cache of the device is dropped is not cached."""
+    from u2mcp.tools.device import invalidate_metadata
+
+    def disconnected_while_reading():
+        invalidate_metadata("emulator-5554")
+        return 1080, 2400
+
+    mock_u2_device.window_size.side_effect = disconnected_while_reading
+    await window_size.fn("emulator-5554")
+    await window_size.fn("emulator-5554")
+    assert mock_u2_device.window_size.call_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_window_size_after_app_start(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test an app rotating the screen is seen by window_size right after app_start."""
+    from u2mcp.tools.app import app_start
+
+    mock_u2_device.window_size.return_value = (1080, 2400)
+    assert await window_size.fn("emulator-5554") == {"width": 1080, "height": 2400}
+
+    # The app opens in landscape
+    mock_u2_device.app_start.side_effect = lambda *args, **kwargs: setattr(
+        mock_u2_device.window_size, "return_value", (2400, 1080)
+    )
+    await app_start.fn("emulator-5554", "com.example.game")
+
+    assert await window_size.fn("emulator-5554") == {"width": 2400, "height": 1080}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_metadata_cache_disabled(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test a TTL of 0 reads the device on every call."""
+    from u2mcp.tools.device import _metadata_cache_ttl, set_metadata_cache_ttl
+
+    set_metadata_cache_ttl(0)
+    try:
+        await window_size.fn("emulator-5554")
+        await window_size.fn("emulator-5554")
+    finally:
+        set_metadata_cache_ttl(_metadata_cache_ttl)
+    assert mock_u2_device.window_size.call_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_screenshot(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test screenshot returns a downscaled image in the requested format."""
+    from u2mcp.tools.device import screenshot
+
+    result = await screenshot.fn("emulator-5554", format="webp", max_width=540)
+
+    assert result["image"].startswith("data:image/webp;base64,")
+    assert (result["width"], result["height"]) == (540, 1200)
+    assert (result["original_width"], result["original_height"]) == (1080, 2400)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_screenshot_if_changed_since(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test polling an unchanged screen returns no image data."""
+    from u2mcp.tools.device import screenshot
+
+    first = await screenshot.fn("emulator-5554", max_width=540)
+    second = await screenshot.fn("emulator-5554", max_width=540, if_changed_since=first["token"])
+
+    assert second == {"changed": False, "token": first["token"]}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_dump_hierarchy_compact(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test dump_hierarchy renders the pruned tree in json and text formats."""
+    import json
+
+    from u2mcp.tools.device import dump_hierarchy
+
+    mock_u2_device.dump_hierarchy.return_value = (
+        '<hierarchy><node class="android.widget.FrameLayout" bounds="[0,0][1080,2400]">'
+        '<node class="android.widget.Button" text="OK" clickable="true" bounds="[0,0][100,50]" />'
+        "</node></hierarchy>"
+    )
+
+    result = json.loads(await dump_hierarchy.fn("emulator-5554", format="json"))
+    assert result == {
+        "nodes": [{"class": "android.widget.Button", "text": "OK", "bounds": [0, 0, 100, 50], "clickable": True}],
+        "truncated": False,
+    }
+    assert await dump_hierarchy.fn("emulator-5554", format="text") == 'android.widget.Button "OK" [0,0,100,50] clickable'
+    with pytest.raises(ValueError):
+        await dump_hierarchy.fn("emulator-5554", format="yaml")  # type: ignore[arg-type]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_dump_hierarchy_diff(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test dump_hierarchy_diff returns the full tree first, then diffs against the last or a given dump."""
+    from u2mcp.tools.device import dump_hierarchy_diff
+
+    def hierarchy(text: str) -> str:
+        return (
+            f'<hierarchy><node class="android.widget.TextView" resource-id="app:id/title" text="{text}" '
+            'bounds="[0,0][100,50]" /></hierarchy>'
+        )
+
+    mock_u2_device.dump_hierarchy.return_value = hierarchy("One")
+    first = await dump_hierarchy_diff.fn("emulator-5554")
+    assert first["since"] is None
+    assert first["nodes"][0]["text"] == "One"
+
+    unchanged = await dump_hierarchy_diff.fn("emulator-5554")
+    assert unchanged == {"token": first["token"], "since": first["token"], "added": [], "removed": [], "changed": []}
+
+    mock_u2_device.dump_hierarchy.return_value = hierarchy("Two")
+    second = await dump_hierarchy_diff.fn("emulator-5554")
+    assert second["since"] == first["token"]
+    assert second["changed"][0]["changes"] == {"text": ["One", "Two"]}
+
+    mock_u2_device.dump_hierarchy.return_value = hierarchy("Three")
+    third = await dump_hierarchy_diff.fn("emulator-5554", since=first["token"])
+    assert third["changed"][0]["changes"] == {"text": ["One", "Three"]}
+
+    unknown = await dump_hierarchy_diff.fn("emulator-5554", since="unknown")
+    assert unknown["since"] is None and unknown["token"] == third["token"]
@@ -0,0 +1,127 @@
+"""
+Unit tests for the device watcher, fed by a fake adb device tracking stream.
+"""
+
+from __future__ import annotations
+
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from functools import partial
+from unittest.mock import MagicMock
+
+import anyio
+import pytest
+from anyio.abc import ByteReceiveStream
+
+from u2mcp import devicewatch
+from u2mcp.devicewatch import parse_devices
+
+
+def _block(text: str) -> bytes:
+    data = text.encode()
+    return f"{len(data):04x}".encode() + data
+
+
+@pytest.mark.unit
+def test_parse_devices() -> None:
+    """Both list formats are parsed, with the properties of the long one and states with spaces."""
+    devices = parse_devices(
+        "emulator-5554          device product:sdk_gphone64 model:Pixel_7 device:emu64xa transport_id:1\n"
+        "R58M123\tunauthorized usb:1-1 transport_id:2\n"
+        "0123456789ABCDEF       no permissions (missing udev rules?) usb:3-2\n"
+        "192.168.1.5:5555\toffline\n"
+    )
+
+    assert {serial: device.state for serial, device in devices.items()} == {
+        "emulator-5554": "device",
+        "R58M123": "unauthorized",
+        "0123456789ABCDEF": "no permissions (missing udev rules?)",
+        "192.168.1.5:5555": "offline",
+    }
+    assert devices["emulator-5554"].properties["model"] == "Pixel_7"
+    assert devices["emulator-5554"].info() == {"serialno": "emulator-5554", "devpath": "unknown", "state": "device"}
+    assert devices["R58M123"].devpath == "usb:1-1"
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_device_watcher(
+    mock_u2_module: MagicMock, mock_adb: MagicMock, clean_device_registry: dict, server_lifespan: None
+) -> None:
+    """Attached devices are connected ahead of use and listed from memory, detached ones are dropped at once."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+    from u2mcp.tools.device import run_device_watcher
+
+    mock_u2_module.ConnectError = type("ConnectError", (Exception,), {})
+    send, receive = anyio.create_memory_object_stream[bytes](10)
+
+    @asynccontextmanager
+    async def source() -> AsyncGenerator[ByteReceiveStream]:
+        yield receive  # type: ignore[misc]
+
+    previous_source = devicewatch.get_device_source()
+    devicewatch.set_device_source(source)
+    try:
+        async with anyio.create_task_group() as tg, Client(mcp) as client:
+            watcher = await tg.start(partial(run_device_watcher, prewarm=True))
+            await send.send(_block("emulator-5554\tdevice model:Pixel_7\nR58M123\tunauthorized usb:1-1\n"))
+            with anyio.fail_after(5):
+                while "emulator-5554" not in clean_device_registry:
+                    await anyio.sleep(0.01)
+            listed = await client.call_tool("device_list", {})
+            unauthorized = await client.call_tool("window_size", {"serial": "R58M123"}, raise_on_error=False)
+
+            await send.send(_block(""))
+            with anyio.fail_after(5):
+                while watcher.get("emulator-5554").state != "absent":
+                    await anyio.sleep(0.01)
+            detached = await client.call_tool("window_size", {"serial": "emulator-5554"}, raise_on_error=False)
+            watcher.stop()
+    finally:
+        devicewatch.set_device_source(previous_source)
+
+    assert listed.structured_content["result"] == [{"serialno": "emulator-5554", "devpath": "unknown", "state": "device"}]
+    mock_adb.device_list.assert_not_called()
+    mock_u2_module.connect.assert_called_once_with("emulator-5554")
+    assert unauthorized.is_error
+    assert "R58M123 is unauthorized" in unauthorized.content[0].text
+    assert clean_device_registry == {}
+    assert detached.is_error
+    assert "emulator-5554 is absent" in detached.content[0].text
+    assert devicewatch.get_device_watcher() is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_prewarm_failure(mock_u2_module: MagicMock, clean_device_registry: dict) -> None:
+    """A device that cannot be connected to in advance is logged and skipped, and the watcher keeps running."""
+    from u2mcp.tools.device import run_device_watcher
+
+    mock_u2_module.connect.side_effect = type("AccessibilityServiceAlreadyRegisteredError", (Exception,), {})
+    send, receive = anyio.create_memory_object_stream[bytes](10)
+
+    @asynccontextmanager
+    async def source() -> AsyncGenerator[ByteReceiveStream]:
+        yield receive  # type: ignore[misc]
+
+    previous_source = devicewatch.get_device_source()
+    devicewatch.set_device_source(source)
+    try:
+        async with anyio.create_task_group() as tg:
+            watcher = await tg.start(partial(run_device_watcher, prewarm=True))
+            await send.send(_block("emulator-5554\tdevice\n"))
+            with anyio.fail_after(5):
+                while not mock_u2_module.connect.called:
+                    await anyio.sleep(0.01)
+            await send.send(_block("emulator-5554\tdevice\nemulator-5556\tdevice\n"))
+            with anyio.fail_after(5):
+                while mock_u2_module.connect.call_count < 2:
+                    await anyio.sleep(0.01)
+            assert watcher.synced
+            watcher.stop()
+    finally:
+        devicewatch.set_device_source(previous_source)
+
+    assert clean_device_registry == {}
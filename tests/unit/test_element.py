@@ -4,7 +4,8 @@ Unit tests for element interaction tools.
 
 from __future__ import annotations
 
-from unittest.mock import MagicMock
+import time
+from unittest.mock import MagicMock, PropertyMock
 
 import pytest
 
@@ -28,9 +29,11 @@ from u2mcp.tools.element import (
 
 @pytest.mark.asyncio
 @pytest.mark.unit
-async def test_activity_wait(mock_u2_device: MagicMock) -> None:
+async def test_activity_wait(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
     """Test activity_wait executes without error."""
-    await activity_wait.fn("emulator-5554", ".MainActivity")
+    mock_u2_device.app_current.return_value = {"package": "com.example.app", "activity": ".MainActivity"}
+    assert await activity_wait.fn("emulator-5554", ".MainActivity") is True
+    assert await activity_wait.fn("emulator-5554", ".OtherActivity", timeout=0.1) is False
 
 
 @pytest.mark.asyncio
@@ -42,9 +45,10 @@ async def test_element_wait(mock_u2_device: MagicMock) -> None:
 
 @pytest.mark.asyncio
 @pytest.mark.unit
-async def test_element_wait_gone(mock_u2_device: MagicMock) -> None:
+async def test_element_wait_gone(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
     """Test element_wait_gone executes without error."""
-    await element_wait_gone.fn("emulator-5554", "//node[@text='Loading']")
+    mock_u2_device.xpath.return_value.exists = False
+    assert await element_wait_gone.fn("emulator-5554", "//node[@text='Loading']") is True
 
 
 @pytest.mark.asyncio
@@ -63,9 +67,24 @@ async def test_element_click_nowait(mock_u2_device: MagicMock) -> None:
 
 @pytest.mark.asyncio
 @pytest.mark.unit
-async def test_element_click_until_gone(mock_u2_device: MagicMock) -> None:
-    """Test element_click_until_gone executes without error."""
-    await element_click_until_gone.fn("emulator-5554", "//node[@text='Close']")
+async def test_element_click_until_gone(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test element_click_until_gone clicks until the element is gone."""
+    mock_xpath = mock_u2_device.xpath.return_value
+    element = mock_xpath.all.return_value[0]
+    type(mock_xpath).exists = PropertyMock(side_effect=[True, False])
+
+    assert await element_click_until_gone.fn("emulator-5554", "//node[@text='Close']", interval=0.01) is True
+    assert element.click.call_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_element_click_until_gone_gives_up(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """element_click_until_gone clicks maxretry + 1 times, then reports the element is still there."""
+    element = mock_u2_device.xpath.return_value.all.return_value[0]
+
+    assert await element_click_until_gone.fn("emulator-5554", "//node[@text='Close']", maxretry=2, interval=0.01) is False
+    assert element.click.call_count == 3
 
 
 @pytest.mark.asyncio
@@ -122,3 +141,187 @@ async def test_element_scroll(mock_u2_device: MagicMock) -> None:
 async def test_element_scroll_to(mock_u2_device: MagicMock) -> None:
     """Test element_scroll_to executes without error."""
     await element_scroll_to.fn("emulator-5554", "//node[@text='Target']")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_element_queries_share_hierarchy_snapshot(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test read-only element queries reuse one hierarchy dump until a tool touches the screen."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    async with Client(mcp) as client:
+        for name in ("element_get_text", "element_bounds", "element_get_text"):
+            await client.call_tool(name, {"serial": "emulator-5554", "xpath": "//node[@text='Hello']"})
+        assert mock_u2_device.dump_hierarchy.call_count == 1
+
+        await client.call_tool("click", {"serial": "emulator-5554", "x": 1, "y": 2})
+        result = await client.call_tool("element_get_text", {"serial": "emulator-5554", "xpath": "//node[@text='Hello']"})
+        assert mock_u2_device.dump_hierarchy.call_count == 2
+
+    assert result.data == "Sample text"
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_dump_hierarchy_bypasses_snapshot(
+    mock_u2_device: MagicMock, clean_device_registry: dict, server_lifespan: None
+) -> None:
+    """Test dump_hierarchy always dumps the live screen, and element queries reuse its dump."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    mock_u2_device.dump_hierarchy.reset_mock()
+    arguments = {"serial": "emulator-5554", "xpath": "//node[@text='Hello']"}
+    async with Client(mcp) as client:
+        await client.call_tool("element_get_text", arguments)
+        await client.call_tool("dump_hierarchy", {"serial": "emulator-5554"})
+        assert mock_u2_device.dump_hierarchy.call_count == 2
+
+        await client.call_tool("element_bounds", arguments)
+        assert mock_u2_device.dump_hierarchy.call_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_element_get_text_falls_back_to_live_screen(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test an element missing from the snapshot is waited for on the live screen, without holding the device."""
+    import anyio
+    from uiautomator2.exceptions import XPathElementNotFoundError
+
+    from u2mcp.tools.action import click
+
+    mock_xpath = mock_u2_device.xpath.return_value
+    mock_xpath.all.side_effect = [[], [], [], [MagicMock(text="Sample text")]]
+    clicked: list[float] = []
+
+    async def click_meanwhile() -> None:
+        await anyio.sleep(0.1)
+        started = time.perf_counter()
+        await click.fn("emulator-5554", 10, 10)
+        clicked.append(time.perf_counter() - started)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(click_meanwhile)
+        result = await element_get_text.fn("emulator-5554", "//node[@text='Hello']")
+
+    assert result == "Sample text"
+    assert clicked[0] < 0.15
+    mock_xpath.get_text.assert_not_called()
+
+    mock_xpath.all.side_effect = None
+    mock_xpath.all.return_value = []
+    mock_u2_device.wait_timeout = 0.3
+    with pytest.raises(XPathElementNotFoundError):
+        await element_bounds.fn("emulator-5554", "//node[@text='Never']")
+
+
+HIERARCHY = """<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>
+<hierarchy rotation="0">
+  <node index="0" text="" resource-id="" class="android.widget.FrameLayout" package="com.example" content-desc=""
+        checkable="false" checked="false" clickable="false" enabled="true" bounds="[0,0][1080,2400]">
+    <node index="0" text="Username" resource-id="com.example:id/username" class="android.widget.EditText"
+          package="com.example" content-desc="" checkable="false" checked="false" clickable="true" enabled="true"
+          bounds="[40,200][1040,320]" />
+    <node index="1" text="Remember me" resource-id="com.example:id/remember" class="android.widget.CheckBox"
+          package="com.example" content-desc="" checkable="true" checked="true" clickable="true" enabled="false"
+          bounds="[40,400][540,480]" />
+  </node>
+</hierarchy>
+"""
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_element_query_many(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Test many xpaths are answered in input order from a single hierarchy dump."""
+    from uiautomator2.xpath import XPathEntry
+
+    from u2mcp.tools.element import element_query_many
+
+    mock_u2_device.dump_hierarchy.return_value = HIERARCHY
+    mock_u2_device.xpath = XPathEntry(mock_u2_device)
+
+    result = await element_query_many.fn(
+        "emulator-5554",
+        ["@com.example:id/remember", "//*[@text='Missing']", "Username", "//*[", "//android.widget.EditText"],
+        ["text", "bounds", "checked", "enabled", "class"],
+    )
+
+    assert result[0] == {
+        "xpath": "@com.example:id/remember",
+        "found": True,
+        "count": 1,
+        "text": "Remember me",
+        "bounds": [40, 400, 540, 480],
+        "checked": True,
+        "enabled": False,
+        "class": "android.widget.CheckBox",
+    }
+    assert result[1] == {"xpath": "//*[@text='Missing']", "found": False}
+    assert result[2]["found"] is True and result[2]["bounds"] == [40, 200, 1040, 320]
+    assert result[3]["found"] is False and "error" in result[3]
+    assert result[4]["found"] is True and result[4]["text"] == "Username"
+    mock_u2_device.dump_hierarchy.assert_called_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_element_wait_releases_device_between_polls(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Other tools take the device while element_wait is waiting, instead of queuing behind its timeout."""
+    import anyio
+
+    from u2mcp.tools.action import click
+
+    mock_u2_device.xpath.return_value.exists = False
+    waited: list[float] = []
+
+    async def wait() -> None:
+        started = time.perf_counter()
+        assert await element_wait.fn("emulator-5554", "//node[@text='Never']", timeout=1.0) is False
+        waited.append(time.perf_counter() - started)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(wait)
+        await anyio.sleep(0.1)
+        started = time.perf_counter()
+        await click.fn("emulator-5554", 10, 10)
+        clicked = time.perf_counter() - started
+
+    assert clicked < 0.5
+    assert waited[0] >= 1.0
+    mock_u2_device.click.assert_called_once_with(10, 10)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_element_wait_cancelled(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """A cancelled element_wait returns at once and leaves the device free."""
+    import anyio
+
+    from u2mcp.tools.device import get_device
+
+    mock_u2_device.xpath.return_value.exists = False
+
+    started = time.perf_counter()
+    with anyio.move_on_after(0.3):
+        await element_wait.fn("emulator-5554", "//node[@text='Never']", timeout=30.0)
+    assert time.perf_counter() - started < 1.0
+
+    with anyio.fail_after(0.1):
+        async with get_device("emulator-5554"):
+            pass
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_element_wait_default_timeout(mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Without a timeout, element waits use the wait_timeout setting of the device."""
+    mock_u2_device.xpath.return_value.exists = False
+    mock_u2_device.wait_timeout = 0.3
+
+    started = time.perf_counter()
+    assert await element_wait.fn("emulator-5554", "//node[@text='Never']") is False
+    assert 0.3 <= time.perf_counter() - started < 1.0
@@ -0,0 +1,208 @@
+"""
+Unit tests for the device_fanout tool.
+"""
+
+from __future__ import annotations
+
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from u2mcp.tools.fanout import device_fanout
+
+SERIALS = [f"emulator-{5554 + 2 * i}" for i in range(6)]
+
+
+def _make_devices(mock_u2_module: MagicMock, latency: float = 0.0) -> dict[str, MagicMock]:
+    devices: dict[str, MagicMock] = {}
+
+    def connect(serial: str) -> MagicMock:
+        device = devices[serial] = MagicMock()
+        device.serial = serial
+        device.app_info.return_value = {"versionCode": int(serial.split("-")[1])}
+        device.app_start.side_effect = lambda *args: time.sleep(latency)
+        return device
+
+    mock_u2_module.connect.side_effect = connect
+    return devices
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_device_fanout(mock_u2_module: MagicMock, clean_device_registry: dict) -> None:
+    """Test the tool runs on every device and reports per-device results in the order of serials."""
+    devices = _make_devices(mock_u2_module)
+
+    result = await device_fanout.fn("app_info", {"package_name": "com.example.app"}, SERIALS)
+
+    assert result["ok"] is True
+    assert [r["serial"] for r in result["results"]] == SERIALS
+    assert [r["result"]["versionCode"] for r in result["results"]] == [int(s.split("-")[1]) for s in SERIALS]
+    for device in devices.values():
+        device.app_info.assert_called_once_with("com.example.app")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_device_fanout_partial_failure(mock_u2_module: MagicMock, clean_device_registry: dict) -> None:
+    """Test a failing device does not cancel the others."""
+    devices = _make_devices(mock_u2_module, latency=0.05)
+    connect = mock_u2_module.connect.side_effect
+
+    def connect_or_fail(serial: str) -> MagicMock:
+        device = connect(serial)
+        if serial == SERIALS[0]:
+            device.app_start.side_effect = RuntimeError("not installed")
+        return device
+
+    mock_u2_module.connect.side_effect = connect_or_fail
+
+    result = await device_fanout.fn("app_start", {"package_name": "com.example.app"}, SERIALS)
+
+    assert result["ok"] is False
+    assert result["results"][0] == {
+        "serial": SERIALS[0],
+        "ok": False,
+        "error": "RuntimeError: not installed",
+        "elapsed": result["results"][0]["elapsed"],
+    }
+    assert all(r["ok"] for r in result["results"][1:])
+    assert len(devices) == len(SERIALS)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_device_fanout_concurrency(mock_u2_module: MagicMock, clean_device_registry: dict) -> None:
+    """Test devices run concurrently, at most `concurrency` at a time."""
+    _make_devices(mock_u2_module, latency=0.1)
+
+    result = await device_fanout.fn("app_start", {"package_name": "com.example.app"}, SERIALS, concurrency=3)
+
+    assert result["ok"] is True
+    assert 0.2 <= result["elapsed"] < 0.5
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_device_fanout_all_connected(mock_u2_module: MagicMock, clean_device_registry: dict) -> None:
+    """Test serials default to every connected device."""
+    _make_devices(mock_u2_module)
+    mock_adb = MagicMock()
+    mock_adb.device_list.return_value = [MagicMock(serial=serial) for serial in SERIALS[:2]]
+
+    with patch("u2mcp.tools.fanout.adb", mock_adb):
+        result = await device_fanout.fn("app_stop", {"package_name": "com.example.app"})
+
+    assert [r["serial"] for r in result["results"]] == SERIALS[:2]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_device_fanout_invalid() -> None:
+    """Test unsupported tools and invalid arguments are rejected before touching any device."""
+    with pytest.raises(ValueError, match="Unsupported tool"):
+        await device_fanout.fn("click", {"x": 1, "y": 2}, SERIALS)
+    with pytest.raises(ValueError, match="Invalid arguments"):
+        await device_fanout.fn("app_start", {"package": "com.example.app"}, SERIALS)
+    with pytest.raises(ValueError, match="concurrency"):
+        await device_fanout.fn("app_stop", {"package_name": "com.example.app"}, SERIALS, concurrency=0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_device_fanout_all_watched(mock_u2_module: MagicMock, clean_device_registry: dict) -> None:
+    """Test serials default to the ready devices of the device watcher, when it is synced."""
+    _make_devices(mock_u2_module)
+    watcher = MagicMock(synced=True)
+    watcher.ready.return_value = [MagicMock(serial=SERIALS[3])]
+    mock_adb = MagicMock()
+
+    with patch("u2mcp.tools.fanout.get_device_watcher", return_value=watcher), patch("u2mcp.tools.fanout.adb", mock_adb):
+        result = await device_fanout.fn("app_stop", {"package_name": "com.example.app"})
+
+    assert [r["serial"] for r in result["results"]] == SERIALS[3:4]
+    mock_adb.device_list.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_device_fanout_excluded_tool() -> None:
+    """Test a tool hidden by the tags of the server cannot be fanned out."""
+    from u2mcp.mcp import mcp
+
+    previous = mcp.exclude_tags
+    mcp.exclude_tags = {"app:lifecycle"}
+    try:
+        with pytest.raises(ValueError, match="Unsupported tool"):
+            await device_fanout.fn("app_stop", {"package_name": "com.example.app"}, SERIALS)
+    finally:
+        mcp.exclude_tags = previous
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_device_fanout_middleware_and_progress(
+    mock_u2_module: MagicMock, clean_device_registry: dict, server_lifespan: None, make_apk
+) -> None:
+    """Test each device call goes through the middleware, and progress is reported per device, not per install."""
+    from fastmcp import Client
+    from fastmcp.server.middleware import Middleware
+
+    from u2mcp.mcp import mcp
+
+    devices = _make_devices(mock_u2_module)
+    connect = mock_u2_module.connect.side_effect
+
+    def connect_and_push(serial: str) -> MagicMock:
+        device = connect(serial)
+        device.adb_device.sync.push.side_effect = lambda fp, dst: fp.read()
+        return device
+
+    mock_u2_module.connect.side_effect = connect_and_push
+    calls: list[tuple[str, str]] = []
+
+    class Spy(Middleware):
+        async def on_call_tool(self, context, call_next):
+            calls.append((context.message.name, (context.message.arguments or {}).get("serial", "")))
+            return await call_next(context)
+
+    messages: list[str | None] = []
+
+    async def on_progress(progress: float, total: float | None, message: str | None) -> None:
+        messages.append(message)
+
+    path = make_apk()
+    mcp.middleware.append(Spy())
+    try:
+        async with Client(mcp) as client:
+            result = await client.call_tool(
+                "device_fanout",
+                {"tool": "app_install", "arguments": {"data": str(path), "force": True}, "serials": SERIALS[:2]},
+                progress_handler=on_progress,
+            )
+    finally:
+        mcp.middleware.pop()
+
+    assert result.data["ok"] is True
+    assert sorted(calls) == [("app_install", SERIALS[0]), ("app_install", SERIALS[1]), ("device_fanout", "")]
+    assert sorted(m or "" for m in messages) == [f"{SERIALS[0]} done", f"{SERIALS[1]} done"]
+    for device in devices.values():
+        device.adb_device.install_remote.assert_called_once()
+
+
+@pytest.mark.unit
+def test_middleware_internals() -> None:
+    """Test the fastmcp internals that call_tool builds the middleware chain from are still as it expects."""
+    import inspect
+
+    from fastmcp.server.middleware import Middleware, MiddlewareContext
+    from fastmcp.server.middleware.middleware import make_middleware_wrapper
+
+    from u2mcp.mcp import mcp
+
+    assert list(inspect.signature(make_middleware_wrapper).parameters) == ["middleware", "call_next"]
+    assert list(inspect.signature(Middleware.__call__).parameters) == ["self", "context", "call_next"]
+    assert {"message", "fastmcp_context", "source", "type", "method"} <= set(MiddlewareContext.__dataclass_fields__)
+    assert isinstance(mcp.middleware, list)
+    assert all(isinstance(middleware, Middleware) for middleware in mcp.middleware)
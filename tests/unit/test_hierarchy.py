@@ -0,0 +1,133 @@
+"""
+Unit tests for compact hierarchy rendering.
+"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from u2mcp.hierarchy import compact_hierarchy, diff_nodes, flatten_nodes, parse_bounds, render_json, render_text
+
+HIERARCHY = """<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>
+<hierarchy rotation="0">
+  <node index="0" text="" resource-id="" class="android.widget.FrameLayout" content-desc="" clickable="false"
+        enabled="true" bounds="[0,0][1080,2400]">
+    <node index="0" text="" resource-id="" class="android.widget.LinearLayout" content-desc="" clickable="false"
+          enabled="true" bounds="[0,0][1080,2400]">
+      <node index="0" text="Sign in" resource-id="com.example:id/title" class="android.widget.TextView"
+            content-desc="" clickable="false" enabled="true" bounds="[40,80][1040,160]" />
+      <node index="1" text="" resource-id="com.example:id/list" class="android.widget.ListView" content-desc=""
+            clickable="false" scrollable="true" enabled="true" bounds="[0,200][1080,2000]">
+        <node index="0" text="" resource-id="" class="android.widget.LinearLayout" content-desc=""
+              clickable="false" enabled="true" bounds="[0,200][1080,400]">
+          <node index="0" text="Remember me" resource-id="com.example:id/remember"
+                class="android.widget.CheckBox" content-desc="" clickable="true" checkable="true" checked="true"
+                enabled="false" bounds="[40,220][540,380]" />
+        </node>
+      </node>
+      <node index="2" text="" resource-id="" class="android.widget.ImageButton" content-desc="Back"
+            clickable="true" enabled="true" bounds="[0,2200][200,2400]" />
+    </node>
+  </node>
+</hierarchy>
+"""
+
+
+@pytest.mark.unit
+def test_parse_bounds() -> None:
+    """Test bounds strings are parsed into (left, top, right, bottom)."""
+    assert parse_bounds("[0,200][1080,2000]") == (0, 200, 1080, 2000)
+    assert parse_bounds("") is None
+    assert parse_bounds("garbage") is None
+
+
+@pytest.mark.unit
+def test_compact_hierarchy_keeps_relevant_nodes() -> None:
+    """Test layout containers are dropped and their relevant descendants lifted to the nearest kept ancestor."""
+    roots, truncated = compact_hierarchy(HIERARCHY)
+
+    assert truncated is False
+    assert [node.attributes.get("resource-id") for node in roots] == [
+        "com.example:id/title",
+        "com.example:id/list",
+        None,
+    ]
+    listview = roots[1]
+    assert listview.attributes["scrollable"] is True
+    assert listview.children[0].attributes == {
+        "class": "android.widget.CheckBox",
+        "text": "Remember me",
+        "resource-id": "com.example:id/remember",
+        "bounds": [40, 220, 540, 380],
+        "clickable": True,
+        "checkable": True,
+        "checked": True,
+        "enabled": False,
+    }
+    assert roots[2].attributes["content-desc"] == "Back"
+
+
+@pytest.mark.unit
+def test_compact_hierarchy_filters() -> None:
+    """Test attribute whitelist, depth cap, bounds filter and node-count limit."""
+    roots, _ = compact_hierarchy(HIERARCHY, attributes=["text"])
+    assert roots[0].attributes == {"text": "Sign in"}
+    assert roots[1].attributes == {}
+
+    roots, _ = compact_hierarchy(HIERARCHY, max_depth=3)
+    assert [node.children for node in roots] == [[], [], []]
+
+    roots, _ = compact_hierarchy(HIERARCHY, within=[0, 2100, 1080, 2400])
+    assert len(roots) == 1 and roots[0].attributes["content-desc"] == "Back"
+
+    roots, truncated = compact_hierarchy(HIERARCHY, max_nodes=2)
+    assert truncated is True
+    assert len(roots) == 2 and roots[1].children == []
+
+    with pytest.raises(ValueError):
+        compact_hierarchy(HIERARCHY, within=[0, 0])
+
+
+@pytest.mark.unit
+def test_render() -> None:
+    """Test the compact tree renders as JSON and as indented text."""
+    roots, truncated = compact_hierarchy(HIERARCHY, max_nodes=3)
+
+    data = json.loads(render_json(roots, truncated))
+    assert data["truncated"] is True
+    assert data["nodes"][1]["children"][0]["text"] == "Remember me"
+
+    lines = render_text(roots, truncated).splitlines()
+    assert lines[0] == 'android.widget.TextView "Sign in" resource-id="com.example:id/title" [40,80,1040,160]'
+    assert lines[2].startswith('  android.widget.CheckBox "Remember me" ')
+    assert "clickable checkable checked enabled=false" in lines[2]
+    assert lines[-1] == "... (truncated)"
+
+
+@pytest.mark.unit
+def test_diff_nodes() -> None:
+    """Test nodes are matched by resource-id, class and bounds, and moved views with an id count as changed."""
+    old = flatten_nodes(compact_hierarchy(HIERARCHY)[0])
+    assert [node.get("class") for node in old] == [
+        "android.widget.TextView",
+        "android.widget.ListView",
+        "android.widget.CheckBox",
+        "android.widget.ImageButton",
+    ]
+    new = [
+        {**old[0], "text": "Welcome"},
+        {**old[1], "bounds": [0, 300, 1080, 2000]},
+        {"class": "android.widget.Button", "text": "OK", "bounds": [0, 2200, 200, 2400]},
+        old[3],
+    ]
+
+    diff = diff_nodes(old, new)
+    assert diff["added"] == [new[2]]
+    assert diff["removed"] == [old[2]]
+    assert diff["changed"] == [
+        {"node": new[0], "changes": {"text": ["Sign in", "Welcome"]}},
+        {"node": new[1], "changes": {"bounds": [[0, 200, 1080, 2000], [0, 300, 1080, 2000]]}},
+    ]
+    assert diff_nodes(old, old) == {"added": [], "removed": [], "changed": []}
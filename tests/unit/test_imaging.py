@@ -0,0 +1,172 @@
+"""
+Unit tests for screenshot image encoding.
+"""
+
+from __future__ import annotations
+
+from base64 import b64decode
+from io import BytesIO
+
+import pytest
+from PIL import Image as PILImage
+
+from u2mcp.imaging import encode_image, encode_image_sync
+
+
+def _decode(data_url: str) -> PILImage.Image:
+    _, data = data_url.split(",", 1)
+    return PILImage.open(BytesIO(b64decode(data)))
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("format", ["jpeg", "png", "webp"])
+def test_encode_image_formats(format: str) -> None:
+    """Test each format is encoded with its own mime type."""
+    result = encode_image_sync(PILImage.new("RGB", (100, 200)), format)  # type: ignore[arg-type]
+
+    assert result["image"].startswith(f"data:image/{format};base64,")
+    assert _decode(result["image"]).format == format.upper()
+    assert (result["width"], result["height"]) == (100, 200)
+
+
+@pytest.mark.unit
+def test_encode_image_downscale() -> None:
+    """Test max_width and scale downscale the image, keeping its aspect ratio."""
+    im = PILImage.new("RGB", (1440, 3200))
+
+    result = encode_image_sync(im, max_width=720)
+    assert (result["width"], result["height"]) == (720, 1600)
+    assert (result["original_width"], result["original_height"]) == (1440, 3200)
+
+    result = encode_image_sync(im, scale=0.25)
+    assert (result["width"], result["height"]) == (360, 800)
+
+    # The narrower of the two limits wins
+    result = encode_image_sync(im, max_width=1000, scale=0.25)
+    assert (result["width"], result["height"]) == (360, 800)
+
+
+@pytest.mark.unit
+def test_encode_image_grayscale() -> None:
+    """Test grayscale output has a single channel."""
+    result = encode_image_sync(PILImage.new("RGB", (100, 200), "red"), "png", grayscale=True)
+
+    assert _decode(result["image"]).mode == "L"
+
+
+@pytest.mark.unit
+def test_encode_image_downscales_jpeg_while_decoding() -> None:
+    """Test a JPEG source is decoded at a reduced size before being resized."""
+    with BytesIO() as fp:
+        PILImage.new("RGB", (1440, 3200), "blue").save(fp, "jpeg")
+        im = PILImage.open(BytesIO(fp.getvalue()))
+
+    result = encode_image_sync(im, max_width=360)
+
+    assert (result["width"], result["height"]) == (360, 800)
+    assert (result["original_width"], result["original_height"]) == (1440, 3200)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"format": "gif"}, {"quality": 0}, {"quality": 101}, {"scale": 0}, {"scale": 1.5}, {"max_width": -1}],
+)
+def test_encode_image_invalid_arguments(kwargs: dict) -> None:
+    """Test invalid arguments are rejected."""
+    with pytest.raises(ValueError):
+        encode_image_sync(PILImage.new("RGB", (100, 200)), **kwargs)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_encode_image_async() -> None:
+    """Test the async variant returns the same result."""
+    im = PILImage.new("RGB", (100, 200))
+
+    assert await encode_image(im, "png") == encode_image_sync(im, "png")
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_encode_workers_bound_concurrent_encodings() -> None:
+    """Test no more images than the configured number of workers are encoded at once."""
+    import threading
+    from unittest.mock import patch
+
+    import anyio
+
+    from u2mcp.imaging import encode_stats, get_encode_workers, set_encode_workers
+
+    running = 0
+    peak = 0
+    guard = threading.Lock()
+
+    def slow_encode(*args, **kwargs):
+        nonlocal running, peak
+        with guard:
+            running += 1
+            peak = max(peak, running)
+        threading.Event().wait(0.05)
+        with guard:
+            running -= 1
+        return {}
+
+    workers = get_encode_workers()
+    set_encode_workers(2)
+    try:
+        with patch("u2mcp.imaging.encode_image_sync", slow_encode):
+            async with anyio.create_task_group() as tg:
+                for _ in range(6):
+                    tg.start_soon(encode_image, PILImage.new("RGB", (1, 1)))
+                await anyio.sleep(0.02)
+                during = encode_stats()
+    finally:
+        set_encode_workers(workers)
+
+    assert peak == 2
+    assert during == {"limit": 2, "busy": 2, "waiting": 4}
+    with pytest.raises(ValueError):
+        set_encode_workers(0)
+
+
+@pytest.mark.unit
+def test_encode_frame_unchanged() -> None:
+    """Test an unchanged frame returns no image, and the same token."""
+    from u2mcp.imaging import encode_frame_sync
+
+    result, frame = encode_frame_sync(PILImage.new("RGB", (100, 200)))
+    assert result["changed"] is True
+    assert result["token"] == frame.token
+    assert result["changed_bbox"] is None
+
+    result, frame2 = encode_frame_sync(PILImage.new("RGB", (100, 200)), previous=frame, if_changed_since=frame.token)
+    assert result == {"changed": False, "token": frame.token}
+    assert frame2 is frame
+
+    # Different encoding options make a different token
+    result, _ = encode_frame_sync(PILImage.new("RGB", (100, 200)), max_width=50, previous=frame, if_changed_since=frame.token)
+    assert result["changed"] is True
+
+
+@pytest.mark.unit
+def test_encode_frame_changed_bbox() -> None:
+    """Test a changed frame reports the bounding box of the changed region in original coordinates."""
+    from PIL import ImageDraw
+
+    from u2mcp.imaging import encode_frame_sync
+
+    im = PILImage.new("RGB", (1080, 2400), "white")
+    _, frame = encode_frame_sync(im.copy(), max_width=540)
+
+    ImageDraw.Draw(im).rectangle((200, 1000, 399, 1199), fill="black")
+    result, _ = encode_frame_sync(im, max_width=540, previous=frame, if_changed_since=frame.token)
+
+    assert result["changed"] is True
+    left, top, right, bottom = result["changed_bbox"]
+    assert 180 <= left <= 200 and 980 <= top <= 1000
+    assert 400 <= right <= 420 and 1200 <= bottom <= 1220
+
+    # No bounding box against a frame the server does not have
+    result, _ = encode_frame_sync(im, max_width=540, previous=frame, if_changed_since="unknown")
+    assert result["changed_bbox"] is None
@@ -0,0 +1,49 @@
+"""
+Unit tests for lazy imports.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from u2mcp.lazy import lazy_import
+
+
+@pytest.fixture
+def slow_module(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> str:
+    """An importable module that is not imported yet."""
+    (tmp_path / "u2mcp_lazy_probe.py").write_text("CONSTANT = 42\n\ndef connect(serial):\n    return serial\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "u2mcp_lazy_probe", raising=False)
+    return "u2mcp_lazy_probe"
+
+
+@pytest.mark.unit
+def test_imported_on_first_use(slow_module: str) -> None:
+    """The module is imported on first attribute access, not before."""
+    module = lazy_import(slow_module)
+    assert slow_module not in sys.modules
+    assert "not imported yet" in repr(module)
+
+    assert module.CONSTANT == 42
+    assert slow_module in sys.modules
+
+
+@pytest.mark.unit
+def test_attribute_of_module(slow_module: str) -> None:
+    """An attribute of a module can stand in, like `from adbutils import adb`."""
+    connect = lazy_import(slow_module, "connect")
+    assert connect.__name__ == "connect"
+
+
+@pytest.mark.unit
+def test_patch_through(slow_module: str) -> None:
+    """Patching an attribute of the lazy module patches the real module."""
+    module = lazy_import(slow_module)
+    with patch.object(module, "connect", return_value="patched"):
+        assert sys.modules[slow_module].connect("emulator-5554") == "patched"
+    assert module.connect("emulator-5554") == "emulator-5554"
@@ -0,0 +1,107 @@
+"""
+Unit tests for the Prometheus metrics.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+from fastmcp import FastMCP
+
+from u2mcp import metrics
+from u2mcp.metrics import Counter, Histogram, install_metrics, render_metrics, reset_metrics
+
+
+@pytest.fixture
+def metrics_mcp() -> Iterator[FastMCP]:
+    """The server with metrics installed, starting with no recorded calls."""
+    from u2mcp.mcp import mcp
+
+    install_metrics(mcp)
+    reset_metrics()
+    yield mcp
+    reset_metrics()
+
+
+def _samples(text: str) -> dict[str, float]:
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if not line.startswith("#")}
+
+
+@pytest.mark.unit
+def test_counter_render() -> None:
+    """Counters render one sample per label set, with escaped label values."""
+    counter = Counter("calls_total", "Calls.", ("tool", "status"))
+    counter.inc(("click", "ok"))
+    counter.inc(("click", "ok"))
+    counter.inc(('say "hi"', "error"))
+
+    assert list(counter.render()) == [
+        "# HELP calls_total Calls.",
+        "# TYPE calls_total counter",
+        'calls_total{tool="click",status="ok"} 2',
+        'calls_total{tool="say \\"hi\\"",status="error"} 1',
+    ]
+
+
+@pytest.mark.unit
+def test_histogram_render() -> None:
+    """Histograms render cumulative buckets, sum and count."""
+    histogram = Histogram("duration_seconds", "Duration.", ("tool",), (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(("click",), value)
+
+    assert list(histogram.render())[2:] == [
+        'duration_seconds_bucket{tool="click",le="0.1"} 2',
+        'duration_seconds_bucket{tool="click",le="1.0"} 3',
+        'duration_seconds_bucket{tool="click",le="+Inf"} 4',
+        'duration_seconds_sum{tool="click"} 3.65',
+        'duration_seconds_count{tool="click"} 4',
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_tool_calls_recorded(metrics_mcp: FastMCP, mock_u2_device: MagicMock, clean_device_registry: dict) -> None:
+    """Tool calls are counted by outcome, with their durations and device lock waits."""
+    from fastmcp import Client
+
+    mock_u2_device.click.side_effect = [None, RuntimeError("device gone")]
+    async with Client(metrics_mcp) as client:
+        await client.call_tool("click", {"serial": "emulator-5554", "x": 1, "y": 2})
+        result = await client.call_tool("click", {"serial": "emulator-5554", "x": 1, "y": 2}, raise_on_error=False)
+    assert result.is_error
+
+    samples = _samples(render_metrics())
+    assert samples['u2mcp_tool_calls_total{tool="click",status="ok"}'] == 1
+    assert samples['u2mcp_tool_calls_total{tool="click",status="error"}'] == 1
+    assert samples['u2mcp_tool_duration_seconds_count{tool="click"}'] == 2
+    assert samples['u2mcp_device_lock_wait_seconds_count{tool="click"}'] == 2
+    assert samples['u2mcp_device_connected{serial="emulator-5554"}'] == 1
+    assert samples['u2mcp_worker_threads_limit{pool="wait"}'] > 0
+    assert 'u2mcp_worker_threads_busy{pool="encode"}' in samples
+
+
+@pytest.mark.unit
+def test_lock_wait_not_recorded_when_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Without --metrics, get_device records nothing."""
+    monkeypatch.setattr(metrics, "_enabled", False)
+    reset_metrics()
+    metrics.observe_lock_wait("click", 0.1)
+    assert "u2mcp_device_lock_wait_seconds_count" not in render_metrics()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_metrics_endpoint(metrics_mcp: FastMCP) -> None:
+    """/metrics serves the text exposition format, without the bearer token."""
+    app = metrics_mcp.http_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE u2mcp_tool_calls_total counter" in response.text
+    assert "# TYPE u2mcp_worker_threads_busy gauge" in response.text
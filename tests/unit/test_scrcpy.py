@@ -0,0 +1,360 @@
+"""
+Unit tests for scrcpy tools, run against a dummy scrcpy script.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+from textwrap import dedent
+
+import anyio
+import anyio.lowlevel
+import pytest
+
+from u2mcp.logbuffer import LogBuffer, LogLine, forward_logs
+from u2mcp.recording import RecordingIndex, locate, read_index
+from u2mcp.supervisor import get_supervisor_limits
+
+_DUMMY_SCRCPY = dedent("""\
+    import os, signal, sys, time
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if os.environ.get("DUMMY_SCRCPY_FAIL"):
+        print("ERROR: Could not find any ADB device", file=sys.stderr, flush=True)
+        sys.exit(1)
+    if crash := os.environ.get("DUMMY_SCRCPY_CRASH"):
+        time.sleep(float(crash))
+        print("ERROR: Device disconnected", file=sys.stderr, flush=True)
+        sys.exit(1)
+    for i in range(int(os.environ.get("DUMMY_SCRCPY_LINES", "0"))):
+        print(f"INFO: line {i + 1}", flush=i % 100 == 0)
+    sys.stdout.flush()
+    path = sys.argv[sys.argv.index("--record") + 1] if "--record" in sys.argv else None
+    while True:
+        if path:
+            with open(path, "ab") as fp:
+                fp.write(b"frame")
+        time.sleep(0.05)
+    """)
+
+
+@pytest.fixture
+def dummy_scrcpy(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """A dummy scrcpy, appending to the file it records into until terminated."""
+    script = tmp_path / "scrcpy.py"
+    script.write_text(_DUMMY_SCRCPY)
+    if os.name == "nt":
+        launcher = tmp_path / "scrcpy.cmd"
+        launcher.write_text(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        launcher = tmp_path / "scrcpy"
+        launcher.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        launcher.chmod(0o755)
+    monkeypatch.setenv("SCRCPY", str(launcher))
+    return launcher
+
+
+@pytest.mark.unit
+def test_locate(tmp_path: Path) -> None:
+    """A time is located in the segment recorded then, and tool calls carry their offset."""
+    index = RecordingIndex(tmp_path / "index.jsonl")
+    index.segment_started("segment-00001.mkv", 100.0, 1)
+    index.tool_call("click", 130.0, 0.1, True)
+    index.segment_ended(700.0, 0)
+    index.segment_started("segment-00002.mkv", 701.0, 2)
+    index.close()
+    with open(tmp_path / "index.jsonl", "a") as fp:
+        fp.write('{"event": "call", "tool"')
+
+    events = list(read_index(tmp_path / "index.jsonl"))
+
+    assert events[1] == {
+        "event": "call",
+        "tool": "click",
+        "time": 130.0,
+        "duration": 0.1,
+        "ok": True,
+        "file": "segment-00001.mkv",
+        "offset": 30.0,
+    }
+    assert len(events) == 4
+    assert locate(tmp_path / "index.jsonl", 400.0) == {"file": "segment-00001.mkv", "offset": 300.0}
+    assert locate(tmp_path / "index.jsonl", 700.5) is None
+    assert locate(tmp_path / "index.jsonl", 711.0) == {"file": "segment-00002.mkv", "offset": 10.0}
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_headless_recording(
+    dummy_scrcpy: Path, tmp_path: Path, clean_device_registry: dict, server_lifespan: None
+) -> None:
+    """A recording rotates its segments, keeping the last ones, and indexes the tool calls on its device."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    record_dir = tmp_path / "recording"
+    async with Client(mcp) as client:
+        started = await client.call_tool(
+            "start_scrcpy",
+            {
+                "serial": "emulator-5554",
+                "timeout": 0.2,
+                "record_dir": str(record_dir),
+                "segment_seconds": 0.5,
+                "max_segments": 2,
+            },
+        )
+        await client.call_tool("window_size", {"serial": "emulator-5554"})
+        await client.call_tool("window_size", {"serial": "other-device"})
+        await anyio.sleep(1.5)
+        await client.call_tool("stop_scrcpy", {"pid": started.data})
+
+    events = list(read_index(record_dir / "index.jsonl"))
+    segments = [e["file"] for e in events if e["event"] == "segment"]
+    removed = [e["file"] for e in events if e["event"] == "removed"]
+    calls = [e for e in events if e["event"] == "call"]
+
+    assert segments[:3] == ["segment-00001.mkv", "segment-00002.mkv", "segment-00003.mkv"]
+    assert [e["file"] for e in events if e["event"] == "end"] == segments
+    assert removed == segments[:-2]
+    assert sorted(p.name for p in record_dir.glob("segment-*")) == segments[-2:]
+    assert all(p.stat().st_size > 0 for p in record_dir.glob("segment-*"))
+    assert len(calls) == 1
+    assert calls[0]["tool"] == "window_size"
+    assert calls[0]["ok"] is True
+    assert calls[0]["file"] in segments
+    assert 0 <= calls[0]["offset"] < 0.5
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_recording_unique_device(
+    dummy_scrcpy: Path, tmp_path: Path, clean_device_registry: dict, server_lifespan: None
+) -> None:
+    """A recording started without a serial records the unique device, and indexes the tool calls on it."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    record_dir = tmp_path / "recording"
+    async with Client(mcp) as client:
+        pid = (await client.call_tool("start_scrcpy", {"timeout": 0.2, "record_dir": str(record_dir)})).data
+        await client.call_tool("window_size", {"serial": "emulator-5554"})
+        processes = (await client.call_tool("list_scrcpy", {})).structured_content["result"]
+        await client.call_tool("stop_scrcpy", {"pid": pid})
+
+    calls = [e for e in read_index(record_dir / "index.jsonl") if e["event"] == "call"]
+    assert [p["serial"] for p in processes if p["pid"] == pid] == ["emulator-5554"]
+    assert [c["tool"] for c in calls] == ["window_size"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_recording_startup_failure(
+    dummy_scrcpy: Path, tmp_path: Path, server_lifespan: None, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """A recording whose scrcpy exits during startup fails with the error scrcpy printed."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    monkeypatch.setenv("DUMMY_SCRCPY_FAIL", "1")
+    async with Client(mcp) as client:
+        result = await client.call_tool(
+            "start_scrcpy", {"timeout": 2, "record_dir": str(tmp_path / "recording")}, raise_on_error=False
+        )
+
+    assert result.is_error
+    assert "Could not find any ADB device" in result.content[0].text
+
+
+@pytest.mark.unit
+def test_log_buffer() -> None:
+    """Only the last lines are kept, and a late reader is told how many it missed."""
+    logs = LogBuffer(maxlen=3)
+    for i in range(5):
+        logs.append("stdout", f"line {i + 1}")
+
+    lines, dropped = logs.since(0)
+    assert [line.text for line in lines] == ["line 3", "line 4", "line 5"]
+    assert dropped == 2
+    lines, dropped = logs.since(3, limit=1)
+    assert [line.seq for line in lines] == [4]
+    assert dropped == 0
+    assert logs.since(5) == ([], 0)
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_forward_logs_coalesces() -> None:
+    """Lines are sent in few messages, at most one per interval, each with at most max_lines lines."""
+    logs = LogBuffer()
+    sent: list[tuple[list[str], int]] = []
+
+    async def send(lines: list[LogLine], skipped: int) -> None:
+        sent.append(([line.text for line in lines], skipped))
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(lambda: forward_logs(logs, send, interval=0.2, max_lines=5))
+        await anyio.lowlevel.checkpoint()
+        logs.append("stdout", "first")
+        await anyio.sleep(0.05)
+        for i in range(50):
+            logs.append("stderr", f"line {i}")
+        await anyio.sleep(0.3)
+        tg.cancel_scope.cancel()
+
+    assert sent == [(["first"], 0), ([f"line {i}" for i in range(45, 50)], 45)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_scrcpy_logs(dummy_scrcpy: Path, server_lifespan: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A chatty scrcpy sends a few coalesced log messages, and its output is read with scrcpy_logs."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    messages: list[str] = []
+
+    async def on_log(message) -> None:
+        messages.append(message.data["msg"] if isinstance(message.data, dict) else str(message.data))
+
+    monkeypatch.setenv("DUMMY_SCRCPY_LINES", "5000")
+    async with Client(mcp, log_handler=on_log) as client:
+        pid = (await client.call_tool("start_scrcpy", {"timeout": 1.5})).data
+        with anyio.fail_after(5):
+            while (await client.call_tool("scrcpy_logs", {"pid": pid, "limit": 0})).data["next"] < 5000:
+                await anyio.sleep(0.05)
+        logs = (await client.call_tool("scrcpy_logs", {"pid": pid})).structured_content
+        newer = (await client.call_tool("scrcpy_logs", {"pid": pid, "since": 5000})).structured_content
+        await client.call_tool("stop_scrcpy", {"pid": pid})
+        stopped = (await client.call_tool("scrcpy_logs", {"pid": pid, "since": 4998})).structured_content
+
+    assert 1 <= len(messages) <= 3
+    assert len(logs["lines"]) == 200
+    assert logs["lines"][0]["text"] == "INFO: line 4001"
+    assert logs["dropped"] == 4000
+    assert newer == {"lines": [], "next": 5000, "dropped": 0, "running": True}
+    assert [line["text"] for line in stopped["lines"]] == ["INFO: line 4999", "INFO: line 5000"]
+    assert stopped["running"] is False
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_supervised_restart(dummy_scrcpy: Path, server_lifespan: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A scrcpy crashing after its startup is restarted under the same pid, until it keeps crashing."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    monkeypatch.setattr(get_supervisor_limits(), "backoff", 0.05)
+    monkeypatch.setattr(get_supervisor_limits(), "max_restarts", 2)
+    monkeypatch.setenv("DUMMY_SCRCPY_CRASH", "0.3")
+    async with Client(mcp) as client:
+        pid = (await client.call_tool("start_scrcpy", {"serial": "emulator-5554", "timeout": 0.1})).data
+        with anyio.fail_after(5):
+            while (processes := (await client.call_tool("list_scrcpy", {})).structured_content["result"])[-1][
+                "state"
+            ] != "failed":
+                await anyio.sleep(0.05)
+        logs = (await client.call_tool("scrcpy_logs", {"pid": pid})).structured_content
+        stopped = await client.call_tool("stop_scrcpy", {"pid": pid}, raise_on_error=False)
+
+    process = processes[-1]
+    assert process["pid"] == pid
+    assert process["serial"] == "emulator-5554"
+    assert process["mode"] == "mirror"
+    assert process["restarts"] == 2
+    assert process["returncode"] == 1
+    assert process["current_pid"] is None
+    assert [line["text"] for line in logs["lines"]].count("ERROR: Device disconnected") == 3
+    assert logs["running"] is False
+    assert stopped.is_error
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_supervisor_limits(dummy_scrcpy: Path, server_lifespan: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    """One scrcpy runs per device, and no more than max_processes at the same time."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    monkeypatch.setattr(get_supervisor_limits(), "max_processes", 2)
+    async with Client(mcp) as client:
+        first = (await client.call_tool("start_scrcpy", {"serial": "device-1", "timeout": 0.1})).data
+        same = await client.call_tool("start_scrcpy", {"serial": "device-1", "timeout": 0.1}, raise_on_error=False)
+        second = (await client.call_tool("start_scrcpy", {"serial": "device-2", "timeout": 0.1})).data
+        third = await client.call_tool("start_scrcpy", {"serial": "device-3", "timeout": 0.1}, raise_on_error=False)
+        processes = (await client.call_tool("list_scrcpy", {})).structured_content["result"]
+        await client.call_tool("stop_scrcpy", {"pid": first})
+        await client.call_tool("stop_scrcpy", {"pid": second})
+
+    assert same.is_error
+    assert f"already running for device-1 (pid={first})" in same.content[0].text
+    assert third.is_error
+    assert "Too many scrcpy processes" in third.content[0].text
+    running = {p["serial"]: p for p in processes if p["state"] == "running"}
+    assert sorted(running) == ["device-1", "device-2"]
+    assert running["device-1"]["current_pid"] == first
+    assert running["device-1"]["uptime"] > 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_supervisor_concurrent_starts(dummy_scrcpy: Path) -> None:
+    """Concurrent starts for one device, or beyond max_processes, take their slot before their process starts."""
+    from u2mcp.background import set_background_task_group
+    from u2mcp.supervisor import Supervised, _Supervisor
+
+    supervisor = _Supervisor()
+    results: list[int | str] = []
+
+    async def start(serial: str) -> None:
+        try:
+            results.append(await supervisor.start(Supervised(serial, [str(dummy_scrcpy)])))
+        except RuntimeError as e:
+            results.append(str(e))
+
+    async with anyio.create_task_group() as tg:
+        set_background_task_group(tg)
+        async with anyio.create_task_group() as starts:
+            for serial in ("device-1", "device-1", "device-2", "device-3", "device-4", "device-5"):
+                starts.start_soon(start, serial)
+        for supervised in supervisor.list():
+            await supervised.stop()
+
+    errors = [r for r in results if isinstance(r, str)]
+    assert len(errors) == 2
+    assert sum("already running for device-1" in e for e in errors) == 1
+    assert sum("Too many scrcpy processes" in e for e in errors) == 1
+    assert len([s for s in supervisor.list() if s.state == "stopped"]) == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_supervised_restart_failure(dummy_scrcpy: Path, server_lifespan: None, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A scrcpy that cannot be started again is given up, and the server keeps running."""
+    from fastmcp import Client
+
+    from u2mcp.mcp import mcp
+
+    monkeypatch.setattr(get_supervisor_limits(), "backoff", 0.05)
+    monkeypatch.setenv("DUMMY_SCRCPY_CRASH", "0.3")
+    async with Client(mcp) as client:
+        pid = (await client.call_tool("start_scrcpy", {"serial": "emulator-5554", "timeout": 0.1})).data
+        dummy_scrcpy.unlink()
+        with anyio.fail_after(5):
+            while (await client.call_tool("list_scrcpy", {})).structured_content["result"][-1]["state"] != "failed":
+                await anyio.sleep(0.05)
+        logs = (await client.call_tool("scrcpy_logs", {"pid": pid})).structured_content
+        listed = (await client.call_tool("list_scrcpy", {})).structured_content["result"]
+
+    assert listed[-1]["pid"] == pid
+    assert listed[-1]["restarts"] == 1
+    assert listed[-1]["current_pid"] is None
+    assert "[supervisor] could not run scrcpy, giving up" in logs["lines"][-1]["text"]
@@ -0,0 +1,324 @@
+"""
+Unit tests for live screen streams, fed by a fake minicap server.
+"""
+
+from __future__ import annotations
+
+import struct
+from base64 import b64decode
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+from io import BytesIO
+from unittest.mock import MagicMock
+
+import anyio
+import pytest
+from anyio.abc import ByteReceiveStream, SocketStream
+from anyio.streams.buffered import BufferedByteReceiveStream
+from mcp.server.lowlevel import NotificationOptions
+from PIL import Image as PILImage
+
+from u2mcp import streaming
+from u2mcp.streaming import FrameGrabber, LiveFrame, read_banner, read_frames
+
+_SIZE = (180, 320)
+
+
+def _jpeg(color: str, size: tuple[int, int] = _SIZE) -> bytes:
+    with BytesIO() as fp:
+        PILImage.new("RGB", size, color).save(fp, "jpeg")
+        return fp.getvalue()
+
+
+def _banner(size: tuple[int, int] = _SIZE, orientation: int = 0) -> bytes:
+    return struct.pack("<BBIIIIIBB", 1, 24, 1234, *size, *size, orientation // 90, 2)
+
+
+def _frame(data: bytes) -> bytes:
+    return struct.pack("<I", len(data)) + data
+
+
+class FakeMinicap:
+    """A local TCP server speaking the minicap protocol, sending a frame of each color then holding the stream open."""
+
+    def __init__(self, colors: list[str], interval: float = 0.0) -> None:
+        self.colors = colors
+        self.interval = interval
+        self.port = 0
+
+    async def _serve(self, client: SocketStream) -> None:
+        async with client:
+            await client.send(_banner())
+            for color in self.colors:
+                await client.send(_frame(_jpeg(color)))
+                await anyio.sleep(self.interval)
+            await anyio.sleep_forever()
+
+    @asynccontextmanager
+    async def source(self, serial: str) -> AsyncGenerator[ByteReceiveStream]:
+        async with await anyio.connect_tcp("127.0.0.1", self.port) as stream:
+            yield stream
+
+    @asynccontextmanager
+    async def running(self) -> AsyncIterator[FakeMinicap]:
+        listener = await anyio.create_tcp_listener(local_host="127.0.0.1")
+        self.port = listener.extra(anyio.abc.SocketAttribute.local_port)
+        async with listener, anyio.create_task_group() as tg:
+            tg.start_soon(listener.serve, self._serve)
+            yield self
+            tg.cancel_scope.cancel()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_read_minicap_stream() -> None:
+    """The banner and the frames are parsed from the stream."""
+    send, receive = anyio.create_memory_object_stream[bytes](10)
+    data = _banner((1080, 2400)) + _frame(b"first") + _frame(b"second")
+    async with send:
+        for i in range(0, len(data), 7):
+            await send.send(data[i : i + 7])
+    stream = BufferedByteReceiveStream(receive)
+
+    banner = await read_banner(stream)
+    frames = [frame async for frame in read_frames(stream)]
+
+    assert (banner.pid, banner.virtual_width, banner.virtual_height, banner.quirks) == (1234, 1080, 2400, 2)
+    assert frames == [b"first", b"second"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_grabber_throttles_notifications() -> None:
+    """The latest frame is always kept, while notifications are sent at most once per interval."""
+    notified: list[int] = []
+
+    async def notify(frame: LiveFrame) -> None:
+        notified.append(frame.sequence)
+
+    async with FakeMinicap(["red", "green", "blue"] * 4, interval=0.01).running() as server:
+        grabber = FrameGrabber("fake", server.source, notify=notify, notify_interval=0.5)
+        async with anyio.create_task_group() as tg:
+            await tg.start(grabber.run)
+            with anyio.fail_after(5):
+                while grabber.latest is None or grabber.latest.sequence < 12:
+                    await grabber.wait_frame(grabber.latest.sequence if grabber.latest else 0)
+            grabber.stop()
+
+    assert grabber.latest is None
+    assert notified[0] == 1
+    assert len(notified) <= 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_restart_grabber_applies_notify() -> None:
+    """Starting the grabber of a device again keeps its stream, and notifies the new function at the new interval."""
+    from u2mcp.background import set_background_task_group
+
+    notified: list[int] = []
+
+    async def notify(frame: LiveFrame) -> None:
+        notified.append(frame.sequence)
+
+    previous_source = streaming.get_frame_source()
+    async with FakeMinicap(["red", "green", "blue"], interval=0.2).running() as server:
+        streaming.set_frame_source(server.source)
+        try:
+            async with anyio.create_task_group() as tg:
+                set_background_task_group(tg)
+                grabber = await streaming.start_grabber("fake", notify_interval=10)
+                await grabber.wait_frame()
+                again = await streaming.start_grabber("fake", notify=notify, notify_interval=0)
+                with anyio.fail_after(5):
+                    while len(notified) < 2:
+                        await anyio.sleep(0.01)
+                streaming.stop_grabber("fake")
+        finally:
+            streaming.set_frame_source(previous_source)
+
+    assert again is grabber
+    assert notified[0] >= 1
+    assert notified == sorted(set(notified))
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_grabber_retries_offline_device() -> None:
+    """An adb error while opening the stream is kept as the error of the grabber, and the stream is reopened."""
+    import adbutils
+
+    attempts = 0
+
+    @asynccontextmanager
+    async def source(serial: str) -> AsyncGenerator[ByteReceiveStream]:
+        nonlocal attempts
+        attempts += 1
+        raise adbutils.AdbError("device offline")
+        yield  # pragma: no cover
+
+    grabber = FrameGrabber("fake", source, reconnect_delay=0.01)
+    async with anyio.create_task_group() as tg:
+        await tg.start(grabber.run)
+        with anyio.fail_after(5):
+            while attempts < 3:
+                await anyio.sleep(0.01)
+        grabber.stop()
+
+    assert grabber.error == "device offline"
+    assert grabber.latest is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_grabber_follows_rotation() -> None:
+    """The stream is reopened when the display rotates, unless the reopened stream keeps the old orientation."""
+    rotation = 0
+    opened: list[int] = []
+
+    def source(follow: bool):
+        @asynccontextmanager
+        async def open_stream(serial: str) -> AsyncGenerator[ByteReceiveStream]:
+            orientation = rotation if follow else 0
+            opened.append(orientation)
+            send, receive = anyio.create_memory_object_stream[bytes](10)
+            await send.send(_banner(orientation=orientation) + _frame(_jpeg("red")))
+            async with send, receive:
+                yield receive  # type: ignore[misc]
+
+        return open_stream
+
+    async def read_rotation(serial: str) -> int:
+        return rotation
+
+    for follow in (True, False):
+        rotation, opened = 0, []
+        grabber = FrameGrabber("fake", source(follow), rotation=read_rotation, rotation_interval=0.01)
+        async with anyio.create_task_group() as tg:
+            await tg.start(grabber.run)
+            await grabber.wait_frame()
+            rotation = 90
+            with anyio.fail_after(5):
+                while len(opened) < 2 or grabber.latest is None:
+                    await anyio.sleep(0.01)
+            await anyio.sleep(0.1)
+            grabber.stop()
+        assert opened == ([0, 90] if follow else [0, 0])
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_minicap_started_for_rotation(monkeypatch: pytest.MonkeyPatch) -> None:
+    """minicap is started with the natural size of the display and its rotation, when it is not running yet."""
+    import socket
+    from types import SimpleNamespace
+
+    from u2mcp.tools import device as device_tools
+
+    local, remote = socket.socketpair()
+    connections = iter([OSError("minicap is not running"), local])
+    commands: list[list[str]] = []
+
+    def create_connection(network: object, name: str) -> socket.socket:
+        if isinstance(result := next(connections), Exception):
+            raise result
+        return result
+
+    class Process:
+        returncode = None
+        kill = MagicMock()
+
+        async def aclose(self) -> None:
+            pass
+
+    async def open_process(command: list[str]) -> Process:
+        commands.append(command)
+        return Process()
+
+    async def get_info(serial: str, fresh: bool = False) -> dict:
+        return {"displayWidth": 2400, "displayHeight": 1080, "displayRotation": 1}
+
+    adb_device = SimpleNamespace(create_connection=create_connection)
+    monkeypatch.setattr(
+        streaming,
+        "adbutils",
+        SimpleNamespace(
+            adb=SimpleNamespace(device=lambda serial: adb_device),
+            Network=SimpleNamespace(LOCAL_ABSTRACT="localabstract"),
+            AdbError=type("AdbError", (Exception,), {}),
+            adb_path=lambda: "adb",
+        ),
+    )
+    monkeypatch.setattr(streaming, "open_process", open_process)
+    monkeypatch.setattr(device_tools, "get_info", get_info)
+
+    with remote:
+        async with streaming.minicap_source("emulator-5554") as stream:
+            remote.sendall(b"banner")
+            assert await stream.receive() == b"banner"
+
+    assert commands[0][-1].endswith("minicap -P 1080x2400@1080x2400/90")
+    Process.kill.assert_called_once()
+
+
+@pytest.mark.unit
+def test_resource_subscriptions_hook(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Subscriptions are enabled with the installed fastmcp, and skipped on a server laid out differently
+    or with a fastmcp version they were not checked against."""
+    from types import SimpleNamespace
+
+    import fastmcp
+
+    from u2mcp.mcp import mcp
+    from u2mcp.tools import stream
+
+    assert stream._subscriptions_enabled is True
+    capabilities = mcp._mcp_server.get_capabilities(NotificationOptions(), {})
+    assert capabilities.resources is not None
+    assert capabilities.resources.subscribe is True
+    assert stream.enable_resource_subscriptions(SimpleNamespace()) is False
+    monkeypatch.setattr(fastmcp, "__version__", "2.15.0")
+    assert stream.enable_resource_subscriptions(mcp) is False
+    assert stream.enable_resource_subscriptions(SimpleNamespace(_mcp_server=SimpleNamespace())) is False
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_screenshot_from_stream(mock_u2_device: MagicMock, clean_device_registry: dict, server_lifespan: None) -> None:
+    """While a stream is open, screenshot and the frame resource serve its latest frame, without asking the device."""
+    from fastmcp import Client
+    from fastmcp.client.messages import MessageHandler
+
+    from u2mcp.mcp import mcp
+
+    updates: list[str] = []
+
+    class Handler(MessageHandler):
+        async def on_resource_updated(self, message) -> None:
+            updates.append(str(message.params.uri))
+
+    previous_source = streaming.get_frame_source()
+    async with FakeMinicap(["white", "black"], interval=0.3).running() as server:
+        streaming.set_frame_source(server.source)
+        try:
+            async with Client(mcp, message_handler=Handler()) as client:
+                assert client.initialize_result.capabilities.resources.subscribe is True
+                await client.session.subscribe_resource("screen://emulator-5554/frame")
+                started = await client.call_tool("start_stream", {"serial": "emulator-5554", "notify_interval": 0})
+                shot = await client.call_tool("screenshot", {"serial": "emulator-5554", "format": "png"})
+                contents = await client.read_resource("screen://emulator-5554/frame")
+                with anyio.fail_after(5):
+                    while len(updates) < 2:
+                        await anyio.sleep(0.05)
+                await client.call_tool("stop_stream", {"serial": "emulator-5554"})
+                after = await client.call_tool("screenshot", {"serial": "emulator-5554", "max_width": 100})
+        finally:
+            streaming.set_frame_source(previous_source)
+
+    assert started.structured_content == {"uri": "screen://emulator-5554/frame", "width": 180, "height": 320}
+    assert (shot.structured_content["width"], shot.structured_content["height"]) == _SIZE
+    assert contents[0].mimeType == "image/jpeg"
+    assert PILImage.open(BytesIO(b64decode(contents[0].blob))).size == _SIZE
+    assert updates == ["screen://emulator-5554/frame"] * 2
+    assert mock_u2_device.screenshot.call_count == 1
+    assert after.structured_content["original_width"] == 1080
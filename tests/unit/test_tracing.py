@@ -0,0 +1,188 @@
+"""
+Unit tests for tool call tracing.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from fastmcp import FastMCP
+
+from u2mcp.tracing import TracingMiddleware, disable_tracing, enable_tracing, read_trace, summarize_trace
+
+
+@pytest.fixture
+def trace_file(tmp_path: Path) -> Iterator[tuple[FastMCP, Path]]:
+    """The server writing spans to a temporary trace file."""
+    from u2mcp.mcp import mcp
+
+    if not any(isinstance(m, TracingMiddleware) for m in mcp.middleware):
+        mcp.add_middleware(TracingMiddleware())
+    path = tmp_path / "trace.jsonl"
+    enable_tracing(str(path))
+    yield mcp, path
+    disable_tracing()
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_tool_call_spans(
+    trace_file: tuple[FastMCP, Path], mock_u2_device: MagicMock, clean_device_registry: dict
+) -> None:
+    """A tool call is written as one OTLP request: the tool span and the spans of its phases."""
+    from fastmcp import Client
+
+    mcp, path = trace_file
+    async with Client(mcp) as client:
+        await client.call_tool("click", {"serial": "emulator-5554", "x": 1, "y": 2})
+    disable_tracing()
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 1
+    request = json.loads(lines[0])
+    resource = request["resourceSpans"][0]
+    assert {"key": "service.name", "value": {"stringValue": "u2mcp"}} in resource["resource"]["attributes"]
+
+    spans = read_trace(str(path))
+    root = spans[0]
+    assert root["name"] == "click" and root["parent_id"] == ""
+    assert root["attributes"]["mcp.tool.tags"] == ["action:touch"]
+    assert root["attributes"]["device.serial"] == "emulator-5554"
+    # Spans are listed as they end: connecting runs _connect in a worker thread
+    assert [span["name"] for span in spans[1:]] == [
+        "worker.queue",
+        "worker.run",
+        "device.connect",
+        "device.lock",
+        "worker.queue",
+        "worker.run",
+    ]
+    assert spans[2]["attributes"]["code.function"] == "_connect"
+    assert spans[2]["attributes"]["worker.pool"] == "wait"
+    for span in spans[1:]:
+        assert span["trace_id"] == root["trace_id"]
+        assert span["parent_id"] == root["span_id"]
+        assert span["attributes"]["mcp.tool.name"] == "click"
+        assert root["start"] <= span["start"] <= span["end"] <= root["end"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_screenshot_encode_span(
+    trace_file: tuple[FastMCP, Path], mock_u2_device: MagicMock, clean_device_registry: dict
+) -> None:
+    """Image encoding is a phase of screenshot calls."""
+    from fastmcp import Client
+
+    mcp, path = trace_file
+    async with Client(mcp) as client:
+        await client.call_tool("screenshot", {"serial": "emulator-5554", "format": "png"})
+    disable_tracing()
+
+    encode = [span for span in read_trace(str(path)) if span["name"] == "image.encode"]
+    assert len(encode) == 1
+    assert encode[0]["attributes"]["image.format"] == "png"
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_failed_call_span(
+    trace_file: tuple[FastMCP, Path], mock_u2_device: MagicMock, clean_device_registry: dict
+) -> None:
+    """A failed tool call has an error status."""
+    from fastmcp import Client
+
+    mcp, path = trace_file
+    mock_u2_device.click.side_effect = RuntimeError("device gone")
+    async with Client(mcp) as client:
+        await client.call_tool("click", {"serial": "emulator-5554", "x": 1, "y": 2}, raise_on_error=False)
+    disable_tracing()
+
+    root = read_trace(str(path))[0]
+    assert root["error"] is True
+
+
+@pytest.mark.unit
+def test_no_spans_when_disabled(tmp_path: Path) -> None:
+    """Without --trace, nothing is recorded."""
+    from u2mcp.tracing import add_span, is_tracing_enabled
+
+    disable_tracing()
+    assert not is_tracing_enabled()
+    add_span("device.lock", 0.1, serial="emulator-5554")
+
+
+def _span(name: str, span_id: str, parent_id: str, start_ms: float, end_ms: float, error: bool = False) -> dict:
+    return {
+        "name": name,
+        "trace_id": "t",
+        "span_id": span_id,
+        "parent_id": parent_id,
+        "start": int(start_ms * 1e6),
+        "end": int(end_ms * 1e6),
+        "attributes": {},
+        "error": error,
+    }
+
+
+@pytest.mark.unit
+def test_summarize_trace() -> None:
+    """Each tool gets its mean time per phase, and the rest of the call as server time.
+
+    The worker thread connecting to the device is counted as connecting only.
+    """
+    spans = [
+        _span("element_click", "a", "", 0, 100),
+        _span("device.lock", "a1", "a", 0, 30),
+        _span("worker.queue", "a2", "a", 30, 35),
+        _span("worker.run", "a3", "a", 35, 95),
+        _span("element_click", "b", "", 200, 300, error=True),
+        _span("device.connect", "b0", "b", 200, 204),
+        _span("worker.run", "b00", "b", 201, 203),
+        _span("device.lock", "b1", "b", 204, 210),
+        _span("worker.run", "b2", "b", 210, 290),
+        # Recorded outside a tool call
+        _span("device.connect", "c", "", 0, 5),
+    ]
+
+    summary = summarize_trace(spans)
+
+    assert list(summary) == ["element_click"]
+    stats = summary["element_click"]
+    assert stats["calls"] == 2 and stats["errors"] == 1
+    assert stats["mean"] == pytest.approx(0.1)
+    assert stats["phases"]["device.connect"] == pytest.approx(0.002)
+    assert stats["phases"]["device.lock"] == pytest.approx(0.018)
+    assert stats["phases"]["worker.queue"] == pytest.approx(0.0025)
+    assert stats["phases"]["worker.run"] == pytest.approx(0.07)
+    assert stats["phases"]["image.encode"] == 0
+    assert stats["phases"]["server"] == pytest.approx(0.0075)
+
+
+@pytest.mark.unit
+def test_trace_report_command(tmp_path: Path) -> None:
+    """`u2mcp trace-report` prints one row per tool."""
+    from typer.testing import CliRunner
+
+    from u2mcp.__main__ import cli
+    from u2mcp.tracing import _Span, _write
+
+    path = tmp_path / "trace.jsonl"
+    enable_tracing(str(path))
+    _write(
+        [
+            _Span("screenshot", "t" * 32, "a" * 16, "", 0, 50_000_000),
+            _Span("image.encode", "t" * 32, "b" * 16, "a" * 16, 0, 20_000_000),
+        ]
+    )
+    disable_tracing()
+
+    result = CliRunner().invoke(cli, ["trace-report", str(path)], env={"COLUMNS": "250"})
+
+    assert result.exit_code == 0, result.output
+    assert "screenshot" in result.output
+    assert "20.0 (40%)" in result.output
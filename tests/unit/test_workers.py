@@ -0,0 +1,93 @@
+"""
+Unit tests for the worker thread pools.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterator
+
+import anyio
+import pytest
+
+from u2mcp import workers
+from u2mcp.workers import run_sync, set_worker_limits, worker_stats
+
+
+@pytest.fixture(autouse=True)
+def small_limits() -> Iterator[None]:
+    limits = workers.get_worker_limits()
+    set_worker_limits(workers=2, wait_workers=2, device_workers=2)
+    worker_stats(reset=True)
+    yield
+    set_worker_limits(**limits)
+
+
+def _blocker() -> tuple[threading.Event, list[int]]:
+    """An event releasing blocked calls, and a record of the most calls running at once."""
+    release = threading.Event()
+    running = [0, 0]  # now, peak
+    lock = threading.Lock()
+
+    def block() -> None:
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        release.wait(5)
+        with lock:
+            running[0] -= 1
+
+    block.running = running  # type: ignore[attr-defined]
+    return release, block  # type: ignore[return-value]
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_pool_cap_and_stats() -> None:
+    """Test a pool runs at most its cap of calls at once, and queued calls show in the stats."""
+    release, block = _blocker()
+
+    async with anyio.create_task_group() as tg:
+        for i in range(5):
+            tg.start_soon(lambda i=i: run_sync(block, serial=f"device-{i}"))
+        await anyio.sleep(0.1)
+        stats = worker_stats()["pools"]["quick"]
+        assert (stats["limit"], stats["busy"], stats["waiting"]) == (2, 2, 3)
+        release.set()
+
+    assert block.running[1] == 2  # type: ignore[attr-defined]
+    stats = worker_stats()["pools"]["quick"]
+    assert stats["calls"] == 5 and stats["waiting"] == 0 and stats["peak_waiting"] == 3
+    assert stats["wait_max"] > 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.unit
+async def test_device_budget_and_wait_pool() -> None:
+    """Test long waits on one device neither take another device's threads nor the quick pool."""
+    release, block = _blocker()
+    set_worker_limits(workers=4, wait_workers=4)
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(3):
+            tg.start_soon(lambda: run_sync(block, serial="busy", pool="wait"))
+        await anyio.sleep(0.1)
+
+        # Only two of the waits run, the third is queued on the device budget without taking a pool thread
+        stats = worker_stats()
+        assert stats["devices"]["busy"]["busy"] == 2 and stats["devices"]["busy"]["waiting"] == 1
+        assert stats["pools"]["wait"]["busy"] == 2
+
+        started = time.perf_counter()
+        await run_sync(time.sleep, 0, serial="idle")
+        assert time.perf_counter() - started < 0.5
+        assert worker_stats()["pools"]["quick"]["calls"] == 1
+        release.set()
+
+
+@pytest.mark.unit
+def test_set_worker_limits_validates() -> None:
+    """Test caps must be positive."""
+    with pytest.raises(ValueError):
+        set_worker_limits(workers=0)